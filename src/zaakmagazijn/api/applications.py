@@ -1,19 +1,18 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
 
 from lxml import etree
 from spyne import Application as _Application, error
 from spyne.const.xml import XSD
 
 from ..apiauth.utils import handle_authorization
-from .services import (
-    ActualiseerZaakstatus, CancelCheckout, CreeerZaak, GeefBesluitDetails,
-    GeefLijstBesluiten, GeefLijstZaakdocumenten, GeefZaakdetails,
-    GeefZaakdocumentBewerken, GeefZaakdocumentLezen, GeefZaakstatus,
-    GenereerBesluitIdentificatie, GenereerDocumentIdentificatie,
-    GenereerZaakIdentificatie, MaakZaakdocument, OntkoppelZaakdocument,
-    OverdragenZaak, UpdateBesluit, UpdateZaak, UpdateZaakdocument,
-    VoegBesluitToe, VoegZaakdocumentToe
-)
+from ..async.processing import accept_message, is_processing
+from ..utils.metrics import soap_request_duration, stuf_faults
+from ..utils.performance import performance_recorder
 from .stuf.attributes import (
     Bestandsnaam, ContentType, IndOnvolledigeDatum, NoValue, Scope__Anonymous,
     Verwerkingssoort
@@ -25,6 +24,7 @@ from .stuf.models import (
 )
 from .stuf.protocols import StUFSynchronous
 from .stuf.simple_types import Entiteittype, Exact, FunctieVrijBerichtElement
+from .utils import get_operation_name
 
 logger = logging.getLogger(__name__)
 
@@ -167,56 +167,141 @@ class Application(_Application):
         except IndexError:
             stuurgegevens_zender = None
 
+        operation = get_operation_name(ctx)
+        berichtcode = getattr(stuurgegevens_zender, 'berichtcode', None) or ''
+        start = time.perf_counter()
         try:
             # Check if "zender" is authorized
-            handle_authorization(ctx)
-            return ctx.service_class.call_wrapper(ctx)
+            with performance_recorder.phase('authorization'):
+                handle_authorization(ctx)
+            return self.call_service(ctx)
         # Log `Fault`s and if not already an instance of `self.FAULT_CLASS`, re-raise
         # as such.
         except error.Fault as e:
             sc = ctx.service_class
             logger.error(e)
-            raise self.FAULT_CLASS.from_fault(e, sc, stuurgegevens_zender)
+            fault = self.FAULT_CLASS.from_fault(e, sc, stuurgegevens_zender)
+            stuf_faults.inc(operation=operation, code=fault.stuf_code)
+            raise fault
         # Log `Exception`s and re-raise as `self.FAULT_CLASS`s.
         except Exception as e:
             sc = ctx.service_class
             logger.exception(e)
-            raise self.FAULT_CLASS.from_exception(e, sc, stuurgegevens_zender)
+            fault = self.FAULT_CLASS.from_exception(e, sc, stuurgegevens_zender)
+            stuf_faults.inc(operation=operation, code=fault.stuf_code)
+            raise fault
+        finally:
+            soap_request_duration.observe(time.perf_counter() - start, operation=operation, berichtcode=berichtcode)
+
+    def call_service(self, ctx):
+        return ctx.service_class.call_wrapper(ctx)
 
 
 class AsyncApplication(Application):
     FAULT_CLASS = SpyneAsyncStUFFault
 
+    def call_service(self, ctx):
+        """
+        With `ZAAKMAGAZIJN_ASYNC_PROCESSING`, the message is stored and
+        confirmed with a Bv03, the service is called later by the
+        `process_async_messages` command.
+        """
+        if settings.ZAAKMAGAZIJN_ASYNC_PROCESSING and not is_processing(ctx):
+            return accept_message(ctx)
+        return super().call_service(ctx)
+
+
+# The applications are created when they are first used, see `get_application`.
+# Importing the services builds their models, which takes a while, so every
+# application only imports its own services.
 
 # Validator `None` means to validate against the KING reference WSDL.
 # See: zaakmagazijn.api.stuf.protocols.StUFSynchronous.validate_document
-beantwoordvraag_app = Application(
-    [GeefBesluitDetails, GeefZaakstatus, GeefLijstBesluiten, GeefZaakdetails,
-     GeefLijstZaakdocumenten, GeefZaakdocumentLezen],
-    tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
-    name='Beantwoordvraag',
-    in_protocol=StUFSynchronous(validator=None),
-    out_protocol=StUFSynchronous()
-)
+def create_beantwoordvraag_app():
+    from .services.geef_besluit_details import GeefBesluitDetails
+    from .services.geef_lijst_besluiten import GeefLijstBesluiten
+    from .services.geef_lijst_zaakdocumenten import GeefLijstZaakdocumenten
+    from .services.geef_zaak_details import GeefZaakdetails
+    from .services.geef_zaak_status import GeefZaakstatus
+    from .services.geef_zaakdocument_lezen import GeefZaakdocumentLezen
 
-verwerksynchroonvrijbericht_app = Application(
-    [CancelCheckout, GeefZaakdocumentBewerken, GenereerZaakIdentificatie,
-     GenereerBesluitIdentificatie, GenereerDocumentIdentificatie,
-     OntkoppelZaakdocument, UpdateZaakdocument],
-    tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
-    name='VerwerkSynchroonVrijBericht',
-    in_protocol=StUFSynchronous(validator=None),
-    out_protocol=StUFSynchronous()
-)
+    return Application(
+        [GeefBesluitDetails, GeefZaakstatus, GeefLijstBesluiten, GeefZaakdetails,
+         GeefLijstZaakdocumenten, GeefZaakdocumentLezen],
+        tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
+        name='Beantwoordvraag',
+        in_protocol=StUFSynchronous(validator=None),
+        out_protocol=StUFSynchronous()
+    )
 
-ontvangasynchroon_app = AsyncApplication(
-    [ActualiseerZaakstatus, CreeerZaak, MaakZaakdocument, OverdragenZaak,
-     UpdateZaak, UpdateBesluit, VoegBesluitToe, VoegZaakdocumentToe],
-    tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
-    name='OntvangAsynchroon',
-    in_protocol=StUFSynchronous(validator=None),
-    out_protocol=StUFSynchronous()
-)
+
+def create_verwerksynchroonvrijbericht_app():
+    from .services.cancel_checkout import CancelCheckout
+    from .services.geef_zaakdocument_bewerken import GeefZaakdocumentBewerken
+    from .services.genereer_besluit_identificatie import GenereerBesluitIdentificatie
+    from .services.genereer_document_identificatie import GenereerDocumentIdentificatie
+    from .services.genereer_zaak_identificatie import GenereerZaakIdentificatie
+    from .services.ontkoppel_zaakdocument import OntkoppelZaakdocument
+    from .services.update_zaakdocument import UpdateZaakdocument
+
+    return Application(
+        [CancelCheckout, GeefZaakdocumentBewerken, GenereerZaakIdentificatie,
+         GenereerBesluitIdentificatie, GenereerDocumentIdentificatie,
+         OntkoppelZaakdocument, UpdateZaakdocument],
+        tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
+        name='VerwerkSynchroonVrijBericht',
+        in_protocol=StUFSynchronous(validator=None),
+        out_protocol=StUFSynchronous()
+    )
+
+
+def create_ontvangasynchroon_app():
+    from .services.actualiseer_zaak_status import ActualiseerZaakstatus
+    from .services.creeer_zaak import CreeerZaak
+    from .services.maak_zaakdocument import MaakZaakdocument
+    from .services.overdragen_zaak import OverdragenZaak
+    from .services.update_besluit import UpdateBesluit
+    from .services.update_zaak import UpdateZaak
+    from .services.voeg_besluit_toe import VoegBesluitToe
+    from .services.voeg_zaakdocument_toe import VoegZaakdocumentToe
+
+    return AsyncApplication(
+        [ActualiseerZaakstatus, CreeerZaak, MaakZaakdocument, OverdragenZaak,
+         UpdateZaak, UpdateBesluit, VoegBesluitToe, VoegZaakdocumentToe],
+        tns='http://www.stufstandaarden.nl/koppelvlak/zds0120',
+        name='OntvangAsynchroon',
+        in_protocol=StUFSynchronous(validator=None),
+        out_protocol=StUFSynchronous()
+    )
+
+
+APPLICATION_FACTORIES = OrderedDict([
+    ('beantwoordvraag', create_beantwoordvraag_app),
+    ('verwerksynchroonvrijbericht', create_verwerksynchroonvrijbericht_app),
+    ('ontvangasynchroon', create_ontvangasynchroon_app),
+])
+
+_applications = {}
+_applications_lock = threading.Lock()
+
+
+def get_application(name: str) -> Application:
+    """
+    Return the application :param:`name`, from `APPLICATION_FACTORIES`. It is
+    created once per process, on first use.
+    """
+    with _applications_lock:
+        app = _applications.get(name)
+        if app is None:
+            app = _applications[name] = APPLICATION_FACTORIES[name]()
+        return app
+
+
+def get_applications() -> list:
+    """
+    Return all applications, creating the ones that are not used yet.
+    """
+    return [get_application(name) for name in APPLICATION_FACTORIES]
 
 
 def _on_method_exception_object(ctx):
@@ -229,5 +314,5 @@ def _on_method_exception_object(ctx):
     """
     pass
 
-# beantwoordvraag_app.event_manager.add_listener('method_exception_object', _on_method_exception_object)
-# verwerksynchroonvrijbericht_app.event_manager.add_listener('method_exception_object', _on_method_exception_object)
+# get_application('beantwoordvraag').event_manager.add_listener('method_exception_object', _on_method_exception_object)
+# get_application('verwerksynchroonvrijbericht').event_manager.add_listener('method_exception_object', _on_method_exception_object)
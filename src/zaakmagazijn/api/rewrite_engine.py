@@ -8,6 +8,8 @@ from django.utils import timezone
 
 from lxml import etree
 
+from ..utils.performance import performance_recorder
+
 nsmap = {
     'zkn': 'http://www.egem.nl/StUF/sector/zkn/0310',
     'bg': 'http://www.egem.nl/StUF/sector/bg/0310',
@@ -79,7 +81,8 @@ class RewriteEngine:
     @classmethod
     def add_stuf_novalue(cls, root):
         # According to the StUF standard, all nil=True should also have attribute
-        # noValue="geenWaarde"
+        # noValue="geenWaarde". This is normally done during serialization, see
+        # `StUF.null_to_parent`, but the STP rewrites can't rely on that.
         results = root.xpath('//*[@xsi:nil=\'true\']', namespaces=nsmap)
         for result in results:
             result.attrib['{http://www.egem.nl/StUF/StUF0301}noValue'] = 'geenWaarde'
@@ -99,44 +102,52 @@ class RewriteEngine:
 
     @classmethod
     def rewrite(cls, view_func):
-        def wrapped_view(*args, **kwargs):
+        def rewrite_view(*args, **kwargs):
             request = args[0]
 
             response = view_func(*args, **kwargs)
-            response_content = response.content
 
+            # The response is only rewritten for the StUF test platform. The
+            # StUF specifics are already taken care of during serialization.
             length = int(request.environ.get('CONTENT_LENGTH', '0') or 0)
-            if settings.ZAAKMAGAZIJN_STUF_TESTPLATFORM and length > 0:
-                request_content = request.environ['wsgi.input'].read(length)
-                body = BytesIO(request_content)
-                request.environ['wsgi.input'] = body
-                test_name = etree.fromstring(request_content)[1][0].tag
-
-                # strip namespace
-                test_name = test_name[test_name.find('}') + 1:]
-
-                test_name = test_name.lower()
-
-                # Reset the test progress after five minutes of inactivity.
-                current_time = timezone.now()
-                if cls.last_hit and current_time - timedelta(minutes=5) > cls.last_hit:
-                    cls.stp_tests = {}
-                cls.last_hit = current_time
-
-                cls.stp_tests.setdefault(test_name, 0)
-                cls.stp_tests[test_name] += 1
-
-                method_name = 'stp_rewrite_response_{test_name}_{i}'.format(
-                    test_name=test_name, i=cls.stp_tests[test_name])
-                method = getattr(cls, method_name, None)
-                if method:
-                    response_content = method(response.content)
-
-                print('Incomming request: {} volgnummer {}{}'.format(
-                    test_name,
-                    cls.stp_tests[test_name] * 2 - 1,
-                    ' (applied {})'.format(method_name) if method else '',
-                ))
+            if not settings.ZAAKMAGAZIJN_STUF_TESTPLATFORM or length == 0:
+                return response
+
+            if response.streaming:
+                response_content = b''.join(response.streaming_content)
+            else:
+                response_content = response.content
+
+            request_content = request.environ['wsgi.input'].read(length)
+            body = BytesIO(request_content)
+            request.environ['wsgi.input'] = body
+            test_name = etree.fromstring(request_content)[1][0].tag
+
+            # strip namespace
+            test_name = test_name[test_name.find('}') + 1:]
+
+            test_name = test_name.lower()
+
+            # Reset the test progress after five minutes of inactivity.
+            current_time = timezone.now()
+            if cls.last_hit and current_time - timedelta(minutes=5) > cls.last_hit:
+                cls.stp_tests = {}
+            cls.last_hit = current_time
+
+            cls.stp_tests.setdefault(test_name, 0)
+            cls.stp_tests[test_name] += 1
+
+            method_name = 'stp_rewrite_response_{test_name}_{i}'.format(
+                test_name=test_name, i=cls.stp_tests[test_name])
+            method = getattr(cls, method_name, None)
+            if method:
+                response_content = method(response_content)
+
+            print('Incomming request: {} volgnummer {}{}'.format(
+                test_name,
+                cls.stp_tests[test_name] * 2 - 1,
+                ' (applied {})'.format(method_name) if method else '',
+            ))
 
             response_content = cls.rewrite_response(response_content)
             new_response = HttpResponse(
@@ -154,4 +165,8 @@ class RewriteEngine:
 
             return new_response
 
+        def wrapped_view(*args, **kwargs):
+            with performance_recorder.phase('rewrite'):
+                return rewrite_view(*args, **kwargs)
+
         return wraps(view_func, assigned=WRAPPER_ASSIGNMENTS)(wrapped_view)
@@ -1,23 +1,2 @@
-from .actualiseer_zaak_status import ActualiseerZaakstatus  # noqa
-from .cancel_checkout import CancelCheckout  # noqa
-from .creeer_zaak import CreeerZaak  # noqa
-from .geef_besluit_details import GeefBesluitDetails  # noqa
-from .geef_lijst_besluiten import GeefLijstBesluiten  # noqa
-from .geef_lijst_zaakdocumenten import GeefLijstZaakdocumenten  # noqa
-from .geef_zaak_details import GeefZaakdetails  # noqa
-from .geef_zaak_status import GeefZaakstatus  # noqa
-from .geef_zaakdocument_bewerken import GeefZaakdocumentBewerken  # noqa
-from .geef_zaakdocument_lezen import GeefZaakdocumentLezen  # noqa
-from .genereer_besluit_identificatie import \
-    GenereerBesluitIdentificatie  # noqa
-from .genereer_document_identificatie import \
-    GenereerDocumentIdentificatie  # noqa
-from .genereer_zaak_identificatie import GenereerZaakIdentificatie  # noqa
-from .maak_zaakdocument import MaakZaakdocument  # noqa
-from .ontkoppel_zaakdocument import OntkoppelZaakdocument  # noqa
-from .overdragen_zaak import OverdragenZaak  # noqa
-from .update_besluit import UpdateBesluit  # noqa
-from .update_zaak import UpdateZaak  # noqa
-from .update_zaakdocument import UpdateZaakdocument  # noqa
-from .voeg_besluit_toe import VoegBesluitToe  # noqa
-from .voeg_zaakdocument_toe import VoegZaakdocumentToe  # noqa
+# The services are imported by the application they belong to, when it is
+# created. See `zaakmagazijn.api.applications.get_application`.
@@ -1,6 +1,7 @@
 from spyne import ServiceBase, Unicode, rpc
 
 from zaakmagazijn.cmis.client import default_client as dms_client
+from zaakmagazijn.cmis.outbox import dms_outbox
 
 from ..stuf import simple_types
 from ..stuf.attributes import entiteittype, functie, verwerkingssoort
@@ -123,6 +124,7 @@ class CancelCheckout(ServiceBase):
         output = output_builder.create_data()
 
         document = get_enkelvoudig_informatie_object_or_fault(document_identificatie)
+        dms_outbox.wait_for_document(document)
         dms_client.cancel_checkout(document, checked_out_id)
 
         return output
@@ -2,6 +2,7 @@ from spyne import AnyXml, ServiceBase, Unicode, rpc
 
 from zaakmagazijn.auditlog_extension.signals import service_read
 from ...cmis.client import default_client as dms_client
+from ...cmis.outbox import dms_outbox
 from ..stuf import simple_types
 from ..stuf.attributes import entiteittype, functie
 from ..stuf.base import ComplexModelBuilder, complex_model_factory
@@ -202,6 +203,7 @@ class GeefZaakdocumentBewerken(ServiceBase):
 
         identificatie = data.edcLv01.gelijk.identificatie
         eio = get_enkelvoudig_informatie_object_or_fault(identificatie)
+        dms_outbox.wait_for_document(eio)
 
         checked_out_id, checked_out_by = dms_client.checkout(eio)
 
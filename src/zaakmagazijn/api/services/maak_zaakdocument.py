@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.db import transaction
 
 from spyne import ServiceBase, rpc
 
 from ...cmis.client import default_client as dms_client
+from ...cmis.outbox import dms_outbox
 from ...rgbz.models import EnkelvoudigInformatieObject, Zaak
 from ..stuf.models import BinaireInhoud, Bv03Bericht  # , TijdvakGeldigheid
 from ..stuf.utils import get_bv03_stuurgegevens
@@ -50,6 +52,10 @@ class MaakZaakdocument(ServiceBase):
         #   Tabel 3 is een mapping aangegeven tussen de StUF-ZKN-elementen en
         #   CMIS-objectproperties.
 
+        # Als de DMS outbox gebruikt wordt, worden de CMIS-services na de
+        # transactie aangeroepen door het `process_dms_outbox` commando.
+        client = dms_outbox if settings.ZAAKMAGAZIJN_DMS_OUTBOX else dms_client
+
         with transaction.atomic():
             process_create(EnkelvoudigDocumentEntiteit, data)
 
@@ -62,7 +68,7 @@ class MaakZaakdocument(ServiceBase):
 
             inhoud = data.object.inhoud
 
-            dms_client.maak_zaakdocument(
+            client.maak_zaakdocument(
                 document,
                 filename=inhoud.bestandsnaam if inhoud else None,
                 sender=created_by,
@@ -70,7 +76,7 @@ class MaakZaakdocument(ServiceBase):
 
             # relateer document aan juiste zaak folder
             zaak = Zaak.objects.get(zaakidentificatie=data.object.isRelevantVoor[0].gerelateerde.identificatie)
-            dms_client.relateer_aan_zaak(document, zaak)
+            client.relateer_aan_zaak(document, zaak)
 
         return {
             'stuurgegevens': get_bv03_stuurgegevens(data),
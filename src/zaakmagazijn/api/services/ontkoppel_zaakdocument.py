@@ -1,6 +1,7 @@
 from spyne import ComplexModel, ServiceBase, Unicode, rpc
 
 from zaakmagazijn.cmis.client import default_client as dms_client
+from zaakmagazijn.cmis.outbox import dms_outbox
 
 from ...rgbz.models import EnkelvoudigInformatieObject, ZaakInformatieObject
 from ..stuf import simple_types
@@ -198,6 +199,7 @@ class OntkoppelZaakdocument(ServiceBase):
             raise StUFFault(ServerFoutChoices.stuf064, stuf_details='Parameters mutatiesoort is niet gelijk aan "W"')
 
         document = EnkelvoudigInformatieObject.objects.get(informatieobjectidentificatie=informatieobject_id)
+        dms_outbox.wait_for_document(document)
         # check if it's being edited or not
         if dms_client.is_locked(document):
             raise StUFFault(ServerFoutChoices.stuf064, stuf_details='Document is in bewerking')
@@ -2,6 +2,7 @@ from spyne import ComplexModel, ServiceBase, Unicode, rpc
 
 from ...cmis.client import default_client as dms_client
 from ...cmis.exceptions import DocumentConflictException
+from ...cmis.outbox import dms_outbox
 from ...rgbz.models import EnkelvoudigInformatieObject
 from ...utils import stuf_datetime
 from ..stuf import attributes, simple_types
@@ -109,6 +110,7 @@ class UpdateZaakdocument(ServiceBase):
         inhoud = data.edcLk02.object[0].inhoud
 
         document = EnkelvoudigInformatieObject.objects.get(informatieobjectidentificatie=identificatie)
+        dms_outbox.wait_for_document(document)
         try:
             dms_client.update_zaakdocument(document, data.parameters.checkedOutId, inhoud)
         except DocumentConflictException as exc:
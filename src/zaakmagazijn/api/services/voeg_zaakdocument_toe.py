@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 
 from spyne import ServiceBase, rpc
@@ -7,6 +8,7 @@ from zaakmagazijn.rgbz_mapping.models import (
 )
 
 from ...cmis.client import default_client as dms_client
+from ...cmis.outbox import dms_outbox
 from ..stuf import OneToManyRelation, StUFEntiteit
 from ..stuf.models import Bv03Bericht  # , TijdvakGeldigheid
 from ..stuf.utils import get_bv03_stuurgegevens
@@ -134,6 +136,10 @@ class VoegZaakdocumentToe(ServiceBase):
         # * Minimaal de vereiste metadata voor een EDC wordt vastgelegd in de
         #   daarvoor gedefinieerde objectproperties. In Tabel 3 is een mapping
         #   aangegeven tussen de StUF-ZKN-elementen en CMIS-objectproperties.
+        # Als de DMS outbox gebruikt wordt, worden de CMIS-services na de
+        # transactie aangeroepen door het `process_dms_outbox` commando.
+        client = dms_outbox if settings.ZAAKMAGAZIJN_DMS_OUTBOX else dms_client
+
         with transaction.atomic():
             process_create(EnkelvoudigDocumentEntiteit, data)
 
@@ -147,7 +153,7 @@ class VoegZaakdocumentToe(ServiceBase):
             inhoud = data.object.inhoud
             content = inhoud.to_cmis()
 
-            dms_client.maak_zaakdocument_met_inhoud(
+            client.maak_zaakdocument_met_inhoud(
                 document._obj,
                 filename=inhoud.bestandsnaam,
                 sender=created_by,
@@ -157,7 +163,7 @@ class VoegZaakdocumentToe(ServiceBase):
 
             # relateer document aan juiste zaak folder
             zaak = ZaakProxy.objects.get(zaakidentificatie=data.object.isRelevantVoor[0].gerelateerde.identificatie)
-            dms_client.relateer_aan_zaak(document._obj, zaak._obj)
+            client.relateer_aan_zaak(document._obj, zaak._obj)
 
         return {
             'stuurgegevens': get_bv03_stuurgegevens(data),
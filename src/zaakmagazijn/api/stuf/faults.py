@@ -123,6 +123,7 @@ class SpyneStUFFault(Fault):
             self.build_stuf_fault_detail(stuf_berichtcode, stuf_code, stuf_details, stuurgegevens_zender)
 
         super().__init__(faultcode=stuf_plek, faultstring=stuf_omschrijving, faultactor='', detail=detail)
+        self.stuf_code = stuf_code
 
     @staticmethod
     def build_stuf_fault_detail(stuf_berichtcode, stuf_code, stuf_details=None, stuurgegevens_zender=None):
@@ -1,7 +1,6 @@
 import base64
 import decimal
 import logging
-from io import BytesIO
 
 from spyne import Boolean, File, Integer, Unicode
 from spyne.model.complex import ComplexModel, XmlAttribute, XmlData
@@ -351,14 +350,22 @@ class BinaireInhoud(ComplexModel):
         ('contentType', XmlAttribute(attributes.ContentType, ref='contentType', ns=XMIME_XML_NS)),
     ]
 
-    def to_cmis(self) -> BytesIO:
+    def to_cmis(self):
+        """
+        Return the file-like object holding the content, which is passed on to
+        the DMS as is.
+
+        :return: The file-like object, or `None` if there is no content.
+        """
         if self.data is None:
             return None
 
-        self.data.rollover()
+        # The content of requests is decoded to a file already, see
+        # `StUF.file_from_bytes`.
+        if self.data.handle is None:
+            self.data.rollover()
         self.data.handle.seek(0)
-        encoded = self.data.handle.read()
-        return BytesIO(encoded)
+        return self.data.handle
 
 
 class ExtraElement(ComplexModel):
@@ -1,21 +1,112 @@
+import base64
+import binascii
 import copy
 import logging
-import os
+import re
+import tempfile
+import uuid
 
 from django.conf import settings
 
-from lxml import etree, html
+from lxml import html
 from lxml.builder import E
 from spyne.const.xml import XSI
+from spyne.error import ValidationError
+from spyne.model.binary import (
+    BINARY_ENCODING_BASE64, BINARY_ENCODING_USE_DEFAULT, File
+)
+from spyne.model.complex import XmlAttribute
 from spyne.protocol.soap import Soap11
 from spyne.protocol.xml import SchemaValidationError
 from spyne.util.six import text_type
 
+from ...utils.metrics import stuf_faults
+from ...utils.performance import performance_recorder
 from .choices import ClientFoutChoices
-from .constants import GML_XML_NS
+from .constants import GML_XML_NS, STUF_XML_NS
+from .schemas import get_zds_xsd_path, schema_cache
 
 logger = logging.getLogger(__name__)
 
+NO_VALUE_ATTR = '{%s}noValue' % STUF_XML_NS
+
+# Base64 encodes every 3 bytes to 4 characters, so the content is encoded in
+# chunks of a multiple of 3 bytes, and decoded in chunks of a multiple of 4
+# characters.
+ENCODE_CHUNK_SIZE = 3 * 0x4000
+DECODE_CHUNK_SIZE = 4 * 0x4000
+
+
+def iter_base64(handle, chunk_size=ENCODE_CHUNK_SIZE):
+    """
+    Base64 encode the content of a file-like object, one chunk at a time.
+
+    :param handle: The file-like object, read from its current position.
+    :param chunk_size: The number of bytes read at once.
+    :return: A generator of base64 encoded byte strings.
+    """
+    remainder = b''
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            break
+
+        # Only the last chunk can be padded.
+        chunk = remainder + chunk
+        size = len(chunk) - len(chunk) % 3
+        remainder = chunk[size:]
+        if size:
+            yield base64.b64encode(chunk[:size])
+
+    if remainder:
+        yield base64.b64encode(remainder)
+
+
+def decode_base64(value, handle, chunk_size=DECODE_CHUNK_SIZE):
+    """
+    Base64 decode `value` into a file-like object, one chunk at a time.
+    Whitespace in `value` is ignored.
+
+    :param value: The base64 encoded content, either `str` or `bytes`.
+    :param handle: The file-like object the decoded content is written to.
+    :param chunk_size: The number of characters decoded at once.
+    :raises binascii.Error: If `value` is not valid base64.
+    """
+    empty = value[:0]
+    remainder = empty
+    for start in range(0, len(value), chunk_size):
+        chunk = remainder + empty.join(value[start:start + chunk_size].split())
+        size = len(chunk) - len(chunk) % 4
+        remainder = chunk[size:]
+        handle.write(base64.b64decode(chunk[:size], validate=True))
+
+    if remainder:
+        handle.write(base64.b64decode(remainder, validate=True))
+
+
+def get_content_handle(value):
+    """
+    Return the file-like object holding the content of a `File`, if any.
+    """
+    if isinstance(value, File.Value):
+        return value.handle if value.data is None else None
+    return value if hasattr(value, 'read') else None
+
+
+def get_content_size(handle):
+    """
+    Return the size of the remaining content of a file-like object, or `None`
+    if the size can't be determined without reading it.
+    """
+    try:
+        position = handle.tell()
+        handle.seek(0, 2)
+        size = handle.tell()
+        handle.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return size - position
+
 
 class IgnoreAttribute:
     """
@@ -76,12 +167,101 @@ class StUF(Soap11):
             return self.null_to_parent(ctx, cls, inst, parent, ns, *args, **kwargs)
         return super().to_parent(ctx, cls, inst, parent, ns, *args, **kwargs)
 
+    def null_to_parent(self, ctx, cls, inst, parent, ns, *args, **kwargs):
+        """
+        According to the StUF standard, all elements with xsi:nil="true" should
+        also have the attribute StUF:noValue="geenWaarde".
+        """
+        ret = super().null_to_parent(ctx, cls, inst, parent, ns, *args, **kwargs)
+        if issubclass(cls, XmlAttribute):
+            return ret
+
+        # The nil element is the last appended child, or the parent itself in
+        # case of `XmlData`.
+        elements = [parent[-1], parent] if len(parent) else [parent]
+        for element in elements:
+            if element.get(XSI('nil')) == 'true':
+                element.set(NO_VALUE_ATTR, 'geenWaarde')
+        return ret
+
     def from_element(self, ctx, cls, element):
         if bool(element.get(XSI('nil'))):
             attributes = dict([(key[key.find('}') + 1:], value) for key, value in element.attrib.items()])
             return Nil(**attributes)
         return super().from_element(ctx, cls, element)
 
+    def file_from_bytes(self, cls, value, suggested_encoding=None):
+        """
+        Decode the content of a document to a temporary file, instead of
+        holding the decoded content in memory next to the request. The file
+        is kept in memory up to `ZAAKMAGAZIJN_CONTENT_SPOOL_SIZE`.
+        """
+        encoding = self.get_cls_attrs(cls).encoding
+        if encoding is BINARY_ENCODING_USE_DEFAULT:
+            encoding = suggested_encoding
+        if encoding is not BINARY_ENCODING_BASE64:
+            return super().file_from_bytes(cls, value, suggested_encoding)
+
+        handle = tempfile.SpooledTemporaryFile(max_size=settings.ZAAKMAGAZIJN_CONTENT_SPOOL_SIZE)
+        try:
+            decode_base64(value, handle)
+        except (binascii.Error, ValueError):
+            handle.close()
+            raise ValidationError(None, 'The content is not valid base64.')
+
+        handle.seek(0)
+        return File.Value(handle=handle)
+
+    def xmldata_to_parent(self, ctx, cls, inst, parent, ns, name, **kwargs):
+        """
+        Encode the content of a document in chunks, instead of reading it
+        completely first. Content larger than
+        `ZAAKMAGAZIJN_CONTENT_STREAM_SIZE` is not added to the document at
+        all: a placeholder is added instead, which is replaced by the content
+        while the response is sent, see `create_out_string`.
+        """
+        handle = get_content_handle(inst)
+        if not issubclass(cls.type, File) or handle is None or len(parent):
+            return super().xmldata_to_parent(ctx, cls, inst, parent, ns, name, **kwargs)
+
+        size = get_content_size(handle)
+        if size is not None and size <= settings.ZAAKMAGAZIJN_CONTENT_STREAM_SIZE:
+            parent.text = b''.join(iter_base64(handle))
+            return
+
+        placeholder = 'streamed-content-{}'.format(uuid.uuid4().hex)
+        streamed_content = getattr(ctx.outprot_ctx, 'streamed_content', None)
+        if streamed_content is None:
+            streamed_content = ctx.outprot_ctx.streamed_content = {}
+        streamed_content[placeholder.encode('ascii')] = handle
+        parent.text = placeholder
+
+    def create_out_string(self, ctx, charset=None):
+        super().create_out_string(ctx, charset)
+
+        streamed_content = getattr(ctx.outprot_ctx, 'streamed_content', None)
+        if streamed_content:
+            document = b''.join(ctx.out_string)
+            # Without a length, the response is streamed, see `zaakmagazijn.api.views`.
+            ctx.out_string = self._iter_streamed_content(document, streamed_content)
+
+    def _iter_streamed_content(self, document, streamed_content):
+        """
+        Yield the serialized document, with the placeholders replaced by the
+        encoded content.
+        """
+        position = 0
+        placeholders = re.compile(b'|'.join(re.escape(placeholder) for placeholder in streamed_content))
+        for match in placeholders.finditer(document):
+            yield document[position:match.start()]
+            handle = streamed_content[match.group()]
+            try:
+                yield from iter_base64(handle)
+            finally:
+                handle.close()
+            position = match.end()
+        yield document[position:]
+
 
 class StUFSynchronous(StUF):
     """
@@ -119,9 +299,8 @@ class StUFSynchronous(StUF):
             # No need to make a copy. We're not removing anything.
             payload_copy = payload
 
-        xsd_path = os.path.join(settings.ZAAKMAGAZIJN_ZDS_PATH, 'zds0120_msg_zs-dms_resolved2017.xsd')
-        xmlschema = etree.XMLSchema(file=xsd_path)
-        ret = xmlschema.validate(payload_copy)
+        with performance_recorder.phase('validation'):
+            ret, xmlschema = schema_cache.validate(get_zds_xsd_path(), payload_copy)
 
         logger.debug("Validated ? %r" % ret)
         if not ret:
@@ -130,6 +309,8 @@ class StUFSynchronous(StUF):
                                                            'xmlcharrefreplace'))
 
     def schema_validation_error_to_parent(self, ctx, cls, inst, parent, ns, **_):
+        from ..utils import get_operation_name  # circular import
+
         fault_cls = ctx.app.FAULT_CLASS
 
         # We've got no clue what the stuurgegevens are of the 'zender' at this point. We could improve
@@ -143,6 +324,7 @@ class StUFSynchronous(StUF):
             ClientFoutChoices.stuf055, html.fromstring(inst.faultstring).text, ctx.service_class, stuurgegevens_zender
         )
         inst.detail = stuf_fault.detail
+        stuf_faults.inc(operation=get_operation_name(ctx), code=stuf_fault.stuf_code)
 
         subelts = [
             E("faultcode", '%s:%s' % (self.soap_env, stuf_fault.faultcode)),
@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+ZDS_XSD_FILENAME = 'zds0120_msg_zs-dms_resolved2017.xsd'
+
+
+class SchemaStatistics:
+    """
+    Simple counters to see how often a schema is compiled and used, and how
+    much time is spent doing so.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.compile_count = 0
+            self.compile_time = 0.0
+            self.validate_count = 0
+            self.validate_time = 0.0
+
+    def add_compile(self, duration):
+        with self._lock:
+            self.compile_count += 1
+            self.compile_time += duration
+
+    def add_validate(self, duration):
+        with self._lock:
+            self.validate_count += 1
+            self.validate_time += duration
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'compile_count': self.compile_count,
+                'compile_time': self.compile_time,
+                'validate_count': self.validate_count,
+                'validate_time': self.validate_time,
+            }
+
+
+class SchemaCache:
+    """
+    Keeps compiled XSD schemas around so they only need to be compiled once.
+
+    Compiling the resolved ZDS XSD takes far longer than validating a message
+    against it. A compiled `etree.XMLSchema` stores the errors of the last
+    validation on the instance itself, so instances are not shared between
+    threads: each thread compiles its own copy once. A schema is recompiled
+    when the modification time of the XSD file changes.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self.statistics = SchemaStatistics()
+
+    def _get_schemas(self):
+        schemas = getattr(self._local, 'schemas', None)
+        if schemas is None:
+            schemas = self._local.schemas = {}
+        return schemas
+
+    def get(self, path):
+        """
+        Return the compiled schema for the XSD file at `path`.
+
+        :param path: The absolute path to the XSD file.
+        :return: An `etree.XMLSchema` instance.
+        """
+        schemas = self._get_schemas()
+        mtime = os.path.getmtime(path)
+
+        cached = schemas.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        start = time.time()
+        xmlschema = etree.XMLSchema(file=path)
+        duration = time.time() - start
+        self.statistics.add_compile(duration)
+
+        logger.debug('Compiled XSD %s in %.3f seconds.', path, duration)
+        schemas[path] = (mtime, xmlschema)
+        return xmlschema
+
+    def validate(self, path, document):
+        """
+        Validate the `document` against the XSD file at `path`.
+
+        :param path: The absolute path to the XSD file.
+        :param document: The `etree.Element` to validate.
+        :return: A 2-tuple of the validation result and the used schema, to
+            inspect the error log.
+        """
+        xmlschema = self.get(path)
+
+        start = time.time()
+        ret = xmlschema.validate(document)
+        self.statistics.add_validate(time.time() - start)
+
+        return ret, xmlschema
+
+    def clear(self):
+        """
+        Clear the compiled schemas of the current thread.
+        """
+        self._get_schemas().clear()
+
+
+schema_cache = SchemaCache()
+
+
+def get_zds_xsd_path():
+    return os.path.join(settings.ZAAKMAGAZIJN_ZDS_PATH, ZDS_XSD_FILENAME)
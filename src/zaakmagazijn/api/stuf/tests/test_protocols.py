@@ -0,0 +1,141 @@
+import base64
+import binascii
+import tracemalloc
+from io import BytesIO
+from unittest import skipUnless
+
+from django.test import SimpleTestCase, override_settings
+
+from spyne.error import ValidationError
+from spyne.model.binary import BINARY_ENCODING_BASE64, ByteArray, File
+
+from zaakmagazijn.utils.tests import should_run_benchmarks
+
+from ..models import BinaireInhoud
+from ..protocols import StUF, decode_base64, get_content_size, iter_base64
+
+
+class Base64Tests(SimpleTestCase):
+    content = bytes(range(256)) * 10
+
+    def test_iter_base64(self):
+        for chunk_size in [1, 2, 3, 100, 5000]:
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(iter_base64(BytesIO(self.content), chunk_size=chunk_size))
+                self.assertEqual(b''.join(chunks), base64.b64encode(self.content))
+
+    def test_iter_base64_empty(self):
+        self.assertEqual(list(iter_base64(BytesIO())), [])
+
+    def test_decode_base64(self):
+        encoded = base64.encodebytes(self.content)
+        self.assertIn(b'\n', encoded)
+
+        for value in [encoded, encoded.decode('ascii')]:
+            for chunk_size in [1, 3, 4, 100, 5000]:
+                with self.subTest(value=type(value), chunk_size=chunk_size):
+                    handle = BytesIO()
+                    decode_base64(value, handle, chunk_size=chunk_size)
+                    self.assertEqual(handle.getvalue(), self.content)
+
+    def test_decode_invalid_base64(self):
+        for value in ['Zm9v!', 'Zm9vY']:
+            with self.subTest(value=value):
+                with self.assertRaises(binascii.Error):
+                    decode_base64(value, BytesIO())
+
+    def test_get_content_size(self):
+        handle = BytesIO(b'foobar')
+        handle.read(2)
+
+        self.assertEqual(get_content_size(handle), 4)
+        self.assertEqual(handle.read(), b'obar')
+        self.assertIsNone(get_content_size(object()))
+
+
+class StUFFileTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.protocol = StUF()
+
+    def test_file_from_bytes(self):
+        value = self.protocol.file_from_bytes(File, base64.b64encode(b'foobar').decode('ascii'), BINARY_ENCODING_BASE64)
+
+        self.assertIsNone(value.data)
+        self.assertEqual(value.handle.read(), b'foobar')
+
+    @override_settings(ZAAKMAGAZIJN_CONTENT_SPOOL_SIZE=4)
+    def test_file_from_bytes_spooled(self):
+        value = self.protocol.file_from_bytes(File, base64.b64encode(b'foobar').decode('ascii'), BINARY_ENCODING_BASE64)
+
+        self.assertTrue(value.handle._rolled)
+        self.assertEqual(value.handle.read(), b'foobar')
+
+    def test_file_from_invalid_bytes(self):
+        with self.assertRaises(ValidationError):
+            self.protocol.file_from_bytes(File, 'Zm9v!', BINARY_ENCODING_BASE64)
+
+    def test_to_cmis(self):
+        value = self.protocol.file_from_bytes(File, base64.b64encode(b'foobar').decode('ascii'), BINARY_ENCODING_BASE64)
+        value.handle.read()
+
+        content = BinaireInhoud(data=value).to_cmis()
+        self.assertIs(content, value.handle)
+        self.assertEqual(content.read(), b'foobar')
+
+    def test_to_cmis_data(self):
+        content = BinaireInhoud(data=File.Value(data=BytesIO(b'foobar'))).to_cmis()
+        self.assertEqual(content.read(), b'foobar')
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class StUFFileBenchmarkTests(SimpleTestCase):
+    """
+    Measure the peak memory used to decode and encode the content of a 100 MB
+    document, besides the request and the content itself.
+    """
+    size = 100 * 1024 * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.content = b'\x00\xff' * (cls.size // 2)
+        cls.encoded = base64.encodebytes(cls.content).decode('ascii')
+
+    def _measure(self, func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def _print(self, name, new, old):
+        print('\n{}\nNew: {:.1f} MB\nOld: {:.1f} MB'.format(name, new / 1024 / 1024, old / 1024 / 1024))
+
+    def test_decode(self):
+        protocol = StUF()
+
+        def new():
+            value = protocol.file_from_bytes(File, self.encoded, BINARY_ENCODING_BASE64)
+            BinaireInhoud(data=value).to_cmis().close()
+
+        def old():
+            value = File.Value(data=ByteArray.from_base64(self.encoded))
+            value.rollover()
+            value.handle.seek(0)
+            BytesIO(value.handle.read()).close()
+
+        self._print('Decode', self._measure(new), self._measure(old))
+
+    def test_encode(self):
+        def new():
+            for chunk in iter_base64(BytesIO(self.content)):
+                pass
+
+        def old():
+            ByteArray.to_base64((BytesIO(self.content).read(), )).decode('ascii')
+
+        self._print('Encode', self._measure(new), self._measure(old))
@@ -0,0 +1,66 @@
+import os
+import threading
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase
+
+from lxml import etree
+
+from ..schemas import SchemaCache
+
+XSD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="{}" type="xs:string"/>
+</xs:schema>
+"""
+
+
+class SchemaCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.tempdir = TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+        self.path = os.path.join(self.tempdir.name, 'test.xsd')
+        self._write_xsd('foo', mtime=1000)
+
+        self.cache = SchemaCache()
+
+    def _write_xsd(self, element_name, mtime):
+        with open(self.path, 'w') as f:
+            f.write(XSD_TEMPLATE.format(element_name))
+        os.utime(self.path, (mtime, mtime))
+
+    def test_compiled_once(self):
+        ret1, schema1 = self.cache.validate(self.path, etree.fromstring('<foo>bar</foo>'))
+        ret2, schema2 = self.cache.validate(self.path, etree.fromstring('<bar>foo</bar>'))
+
+        self.assertTrue(ret1)
+        self.assertFalse(ret2)
+        self.assertIs(schema1, schema2)
+
+        stats = self.cache.statistics.as_dict()
+        self.assertEqual(stats['compile_count'], 1)
+        self.assertEqual(stats['validate_count'], 2)
+
+    def test_recompiled_when_file_changes(self):
+        schema1 = self.cache.get(self.path)
+        self._write_xsd('bar', mtime=2000)
+        schema2 = self.cache.get(self.path)
+
+        self.assertIsNot(schema1, schema2)
+        self.assertTrue(schema2.validate(etree.fromstring('<bar>foo</bar>')))
+        self.assertEqual(self.cache.statistics.compile_count, 2)
+
+    def test_schema_per_thread(self):
+        schemas = []
+
+        def target():
+            schemas.append(self.cache.get(self.path))
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(self.cache.get(self.path), schemas[0])
@@ -9,7 +9,6 @@ from collections import OrderedDict
 from datetime import datetime, timedelta
 from tempfile import NamedTemporaryFile
 
-from django.conf import settings
 from django.template import Context, Template
 from django.test import LiveServerTestCase as _LiveServerTestCase
 from django.test.utils import override_settings
@@ -24,6 +23,7 @@ from zeep.xsd import CompoundValue
 from ...cmis.tests.mocks import MockDMSMixin
 from ...utils import stuf_datetime
 from ..stuf.constants import STUF_XML_NS, ZDS_XML_NS, ZKN_XML_NS
+from ..stuf.schemas import get_zds_xsd_path, schema_cache
 from .utils import sort_xml_attributes
 
 logger = logging.getLogger(__name__)
@@ -205,12 +205,9 @@ class BaseSoapTests(StUFMixin, XmlHelperMixin, MockDMSMixin, LiveServerTestCase)
         # Reset the cached WSDL since it might contain the URL of
         # the other LiveServerTestCase (which uses a different port)
         from zaakmagazijn.api import views
-        from spyne.interface import AllYourInterfaceDocuments
 
-        # TODO [TECH]: Find a proper way to get all the WSDLs
-        for view in [views.verwerksynchroonvrijbericht_view, views.beantwoordvraag_view, views.ontvangasynchroon_view]:
-            view.__wrapped__._wsdl = None
-            view.__wrapped__.doc = AllYourInterfaceDocuments(view.__wrapped__.app.interface)
+        for server in [views.verwerksynchroonvrijbericht_server, views.beantwoordvraag_server, views.ontvangasynchroon_server]:
+            server.reset()
 
         return Client('{}/{}/?WSDL'.format(self.live_server_url, soap_port), **kwargs)
 
@@ -252,9 +249,8 @@ class BaseTestPlatformTests(StUFMixin, XmlHelperMixin, MockDMSMixin, LiveServerT
         for el in soap_body.xpath('//gml:*', namespaces=self.nsmap):
             el.getparent().remove(el)
 
-        xsd_path = os.path.join(settings.ZAAKMAGAZIJN_ZDS_PATH, 'zds0120_msg_zs-dms_resolved2017.xsd')
-        xmlschema = etree.XMLSchema(file=xsd_path)
-        returncode = 0 if xmlschema.validate(soap_body[0]) else 1
+        ret, xmlschema = schema_cache.validate(get_zds_xsd_path(), soap_body[0])
+        returncode = 0 if ret else 1
 
         if returncode != 0 and not msg:
             msg = '; '.join(map(str, xmlschema.error_log.filter_from_errors()))
@@ -402,12 +398,9 @@ class BaseTestPlatformTests(StUFMixin, XmlHelperMixin, MockDMSMixin, LiveServerT
         # Reset the cached WSDL since it might contain the URL of
         # the other LiveServerTestCase (which uses a different port)
         from zaakmagazijn.api import views
-        from spyne.interface import AllYourInterfaceDocuments
 
-        # TODO [TECH]: Find a proper way to get all the WSDLs
-        for view in [views.verwerksynchroonvrijbericht_view, views.beantwoordvraag_view]:
-            view.__wrapped__._wsdl = None
-            view.__wrapped__.doc = AllYourInterfaceDocuments(view.__wrapped__.app.interface)
+        for server in [views.verwerksynchroonvrijbericht_server, views.beantwoordvraag_server]:
+            server.reset()
 
         # Maybe a bit too overkill.
         headers = {
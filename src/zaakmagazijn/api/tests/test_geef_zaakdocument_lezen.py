@@ -250,6 +250,26 @@ class geefZaakdocumentLezen_EdcLa01Tests(DMSMockMixin, BaseSoapTests):
         self.assertEqual(inhoud.attrib['{{{}}}bestandsnaam'.format(STUF_XML_NS)], 'doc 1')
         self._dms_client.geef_inhoud.assert_called_once_with(self.document)
 
+    @override_settings(ZAAKMAGAZIJN_CONTENT_STREAM_SIZE=4)
+    def test_read_file_dms_streamed(self):
+        """
+        Assert that large files are streamed in the response.
+        """
+        ZaakInformatieObjectFactory.create(zaak=self.zaak, informatieobject=self.document)
+        self._dms_client.geef_inhoud.return_value = ('doc 1', BytesIO(b'foobarbaz'))
+
+        response = self._do_simple_request(raw_response=True)
+
+        self.assertNotIn('Content-Length', response.headers)
+        root = etree.fromstring(response.content)
+        body_root = self._get_body_root(root)
+        inhoud = body_root.xpath('zkn:antwoord/zkn:object/zkn:inhoud', namespaces=self.nsmap)[0]
+        self.assertEqual(
+            inhoud.text,
+            base64.b64encode(b'foobarbaz').decode('utf-8')
+        )
+        self.assertEqual(inhoud.attrib['{{{}}}bestandsnaam'.format(STUF_XML_NS)], 'doc 1')
+
     def test_namespace_response(self):
         """
         Verify that the namespace of the response is as expected.
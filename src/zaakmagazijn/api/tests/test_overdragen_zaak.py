@@ -20,12 +20,9 @@ class STPoverdragenZaak_Du01Tests(BaseTestPlatformTests):
         # Reset the cached WSDL since it might contain the URL of
         # the other LiveServerTestCase (which uses a different port)
         from zaakmagazijn.api import views
-        from spyne.interface import AllYourInterfaceDocuments
 
-        # TODO [TECH]: Find a proper way to get all the WSDLs
-        for view in [views.ontvangasynchroon_view]:
-            view.__wrapped__._wsdl = None
-            view.__wrapped__.doc = AllYourInterfaceDocuments(view.__wrapped__.app.interface)
+        for server in [views.ontvangasynchroon_server]:
+            server.reset()
 
         self.ontvanger = ApplicationFactory(name='TTA', organisation__name='ORG')
 
@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from ...rgbz_mapping.models import ZaakProxy
+from ..services.geef_zaak_details import GeefZaakdetails, ZaakEntiteit
+from ..stuf.utils import get_spyne_field
+from ..zds.plans import get_entiteit_plan
+
+
+class EntiteitPlanTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.spyne_model = get_spyne_field(GeefZaakdetails.output_model, 'antwoord/object')
+
+    def test_plan_is_cached(self):
+        plan1 = get_entiteit_plan(ZaakEntiteit, self.spyne_model)
+        plan2 = get_entiteit_plan(ZaakEntiteit, self.spyne_model)
+
+        self.assertIs(plan1, plan2)
+
+    def test_fields_match_django_field_mapping(self):
+        plan = get_entiteit_plan(ZaakEntiteit, self.spyne_model)
+
+        self.assertEqual(
+            [(field.field_name, field.django_field_name) for field in plan.fields],
+            [(field_name, django_field_name)
+             for field_name, django_field_name, _unused in ZaakEntiteit.get_django_field_mapping()]
+        )
+        self.assertTrue(plan.is_entiteit)
+        self.assertEqual(plan.mnemonic, 'ZAK')
+
+
+class ModelProxyGetFieldTests(SimpleTestCase):
+    def test_get_field_mapping_is_cached(self):
+        field = ZaakProxy.get_field('zaakidentificatie')
+
+        self.assertEqual(field.rgbz1_name, 'zaakidentificatie')
+        self.assertIs(ZaakProxy.__dict__['_field_mapping']['zaakidentificatie'], field)
+
+    def test_get_field_unknown(self):
+        with self.assertRaises(ValueError):
+            ZaakProxy.get_field('does_not_exist')
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ...rgbz.choices import Rolomschrijving
+from ...rgbz.tests.factory_models import (
+    NatuurlijkPersoonFactory, RolFactory, StatusFactory
+)
+from ...rgbz_mapping.models import ZaakProxy
+from ..services.geef_zaak_details import (
+    GeefZaakdetails, ZaakEntiteit, output_builder
+)
+from ..stuf.protocols import IgnoreAttribute
+from ..zds.prefetch import PrefetchPlanner, get_prefetch_attr
+
+
+class ScopeAlles:
+    scope = 'alles'
+
+
+class PrefetchPlannerTests(TestCase):
+    def _create_zaak(self):
+        status = StatusFactory.create(rol__betrokkene=NatuurlijkPersoonFactory.create())
+        RolFactory.create(
+            zaak=status.zaak, betrokkene=NatuurlijkPersoonFactory.create(),
+            rolomschrijving=Rolomschrijving.initiator)
+        RolFactory.create(
+            zaak=status.zaak, betrokkene=NatuurlijkPersoonFactory.create(),
+            rolomschrijving=Rolomschrijving.belanghebbende)
+        return status.zaak
+
+    def _create_object_data(self):
+        return output_builder.create_object_data(
+            filter_obj=None, scope_obj=ScopeAlles(), parameters_obj=None,
+            queryset=ZaakProxy.objects.all(), output_model=GeefZaakdetails.output_model)
+
+    def test_plan_filtered_relation(self):
+        plan = PrefetchPlanner().plan(ZaakEntiteit, ZaakProxy, ScopeAlles())
+
+        prefetch_to = [prefetch.prefetch_to for prefetch in plan.prefetch_related]
+        self.assertIn(get_prefetch_attr('heeft_als_initiator'), prefetch_to)
+        self.assertIn(get_prefetch_attr('status_set'), prefetch_to)
+        self.assertIn('zaaktype', plan.select_related)
+
+    def test_plan_without_scope(self):
+        plan = PrefetchPlanner().plan(ZaakEntiteit, ZaakProxy, None)
+
+        self.assertEqual(plan.prefetch_related, [])
+
+    def test_prefetched_initiator(self):
+        zaak = self._create_zaak()
+        initiator = zaak.rol_set.get(rolomschrijving=Rolomschrijving.initiator)
+
+        data = self._create_object_data()
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(len(data[0]['heeftAlsInitiator']), 1)
+        self.assertEqual(
+            data[0]['heeftAlsInitiator'][0]['gerelateerde']['natuurlijkPersoon']['inp.bsn'],
+            initiator.betrokkene.natuurlijkpersoon.burgerservicenummer
+        )
+        self.assertIsInstance(data[0]['heeftAlsUitvoerende'], IgnoreAttribute)
+
+    def test_number_of_queries_is_fixed(self):
+        self._create_zaak()
+        with CaptureQueriesContext(connection) as context:
+            self._create_object_data()
+        num_queries = len(context.captured_queries)
+
+        self._create_zaak()
+        self._create_zaak()
+        with self.assertNumQueries(num_queries):
+            data = self._create_object_data()
+
+        self.assertEqual(len(data), 3)
@@ -0,0 +1,128 @@
+import time
+from unittest import skipUnless
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from lxml import etree
+from spyne.const.xml import XSI
+from spyne.model.complex import ComplexModel
+from spyne.model.primitive import Unicode
+from zeep.xsd.const import Nil
+
+from ...rgbz.choices import JaNee
+from ...rgbz.tests.factory_models import (
+    ZaakFactory, ZaakInformatieObjectFactory
+)
+from ...utils.tests import should_run_benchmarks
+from ..rewrite_engine import RewriteEngine
+from ..stuf.constants import STUF_XML_NS, ZKN_XML_NS
+from ..stuf.protocols import StUF
+from .base import BaseSoapTests
+
+
+class NoValueModel(ComplexModel):
+    __namespace__ = ZKN_XML_NS
+
+    leeg = Unicode.customize(min_occurs=0, nillable=True)
+    gevuld = Unicode
+
+
+class NoValueTests(SimpleTestCase):
+    def test_no_value_during_serialization(self):
+        parent = etree.Element('root')
+        StUF().to_parent(None, NoValueModel, NoValueModel(leeg=None, gevuld='waarde'), parent, ZKN_XML_NS, 'object')
+
+        leeg = parent.find('{{{ns}}}object/{{{ns}}}leeg'.format(ns=ZKN_XML_NS))
+        self.assertEqual(leeg.get(XSI('nil')), 'true')
+        self.assertEqual(leeg.get('{{{}}}noValue'.format(STUF_XML_NS)), 'geenWaarde')
+
+        gevuld = parent.find('{{{ns}}}object/{{{ns}}}gevuld'.format(ns=ZKN_XML_NS))
+        self.assertIsNone(gevuld.get('{{{}}}noValue'.format(STUF_XML_NS)))
+
+
+class RewriteTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.response = HttpResponse(b'<root/>', content_type='text/xml')
+        self.view = RewriteEngine.rewrite(lambda request: self.response)
+
+    @override_settings(ZAAKMAGAZIJN_STUF_TESTPLATFORM=False)
+    def test_response_untouched(self):
+        request = RequestFactory().post('/', data=b'<root/>', content_type='text/xml')
+
+        self.assertIs(self.view(request), self.response)
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class RewriteBenchmarkTests(BaseSoapTests):
+    """
+    Compare serializing a large response with and without the former
+    post-processing step (parse, add noValue, serialize again).
+    """
+    number_of_documents = 500
+    repeat = 5
+
+    def setUp(self):
+        super().setUp()
+
+        self.zaak = ZaakFactory.create(status_set__indicatie_laatst_gezette_status=JaNee.ja)
+        for i in range(self.number_of_documents):
+            ZaakInformatieObjectFactory.create(zaak=self.zaak)
+
+    def _do_request(self, client):
+        stuf_factory, zkn_factory, zds_factory = self._get_type_factories(client)
+
+        with client.options(raw_response=True):
+            return client.service.geefLijstZaakdocumenten_ZakLv01(
+                stuurgegevens=stuf_factory['ZAK-StuurgegevensLv01'](
+                    berichtcode='Lv01',
+                    entiteittype='ZAK',
+                ),
+                parameters=stuf_factory['ZAK-parametersVraagSynchroon'](
+                    sortering=1,
+                    indicatorVervolgvraag=False
+                ),
+                scope={
+                    'object': zkn_factory['GeefLijstZaakDocumenten-ZAK-vraagScope'](
+                        entiteittype='ZAK',
+                        identificatie=Nil,
+                        heeftRelevant=zkn_factory['ZAKEDC-basis'](**{
+                            'entiteittype': 'ZAKEDC',
+                            'titel': Nil,
+                            'beschrijving': Nil,
+                            'gerelateerde': zkn_factory['EDC-basis'](**{
+                                'entiteittype': 'EDC',
+                                'identificatie': Nil,
+                                'creatiedatum': Nil,
+                                'titel': Nil,
+                                'link': Nil,
+                            }),
+                        })
+                    )
+                },
+                gelijk=zkn_factory['GeefLijstZaakDocumenten-ZAK-vraagSelectie'](
+                    entiteittype='ZAK',
+                    identificatie=self.zaak.zaakidentificatie,
+                )
+            )
+
+    def test_benchmark(self):
+        client = self._get_client('BeantwoordVraag')
+
+        request_time = 0.0
+        rewrite_time = 0.0
+        for i in range(self.repeat):
+            start = time.perf_counter()
+            response = self._do_request(client)
+            request_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            RewriteEngine.rewrite_response(response.content)
+            rewrite_time += time.perf_counter() - start
+
+        print('\nResponse size: {} bytes'.format(len(response.content)))
+        print('New (serialization only): {:.3f}s per request'.format(request_time / self.repeat))
+        print('Old (serialization and rewrite): {:.3f}s per request'.format(
+            (request_time + rewrite_time) / self.repeat))
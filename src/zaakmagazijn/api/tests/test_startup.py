@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from ...utils.tests import should_run_benchmarks
+from ..applications import get_application
+from ..views import LazyServer
+
+# Runs in a new process, so the modules are not imported yet.
+SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+
+import django
+django.setup()
+
+from django.test import RequestFactory
+
+result = {'imports': []}
+for module in sys.argv[2:]:
+    module_start = time.perf_counter()
+    __import__(module)
+    result['imports'].append((module, time.perf_counter() - module_start))
+
+from zaakmagazijn.api import views
+
+result['services'] = sorted(name for name in sys.modules if name.startswith('zaakmagazijn.api.services.'))
+if sys.argv[1]:
+    request = RequestFactory().get('/{}/'.format(sys.argv[1]), {'wsdl': ''})
+    status_code = getattr(views, '{}_view'.format(sys.argv[1].lower()))(request).status_code
+    result['first_request'] = time.perf_counter() - start
+    result['first_request_status_code'] = status_code
+    result['services_after_request'] = sorted(
+        name for name in sys.modules if name.startswith('zaakmagazijn.api.services.'))
+
+print(json.dumps(result))
+"""
+
+
+def run_startup(endpoint='', modules=('zaakmagazijn.urls', )) -> dict:
+    """
+    Start a new process that imports :param:`modules` and, if given, requests
+    the WSDL of :param:`endpoint`.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT, endpoint] + list(modules), env=env, universal_newlines=True)
+    return json.loads(output.splitlines()[-1])
+
+
+class LazyApplicationTests(SimpleTestCase):
+    def test_get_application(self):
+        app = get_application('beantwoordvraag')
+
+        self.assertIs(get_application('beantwoordvraag'), app)
+        self.assertEqual(app.name, 'Beantwoordvraag')
+
+    def test_lazy_server(self):
+        lazy_server = LazyServer('beantwoordvraag', wsdl_filename='zds0120_beantwoordVraag_zs-dms.wsdl')
+        self.assertIsNone(lazy_server._server)
+
+        server = lazy_server.server
+        self.assertIs(lazy_server.server, server)
+        self.assertIs(server.app, get_application('beantwoordvraag'))
+
+        lazy_server.reset()
+        self.assertIsNot(lazy_server.server, server)
+
+    def test_services_are_imported_on_first_request(self):
+        result = run_startup('BeantwoordVraag')
+
+        self.assertEqual(result['services'], [])
+        self.assertEqual(result['first_request_status_code'], 200)
+        self.assertIn('zaakmagazijn.api.services.geef_zaak_details', result['services_after_request'])
+        self.assertNotIn('zaakmagazijn.api.services.creeer_zaak', result['services_after_request'])
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class StartupBenchmarkTests(SimpleTestCase):
+    """
+    Measure the import time of the modules of the API, and the time from the
+    start of a process to the response of the first request to an endpoint.
+    """
+    def test_import_time(self):
+        modules = [
+            'zaakmagazijn.api.stuf',
+            'zaakmagazijn.api.zds',
+            'zaakmagazijn.api.applications',
+            'zaakmagazijn.urls',
+        ]
+        # Every service separately, which is what creating all applications costs.
+        services_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services')
+        modules += [
+            'zaakmagazijn.api.services.{}'.format(os.path.splitext(filename)[0])
+            for filename in sorted(os.listdir(services_dir))
+            if filename.endswith('.py') and filename != '__init__.py'
+        ]
+
+        result = run_startup(modules=modules)
+
+        print('\nImport time (excluding the modules imported before)')
+        for module, duration in result['imports']:
+            print('{:<60} {:8.1f} ms'.format(module, duration * 1000))
+        print('{:<60} {:8.1f} ms'.format('Total', sum(duration for module, duration in result['imports']) * 1000))
+
+    def test_time_to_first_request(self):
+        print('\nTime to the first request, from the start of the process')
+        for endpoint in ['BeantwoordVraag', 'VerwerkSynchroonVrijBericht', 'OntvangAsynchroon']:
+            results = [run_startup(endpoint) for i in range(3)]
+            self.assertEqual({result['first_request_status_code'] for result in results}, {200})
+            print('{:<30} {:8.1f} ms'.format(endpoint, min(result['first_request'] for result in results) * 1000))
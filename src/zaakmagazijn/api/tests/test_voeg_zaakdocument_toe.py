@@ -240,7 +240,7 @@ class voegZaakdocumentToe_EdcLk01Tests(DMSMockMixin, BaseSoapTests):
         kwargs = self._service_dms_client.maak_zaakdocument_met_inhoud.call_args[1]
         content_type = kwargs['content_type']
         filename = kwargs['filename']
-        bytes = kwargs['stream'].getvalue()
+        bytes = kwargs['stream'].read()
 
         self.assertEqual(document, EnkelvoudigInformatieObject.objects.get())
         self.assertEqual(filename, 'to_be_everywhere.flac')
@@ -299,7 +299,7 @@ class STPvoegZaakdocumentToe_EdcLk01Tests(DMSMockMixin, BaseTestPlatformTests):
         sender = kwargs['sender']
         content_type = kwargs['content_type']
         filename = kwargs['filename']
-        bytes = kwargs['stream'].getvalue()
+        bytes = kwargs['stream'].read()
 
         self.assertEqual(document, zio.informatieobject.enkelvoudiginformatieobject)
         self.assertEqual(sender, 'STP')
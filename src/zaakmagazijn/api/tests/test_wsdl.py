@@ -1,8 +1,16 @@
+import gzip
+import os
+import shutil
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase
 from django.test.utils import override_settings
 
 import requests
 from lxml import etree
 
+from ..wsdl import WSDLCache, wsdl_cache
 from .base import BaseSoapTests
 
 
@@ -77,3 +85,79 @@ class WSDLTests(BaseSoapTests):
         self.assertGreaterEqual(len(schema_imports), 1)
         for element in schema_imports:
             self.assertTrue(element.attrib['schemaLocation'].startswith('http://zds-url'))
+
+
+class WSDLCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.tempdir = TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+        self.path = os.path.join(self.tempdir.name, 'test.wsdl')
+        shutil.copy(
+            os.path.join(settings.ZAAKMAGAZIJN_ZDS_PATH, 'zds0120_beantwoordVraag_zs-dms.wsdl'), self.path)
+        os.utime(self.path, (1000, 1000))
+
+        self.cache = WSDLCache()
+
+    def test_rewritten_once(self):
+        wsdl1 = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+        wsdl2 = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+
+        self.assertIs(wsdl1, wsdl2)
+        self.assertIn(b'http://zaakmagazijn-url', wsdl1.content)
+
+    def test_per_url(self):
+        wsdl1 = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+        wsdl2 = self.cache.get(self.path, 'http://zds-url', 'http://other-url')
+
+        self.assertIsNot(wsdl1, wsdl2)
+        self.assertIn(b'http://other-url', wsdl2.content)
+
+    def test_file_changed(self):
+        wsdl1 = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+        os.utime(self.path, (2000, 2000))
+        wsdl2 = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+
+        self.assertIsNot(wsdl1, wsdl2)
+        self.assertEqual(wsdl2.last_modified, 2000)
+
+    def test_not_modified(self):
+        wsdl = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+
+        response = wsdl.get_response(RequestFactory().get('/', HTTP_IF_NONE_MATCH=wsdl.etag))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], wsdl.etag)
+
+    def test_gzip(self):
+        wsdl = self.cache.get(self.path, 'http://zds-url', 'http://zaakmagazijn-url')
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        response = wsdl.get_response(request, allow_gzip=True)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), wsdl.content)
+        self.assertEqual(response['ETag'], wsdl.gzip_etag)
+
+        response = wsdl.get_response(request, allow_gzip=False)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, wsdl.content)
+
+
+class WSDLConditionalTests(BaseSoapTests):
+    def setUp(self):
+        super().setUp()
+
+        wsdl_cache.clear()
+
+    def test_etag(self):
+        url = '{}/BeantwoordVraag/?WSDL'.format(self.live_server_url)
+        response = requests.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+        response = requests.get(url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
@@ -17,6 +17,17 @@ def create_unique_id(data=None):
     return '{}{}'.format(gemeente_code, str(uuid.uuid4()))
 
 
+def get_operation_name(ctx) -> str:
+    """
+    Return the name of the operation called, as in
+    `ServiceOperation.operation_name`, or an empty string if the request could
+    not be parsed.
+    """
+    if not ctx.method_request_string:
+        return ''
+    return etree.QName(ctx.method_request_string).localname
+
+
 def get_enkelvoudig_informatie_object_or_fault(identificatie: str) -> EnkelvoudigDocumentProxy:
     """
     Retrieve the EnkelvoudigDocumentProxy belonging to :param:`identificatie`, or
@@ -1,18 +1,18 @@
 
 import os.path
+import threading
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from spyne.server.django import DjangoApplication as _DjangoApplication
 
-from .applications import (
-    beantwoordvraag_app, ontvangasynchroon_app,
-    verwerksynchroonvrijbericht_app
-)
+from ..utils.performance import performance_recorder
+from .applications import get_application
 from .rewrite_engine import RewriteEngine
-from .utils import rewrite_wsdl
+from .utils import get_operation_name
+from .wsdl import wsdl_cache
 
 
 class DjangoApplication(_DjangoApplication):
@@ -27,12 +27,108 @@ class DjangoApplication(_DjangoApplication):
         if self.is_wsdl_request(environ):
             if settings.ZAAKMAGAZIJN_REFERENCE_WSDL:
                 wsdl_path = os.path.join(settings.ZAAKMAGAZIJN_ZDS_PATH, self.wsdl_filename)
-                with open(wsdl_path, 'rb') as wsdl:
-                    content = rewrite_wsdl(wsdl.read(), settings.ZAAKMAGAZIJN_ZDS_URL, settings.ZAAKMAGAZIJN_URL)
-                return HttpResponse(content, content_type='text/xml; charset=utf-8')
-        return super().__call__(request)
+                wsdl = wsdl_cache.get(wsdl_path, settings.ZAAKMAGAZIJN_ZDS_URL, settings.ZAAKMAGAZIJN_URL)
+                return wsdl.get_response(request, allow_gzip=settings.ZAAKMAGAZIJN_WSDL_GZIP)
 
+        with performance_recorder.phase('other'):
+            response = super().__call__(request)
+        streaming_content = getattr(response, 'streaming_content', None)
+        if streaming_content is None:
+            return response
 
-beantwoordvraag_view = csrf_exempt(RewriteEngine.rewrite(DjangoApplication(beantwoordvraag_app, wsdl_filename='zds0120_beantwoordVraag_zs-dms.wsdl')))
-verwerksynchroonvrijbericht_view = csrf_exempt(RewriteEngine.rewrite(DjangoApplication(verwerksynchroonvrijbericht_app, wsdl_filename='zds0120_vrijeBerichten_zs-dms.wsdl')))
-ontvangasynchroon_view = csrf_exempt(RewriteEngine.rewrite(DjangoApplication(ontvangasynchroon_app, wsdl_filename='zds0120_ontvangAsynchroon_mutatie_zs-dms.wsdl')))
+        streaming_response = StreamingHttpResponse(streaming_content, status=response.status_code)
+        for header, value in response.items():
+            streaming_response[header] = value
+        return streaming_response
+
+    def generate_contexts(self, ctx, in_string_charset=None):
+        with performance_recorder.phase('parse'):
+            contexts = super().generate_contexts(ctx, in_string_charset)
+        operation = get_operation_name(ctx)
+        if operation:
+            performance_recorder.set_operation(operation)
+        return contexts
+
+    def get_in_object(self, ctx):
+        with performance_recorder.phase('parse'):
+            super().get_in_object(ctx)
+        operation = get_operation_name(ctx)
+        if ctx.in_error is None and operation:
+            try:
+                sender = ctx.in_object[0].stuurgegevens.zender.applicatie
+            except (AttributeError, IndexError, TypeError):
+                sender = None
+            performance_recorder.set_operation(operation, sender)
+
+    def get_out_object(self, ctx):
+        with performance_recorder.phase('service'):
+            super().get_out_object(ctx)
+
+    def get_out_string(self, ctx):
+        with performance_recorder.phase('serialization'):
+            super().get_out_string(ctx)
+
+    def set_response(self, retval, response):
+        """
+        Responses with large document content have no length, they are
+        streamed instead of joined, see `StUF.create_out_string`.
+        """
+        if retval.has_header('Content-Length'):
+            super().set_response(retval, response)
+        else:
+            retval.streaming_content = response
+
+
+class LazyServer:
+    """
+    Creates the `DjangoApplication` for an application on the first request,
+    so processes that don't handle requests to it don't pay for building its
+    services. See `zaakmagazijn.api.applications`.
+    """
+    def __init__(self, app_name, wsdl_filename):
+        self.app_name = app_name
+        self.wsdl_filename = wsdl_filename
+        self._server = None
+        self._lock = threading.Lock()
+
+    @property
+    def server(self) -> DjangoApplication:
+        server = self._server
+        if server is None:
+            with self._lock:
+                if self._server is None:
+                    self._server = DjangoApplication(get_application(self.app_name), wsdl_filename=self.wsdl_filename)
+                server = self._server
+        return server
+
+    def reset(self) -> None:
+        """
+        Create the server again on the next request, with a new WSDL.
+        """
+        self._server = None
+
+    def __call__(self, request):
+        return self.server(request)
+
+
+def warm_up() -> None:
+    """
+    Create all servers and their interface documents. Call this in a master
+    process before forking workers, so the workers share them instead of
+    building them for their first request.
+    """
+    for lazy_server in servers:
+        lazy_server.server
+
+
+beantwoordvraag_server = LazyServer('beantwoordvraag', wsdl_filename='zds0120_beantwoordVraag_zs-dms.wsdl')
+verwerksynchroonvrijbericht_server = LazyServer(
+    'verwerksynchroonvrijbericht', wsdl_filename='zds0120_vrijeBerichten_zs-dms.wsdl')
+# The server is also used to process the stored messages, see `zaakmagazijn.async.processing`.
+ontvangasynchroon_server = LazyServer(
+    'ontvangasynchroon', wsdl_filename='zds0120_ontvangAsynchroon_mutatie_zs-dms.wsdl')
+servers = [beantwoordvraag_server, verwerksynchroonvrijbericht_server, ontvangasynchroon_server]
+
+beantwoordvraag_view = csrf_exempt(RewriteEngine.rewrite(beantwoordvraag_server))
+verwerksynchroonvrijbericht_view = csrf_exempt(RewriteEngine.rewrite(verwerksynchroonvrijbericht_server))
+ontvangasynchroon_view = csrf_exempt(RewriteEngine.rewrite(ontvangasynchroon_server))
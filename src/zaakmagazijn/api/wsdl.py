@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .utils import rewrite_wsdl
+
+logger = logging.getLogger(__name__)
+
+
+class RewrittenWSDL:
+    """
+    A reference WSDL rewritten for a specific schema URL and SOAP address.
+    """
+    content_type = 'text/xml; charset=utf-8'
+
+    def __init__(self, content, mtime):
+        self.content = content
+        self.mtime = mtime
+        self.last_modified = int(mtime)
+        self.etag = quote_etag(hashlib.md5(content).hexdigest())
+
+        self._gzip_content = None
+        self._lock = threading.Lock()
+
+    @property
+    def gzip_content(self):
+        if self._gzip_content is None:
+            with self._lock:
+                if self._gzip_content is None:
+                    self._gzip_content = gzip.compress(self.content)
+        return self._gzip_content
+
+    @property
+    def gzip_etag(self):
+        return '{}-gzip"'.format(self.etag[:-1])
+
+    def get_response(self, request, allow_gzip=False):
+        """
+        Return the `HttpResponse` for `request`. A 304 is returned if the
+        client already has this WSDL.
+
+        :param request: The Django `HttpRequest`.
+        :param allow_gzip: Whether to serve the gzipped content to clients
+            that accept it.
+        :return: A `HttpResponse`.
+        """
+        use_gzip = allow_gzip and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        response = get_conditional_response(request, etag=etag, last_modified=self.last_modified)
+        if response is None:
+            if use_gzip:
+                response = HttpResponse(self.gzip_content, content_type=self.content_type)
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(self.content, content_type=self.content_type)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        if allow_gzip:
+            patch_vary_headers(response, ('Accept-Encoding', ))
+        return response
+
+
+class WSDLCache:
+    """
+    Keeps rewritten reference WSDLs in memory so they only need to be read
+    and rewritten once per (file, schema URL, SOAP address). A WSDL is
+    rewritten again when the modification time of the file changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wsdls = {}
+
+    def get(self, path, schema_url, soap_address):
+        """
+        Return the rewritten WSDL file at `path`.
+
+        :param path: The absolute path to the WSDL file.
+        :param schema_url: The URL where the WSDL/XSD schema's can be found.
+        :param soap_address: The URL that'll be used as a SOAP endpoint.
+        :return: A `RewrittenWSDL` instance.
+        """
+        key = (path, schema_url, soap_address)
+        mtime = os.path.getmtime(path)
+
+        wsdl = self._wsdls.get(key)
+        if wsdl is not None and wsdl.mtime == mtime:
+            return wsdl
+
+        with open(path, 'rb') as wsdl_file:
+            content = rewrite_wsdl(wsdl_file.read(), schema_url, soap_address)
+        logger.debug('Rewrote WSDL %s for %s.', path, soap_address)
+
+        wsdl = RewrittenWSDL(content, mtime)
+        with self._lock:
+            self._wsdls[key] = wsdl
+        return wsdl
+
+    def clear(self):
+        with self._lock:
+            self._wsdls.clear()
+
+
+wsdl_cache = WSDLCache()
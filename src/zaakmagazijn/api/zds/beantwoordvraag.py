@@ -8,6 +8,7 @@ from spyne.model.complex import TypeInfo
 from zaakmagazijn.api.stuf.faults import StUFFault
 from zaakmagazijn.api.utils import create_unique_id
 from zaakmagazijn.auditlog_extension.signals import service_read
+from zaakmagazijn.rgbz_mapping.manager import ProxyQuerySet
 from zaakmagazijn.utils import stuf_datetime
 
 from ..stuf import (
@@ -25,9 +26,12 @@ from ..stuf.models import (
 )
 from ..stuf.protocols import IgnoreAttribute, Nil
 from ..stuf.utils import (
-    create_query_args, django_field_to_spyne_model, get_model_value,
-    get_ontvanger, get_spyne_field, get_systeem_zender, reorder_type_info,
-    to_spyne_value
+    create_query_args, django_field_to_spyne_model, get_ontvanger,
+    get_spyne_field, get_systeem_zender, reorder_type_info, to_spyne_value
+)
+from .plans import get_entiteit_plan
+from .prefetch import (
+    PrefetchPlanner, get_prefetched_objects, resolve_gerelateerde_types
 )
 
 logger = logging.getLogger(__name__)
@@ -398,6 +402,15 @@ class La01Builder(ComplexModelBuilder):
         queryset = django_model.objects.all()
         return queryset.all()
 
+    def get_queryset_model(self, queryset):
+        """
+        Return the model, either a Django model or a `ModelProxy`, of the
+        objects in `queryset`.
+        """
+        if isinstance(queryset, ProxyQuerySet):
+            return queryset.proxy_model
+        return queryset.model
+
     def create_output_parameters_data(self, input_parameters_obj):
         params = {'indicatorVervolgvraag': False}
         if not input_parameters_obj:
@@ -436,12 +449,14 @@ class La01Builder(ComplexModelBuilder):
             }
         }
 
-    def get_fields_in_scope(self, stuf_entiteit, scope_obj, scope=None):
+    def get_fields_in_scope(self, stuf_entiteit, scope_obj, scope=None, field_names=None):
         """
         Returns a list of fields that should be in the response for this entity.
-        """
 
-        field_names = [field_name for field_name, _unused in stuf_entiteit.get_field_mapping()]
+        :param field_names: The field names of the entity, if already known.
+        """
+        if field_names is None:
+            field_names = [field_name for field_name, _unused in stuf_entiteit.get_field_mapping()]
 
         # TODO [TECH]: raise ClientFoutChoices.stuf097 als zowel scope attribute als elementen zijn gebruikt.
         # TODO [TECH]: Implement other scope attribute choices, although it's
@@ -510,24 +525,19 @@ class La01Builder(ComplexModelBuilder):
         elif obj is None and scope_obj is None:
             raise EmptyResultError()
 
+        plan = get_entiteit_plan(stuf_entiteit, spyne_model)
         scope = root_scope_obj.scope if hasattr(root_scope_obj, 'scope') else None
 
-        model_answer = {}
+        model_answer = dict(plan.custom_fields)
         has_result = False
-        fields_in_scope = self.get_fields_in_scope(stuf_entiteit, scope_obj, scope=scope)
+        fields_in_scope = set(self.get_fields_in_scope(stuf_entiteit, scope_obj, scope=scope, field_names=plan.field_names))
 
-        for field_name, _, value in stuf_entiteit.get_custom_fields():
-            model_answer[field_name] = value
-
-        for field_name, django_field_name, django_field in stuf_entiteit.get_django_field_mapping():
-            spyne_field = get_spyne_field(spyne_model, field_name)
-            if field_name not in fields_in_scope and spyne_field.Attributes.min_occurs == 0:
-                model_answer[field_name] = IgnoreAttribute()
+        for field in plan.fields:
+            if field.optional and field.field_name not in fields_in_scope:
+                model_answer[field.field_name] = IgnoreAttribute()
                 continue
 
-            model_answer[field_name] = to_spyne_value(
-                get_model_value(obj, django_field_name), django_field, spyne_field
-            )
+            model_answer[field.field_name] = field.to_spyne_value(field.get_value(obj))
             has_result = True
 
         if not has_result:
@@ -536,6 +546,7 @@ class La01Builder(ComplexModelBuilder):
         return model_answer
 
     def _create_fundamenteel(self, stuf_entiteit, obj, filter_obj, scope_obj, parameters_obj, root_scope_obj, object_model):
+        plan = get_entiteit_plan(stuf_entiteit, object_model)
         obj_answer = {}
         has_result = False
         try:
@@ -551,17 +562,18 @@ class La01Builder(ComplexModelBuilder):
         except EmptyResultError:
             pass
 
+        # If the attribute 'scope' in the root scope object, and there is no Nil, or ComplexType
+        # set in the scope, do not include the entity in the result.
+        scope = root_scope_obj.scope if hasattr(root_scope_obj, 'scope') else None
+
         #
         # Deal with 'related' foreign keys, (foreign keys which point to this model)
         #
-        for related_field in stuf_entiteit.get_related_fields():
+        for related_field, related_object_model in plan.related_fields:
             child_filter_obj = getattr(filter_obj, related_field.field_name, None) if filter_obj else None
             child_scope_obj = getattr(scope_obj, related_field.field_name, None) if scope_obj else None
             child_parameters_obj = None  # TODO [TECH]: Taiga issue #208 ordering should be done on lower levels as well.
 
-            # If the attribute 'scope' in the root scope object, and there is no Nil, or ComplexType
-            # set in the scope, do not include the entity in the result.
-            scope = root_scope_obj.scope if hasattr(root_scope_obj, 'scope') else None
             if scope is None and child_scope_obj is None:
                 obj_answer[related_field.field_name] = IgnoreAttribute()
                 continue
@@ -572,7 +584,7 @@ class La01Builder(ComplexModelBuilder):
                 'filter_obj': child_filter_obj,
                 'parameters_obj': child_parameters_obj,
                 'root_scope_obj': root_scope_obj,
-                'object_model': get_spyne_field(object_model, related_field.field_name)
+                'object_model': related_object_model,
             }
             try:
                 if isinstance(related_field, ForeignKeyRelation):
@@ -585,7 +597,12 @@ class La01Builder(ComplexModelBuilder):
                     if related_field.related_name == 'self':
                         obj_answer[related_field.field_name] = [self._create_fundamenteel(obj=obj, **kwargs), ]
                     else:
-                        obj_answer[related_field.field_name] = self._create_object_data(queryset=getattr(obj, related_field.related_name), **kwargs)
+                        queryset = None
+                        if not create_query_args(child_filter_obj):
+                            queryset = get_prefetched_objects(obj, related_field.related_name)
+                        if queryset is None:
+                            queryset = getattr(obj, related_field.related_name)
+                        obj_answer[related_field.field_name] = self._create_object_data(queryset=queryset, **kwargs)
                 else:
                     raise NotImplementedError
 
@@ -597,23 +614,21 @@ class La01Builder(ComplexModelBuilder):
         #
         # Process the 'gerelateerde'
         #
-        gerelateerde = stuf_entiteit.get_gerelateerde()
-        if gerelateerde:
-            gerelateerde_fk_name, gerelateerde_data = gerelateerde
+        if plan.gerelateerde:
             child_scope_obj = getattr(scope_obj, 'gerelateerde', None) if scope_obj else None
             #
             # Deal with polymorphic foreign key relations.
             #
-            if isinstance(gerelateerde_data, tuple) or isinstance(gerelateerde_data, list):
-                fk_object = getattr(obj, gerelateerde_fk_name)
+            if plan.gerelateerde_polymorphic:
+                fk_object = getattr(obj, plan.gerelateerde_fk_name)
                 # TODO [TECH]: This being a callable will only work for 'beantwoordvraag', for updates
                 # another method is required.
                 fk_object = fk_object() if callable(fk_object) else fk_object
                 assert hasattr(fk_object, 'is_type'), "The foreign key class should have a 'is_type' method to determine the subclass"
                 child_obj = fk_object.is_type()
                 obj_answer['gerelateerde'] = {}
-                for relation_name, related_cls in gerelateerde_data:
-                    if related_cls.get_model() is child_obj.__class__:
+                for relation_name, related_cls, related_model, related_object_model in plan.gerelateerde:
+                    if related_model is child_obj.__class__:
                         relation_scope_obj = getattr(child_scope_obj, relation_name) if child_scope_obj else None
                         try:
                             obj_answer['gerelateerde'][relation_name] = self._create_fundamenteel(
@@ -623,7 +638,7 @@ class La01Builder(ComplexModelBuilder):
                                 scope_obj=relation_scope_obj,
                                 parameters_obj=None,
                                 root_scope_obj=root_scope_obj,
-                                object_model=get_spyne_field(object_model, 'gerelateerde', relation_name)
+                                object_model=related_object_model
                             )
                         except EmptyResultError:
                             pass
@@ -641,8 +656,8 @@ class La01Builder(ComplexModelBuilder):
             # Deal with normal foreign key relations
             #
             else:
-                related_cls = gerelateerde_data
-                fk_value = obj if gerelateerde_fk_name == 'self' else getattr(obj, gerelateerde_fk_name, None)
+                _unused, related_cls, _unused, related_object_model = plan.gerelateerde[0]
+                fk_value = obj if plan.gerelateerde_fk_name == 'self' else getattr(obj, plan.gerelateerde_fk_name, None)
                 try:
                     obj_answer['gerelateerde'] = self._create_fundamenteel(
                         stuf_entiteit=related_cls,
@@ -651,70 +666,44 @@ class La01Builder(ComplexModelBuilder):
                         scope_obj=child_scope_obj,
                         parameters_obj=None,
                         root_scope_obj=root_scope_obj,
-                        object_model=get_spyne_field(object_model, 'gerelateerde'))
+                        object_model=related_object_model)
                     has_result = True
                 except EmptyResultError:
                     obj_answer['gerelateerde'] = IgnoreAttribute()
 
-        tijdvak_geldigheid = stuf_entiteit.get_tijdvak_geldigheid()
-        if tijdvak_geldigheid:
-            has_result = True
-            begin_geldigheid = get_model_value(
-                obj, tijdvak_geldigheid['begin_geldigheid']
-            ) if tijdvak_geldigheid['begin_geldigheid'] else None
-            eind_geldigheid = get_model_value(
-                obj, tijdvak_geldigheid['eind_geldigheid']
-            ) if tijdvak_geldigheid['eind_geldigheid'] else None
-
-            spyne_begin_geldigheid = get_spyne_field(object_model, 'tijdvakGeldigheid/beginGeldigheid')
-            spyne_eind_geldigheid = get_spyne_field(object_model, 'tijdvakGeldigheid/eindGeldigheid')
-
-            obj_answer['tijdvakGeldigheid'] = {
-                'beginGeldigheid': to_spyne_value(begin_geldigheid, None, spyne_begin_geldigheid),
-                'eindGeldigheid': to_spyne_value(eind_geldigheid, None, spyne_eind_geldigheid),
-            }
+        for tijdvak in (plan.tijdvak_geldigheid, plan.tijdvak_relatie):
+            if tijdvak:
+                has_result = True
+                obj_answer[tijdvak.name] = {
+                    tijdvak.begin_name: to_spyne_value(tijdvak.get_begin(obj), None, tijdvak.begin_spyne_field),
+                    tijdvak.eind_name: to_spyne_value(tijdvak.get_eind(obj), None, tijdvak.eind_spyne_field),
+                }
 
-        tijdvak_relatie = stuf_entiteit.get_tijdvak_relatie()
-        if tijdvak_relatie:
+        if plan.tijdstip_registratie:
             has_result = True
-            begin_relatie = get_model_value(
-                obj, tijdvak_relatie['begin_relatie']
-            ) if tijdvak_relatie['begin_relatie'] else None
-            eind_relatie = get_model_value(
-                obj, tijdvak_relatie['eind_relatie']
-            ) if tijdvak_relatie['eind_relatie'] else None
-
-            spyne_begin_relatie = get_spyne_field(object_model, 'tijdvakRelatie/beginRelatie')
-            spyne_eind_relatie = get_spyne_field(object_model, 'tijdvakRelatie/eindRelatie')
-
-            obj_answer['tijdvakRelatie'] = {
-                'beginRelatie': to_spyne_value(begin_relatie, None, spyne_begin_relatie),
-                'eindRelatie': to_spyne_value(eind_relatie, None, spyne_eind_relatie),
-            }
-
-        tijdstip_registratie = stuf_entiteit.get_tijdstip_registratie()
-        if tijdstip_registratie:
-            has_result = True
-            value = get_model_value(obj, tijdstip_registratie) if tijdstip_registratie else None
-            spyne_tijdstip_registratie = get_spyne_field(object_model, 'tijdstipRegistratie')
-
-            obj_answer['tijdstipRegistratie'] = to_spyne_value(value, None, spyne_tijdstip_registratie)
+            get_value, spyne_tijdstip_registratie = plan.tijdstip_registratie
+            obj_answer['tijdstipRegistratie'] = to_spyne_value(get_value(obj), None, spyne_tijdstip_registratie)
 
         if not has_result:
             raise EmptyResultError()
 
-        if stuf_entiteit.is_entiteit():
-            obj_answer['entiteittype'] = stuf_entiteit.get_mnemonic()
+        if plan.is_entiteit:
+            obj_answer['entiteittype'] = plan.mnemonic
         return obj_answer
 
-    def _create_object_data(self, stuf_entiteit, queryset, scope_obj, filter_obj, parameters_obj, root_scope_obj, object_model, auditlog=False):
+    def _create_object_data(self, stuf_entiteit, queryset, scope_obj, filter_obj, parameters_obj, root_scope_obj,
+                            object_model, auditlog=False, prefetch_plan=None):
         """
         See StUF 03.01 6.3.3 and 6.4.2
+
+        :param queryset: A queryset, related manager, a method returning a related manager and filter arguments or a
+            list of objects that were already prefetched.
+        :param prefetch_plan: An optional `PrefetchPlan` to apply to the queryset.
         """
         from django.db.models.manager import Manager
         from django.db.models.query import QuerySet
 
-        if isinstance(queryset, Manager) or isinstance(queryset, QuerySet):
+        if isinstance(queryset, Manager) or isinstance(queryset, QuerySet) or isinstance(queryset, list):
             queryset = queryset
         elif callable(queryset):
             related_manager, filter_args = queryset()
@@ -725,12 +714,26 @@ class La01Builder(ComplexModelBuilder):
         query_args = create_query_args(filter_obj)
         order_args = self.create_order_args(stuf_entiteit, parameters_obj)
         limit_arg = self.create_limit_arg(stuf_entiteit, parameters_obj)
-        qs = queryset.filter(**query_args).order_by(*order_args)
 
-        if getattr(parameters_obj, 'indicatorAantal', False) is True:
-            self.total_objs = qs.count()
-        if limit_arg > 0:
-            qs = qs[:limit_arg]
+        if isinstance(queryset, list):
+            # Prefetched objects are only used if there is nothing to filter
+            # on, ordering and limits are not supported on these levels.
+            assert not query_args and not order_args and not limit_arg
+            qs = queryset
+        else:
+            qs = queryset.filter(**query_args).order_by(*order_args)
+
+            if getattr(parameters_obj, 'indicatorAantal', False) is True:
+                self.total_objs = qs.count()
+            if prefetch_plan:
+                qs = prefetch_plan.apply(qs)
+            if limit_arg > 0:
+                qs = qs[:limit_arg]
+
+        plan = get_entiteit_plan(stuf_entiteit, object_model)
+        if plan.gerelateerde_fk_name:
+            qs = list(qs)
+            resolve_gerelateerde_types(qs, plan.gerelateerde_fk_name)
 
         for obj in qs:
             if auditlog:
@@ -765,6 +768,7 @@ class La01Builder(ComplexModelBuilder):
         query_args = {}
 
         object_model = get_spyne_field(output_model, 'antwoord/object')
+        prefetch_plan = PrefetchPlanner().plan(self.stuf_entiteit, self.get_queryset_model(queryset), scope_obj)
         try:
             data = self._create_object_data(stuf_entiteit=self.stuf_entiteit,
                                             queryset=queryset.filter(**query_args).distinct(),
@@ -773,7 +777,8 @@ class La01Builder(ComplexModelBuilder):
                                             parameters_obj=parameters_obj,
                                             root_scope_obj=scope_obj,
                                             object_model=object_model,
-                                            auditlog=auditlog)
+                                            auditlog=auditlog,
+                                            prefetch_plan=prefetch_plan)
         except EmptyResultError:
             data = []
 
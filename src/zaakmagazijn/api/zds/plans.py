@@ -0,0 +1,149 @@
+"""
+Precompiled information needed to serialize objects of a `StUFEntiteit`.
+
+Everything the `La01Builder` needs to know about a `StUFEntiteit` and the
+spyne model it is serialized to is static. Instead of deriving the field
+mapping, the Django fields and the spyne fields for every object, this is
+done once per (`StUFEntiteit`, spyne model) combination.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from operator import attrgetter
+
+from django.db.models.constants import LOOKUP_SEP
+
+from ..stuf.utils import get_spyne_field
+
+FieldPlan = namedtuple('FieldPlan', (
+    'field_name', 'django_field_name', 'django_field', 'spyne_field', 'optional', 'get_value', 'to_spyne_value'
+))
+
+RelatedFieldPlan = namedtuple('RelatedFieldPlan', ('related_field', 'spyne_model'))
+
+GerelateerdePlan = namedtuple('GerelateerdePlan', ('relation_name', 'stuf_entiteit', 'model', 'spyne_model'))
+
+TijdvakPlan = namedtuple('TijdvakPlan', (
+    'name', 'begin_name', 'eind_name', 'get_begin', 'get_eind', 'begin_spyne_field', 'eind_spyne_field'
+))
+
+EntiteitPlan = namedtuple('EntiteitPlan', (
+    'stuf_entiteit', 'spyne_model', 'field_names', 'custom_fields', 'fields', 'related_fields',
+    'gerelateerde_fk_name', 'gerelateerde_polymorphic', 'gerelateerde', 'tijdvak_geldigheid', 'tijdvak_relatie',
+    'tijdstip_registratie', 'is_entiteit', 'mnemonic'
+))
+
+
+def get_value_getter(django_field_name):
+    """
+    Return a callable that does the same as `get_model_value` for
+    `django_field_name`.
+    """
+    if not django_field_name:
+        return lambda obj: None
+    return attrgetter('.'.join(django_field_name.split(LOOKUP_SEP)))
+
+
+def get_value_converter(spyne_field):
+    """
+    Return a callable that does the same as `to_spyne_value` for
+    `spyne_field`.
+    """
+    to_spyne_value = getattr(spyne_field, 'to_spyne_value', None)
+    if to_spyne_value is None:
+        return lambda value: value
+    return lambda value: to_spyne_value(value, spyne_field)
+
+
+def _compile_tijdvak(spyne_model, name, begin_name, eind_name, begin_field_name, eind_field_name):
+    return TijdvakPlan(
+        name=name,
+        begin_name=begin_name,
+        eind_name=eind_name,
+        get_begin=get_value_getter(begin_field_name),
+        get_eind=get_value_getter(eind_field_name),
+        begin_spyne_field=get_spyne_field(spyne_model, name, begin_name),
+        eind_spyne_field=get_spyne_field(spyne_model, name, eind_name),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_entiteit_plan(stuf_entiteit, spyne_model):
+    """
+    Return the `EntiteitPlan` for serializing `stuf_entiteit` objects to
+    `spyne_model`. The plan is created once and cached.
+
+    :param stuf_entiteit: A `StUFEntiteit` class.
+    :param spyne_model: The `ComplexModel` created for `stuf_entiteit`.
+    :return: An `EntiteitPlan`.
+    """
+    fields = []
+    for field_name, django_field_name, django_field in stuf_entiteit.get_django_field_mapping():
+        spyne_field = get_spyne_field(spyne_model, field_name)
+        fields.append(FieldPlan(
+            field_name=field_name,
+            django_field_name=django_field_name,
+            django_field=django_field,
+            spyne_field=spyne_field,
+            optional=spyne_field.Attributes.min_occurs == 0,
+            get_value=get_value_getter(django_field_name),
+            to_spyne_value=get_value_converter(spyne_field),
+        ))
+
+    related_fields = tuple(
+        RelatedFieldPlan(related_field, get_spyne_field(spyne_model, related_field.field_name))
+        for related_field in stuf_entiteit.get_related_fields()
+    )
+
+    gerelateerde_fk_name = None
+    gerelateerde_polymorphic = False
+    gerelateerde = ()
+    if stuf_entiteit.get_gerelateerde():
+        gerelateerde_fk_name, gerelateerde_data = stuf_entiteit.get_gerelateerde()
+        if isinstance(gerelateerde_data, tuple) or isinstance(gerelateerde_data, list):
+            gerelateerde_polymorphic = True
+            gerelateerde = tuple(
+                GerelateerdePlan(
+                    relation_name, related_cls, related_cls.get_model(),
+                    get_spyne_field(spyne_model, 'gerelateerde', relation_name))
+                for relation_name, related_cls in gerelateerde_data
+            )
+        else:
+            gerelateerde = (
+                GerelateerdePlan(
+                    'gerelateerde', gerelateerde_data, gerelateerde_data.get_model(),
+                    get_spyne_field(spyne_model, 'gerelateerde')),
+            )
+
+    tijdvak_geldigheid = stuf_entiteit.get_tijdvak_geldigheid()
+    if tijdvak_geldigheid:
+        tijdvak_geldigheid = _compile_tijdvak(
+            spyne_model, 'tijdvakGeldigheid', 'beginGeldigheid', 'eindGeldigheid',
+            tijdvak_geldigheid['begin_geldigheid'], tijdvak_geldigheid['eind_geldigheid'])
+
+    tijdvak_relatie = stuf_entiteit.get_tijdvak_relatie()
+    if tijdvak_relatie:
+        tijdvak_relatie = _compile_tijdvak(
+            spyne_model, 'tijdvakRelatie', 'beginRelatie', 'eindRelatie',
+            tijdvak_relatie['begin_relatie'], tijdvak_relatie['eind_relatie'])
+
+    tijdstip_registratie = stuf_entiteit.get_tijdstip_registratie()
+    if tijdstip_registratie:
+        spyne_field = get_spyne_field(spyne_model, 'tijdstipRegistratie')
+        tijdstip_registratie = (get_value_getter(tijdstip_registratie), spyne_field)
+
+    return EntiteitPlan(
+        stuf_entiteit=stuf_entiteit,
+        spyne_model=spyne_model,
+        field_names=tuple(field_name for field_name, _unused in stuf_entiteit.get_field_mapping()),
+        custom_fields=tuple((field_name, value) for field_name, _unused, value in stuf_entiteit.get_custom_fields()),
+        fields=tuple(fields),
+        related_fields=related_fields,
+        gerelateerde_fk_name=gerelateerde_fk_name,
+        gerelateerde_polymorphic=gerelateerde_polymorphic,
+        gerelateerde=gerelateerde,
+        tijdvak_geldigheid=tijdvak_geldigheid or None,
+        tijdvak_relatie=tijdvak_relatie or None,
+        tijdstip_registratie=tijdstip_registratie or None,
+        is_entiteit=stuf_entiteit.is_entiteit(),
+        mnemonic=stuf_entiteit.get_mnemonic() if stuf_entiteit.is_entiteit() else None,
+    )
@@ -0,0 +1,409 @@
+"""
+Determine upfront which related objects are needed to build a La01 answer.
+
+The `La01Builder` walks a `StUFEntiteit` tree and follows every relation for
+every object it serializes. Without any help from the ORM this results in
+several queries per object. The `PrefetchPlanner` walks the same tree, with the
+same scope, and creates a `PrefetchPlan` with the `select_related` and
+`prefetch_related` arguments to retrieve all these objects in a fixed amount of
+queries.
+
+One-to-many relations are always prefetched to an attribute named by
+`get_prefetch_attr`. The builder uses `get_prefetched_objects` to read them
+and falls back to a regular query if a relation was not prefetched.
+"""
+import logging
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields.related_descriptors import (
+    ReverseManyToOneDescriptor
+)
+
+from zaakmagazijn.rgbz.models.mixins import resolve_types
+from zaakmagazijn.rgbz_mapping.base import (
+    ModelProxy, ProxyForeignKey, ProxyOneToManyDescriptor
+)
+from zaakmagazijn.rgbz_mapping.manager import (
+    ProxyQuerySet, ProxyRelatedManager
+)
+
+from ..stuf import ForeignKeyRelation, OneToManyRelation
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of foreign keys that are followed to retrieve the related
+# objects a `ModelProxy` needs when it's instantiated.
+MAX_FOREIGN_KEY_DEPTH = 4
+
+
+def get_prefetch_attr(related_name):
+    """
+    Return the attribute name to which the objects of `related_name` are
+    prefetched.
+    """
+    return '_prefetched_{}'.format(related_name)
+
+
+def is_proxy_model(model):
+    return isinstance(model, type) and issubclass(model, ModelProxy)
+
+
+def get_django_model(model):
+    return model.get_model() if is_proxy_model(model) else model
+
+
+def join_lookup(*parts):
+    return LOOKUP_SEP.join(part for part in parts if part)
+
+
+def get_prefetched_objects(obj, related_name):
+    """
+    Return the objects of the relation `related_name` on `obj` if they were
+    prefetched, or `None` otherwise.
+
+    :param obj: A Django model or `ModelProxy` instance.
+    :param related_name: The name of the related manager, or the method
+        returning a related manager and its filter arguments, on `obj`.
+    :return: A list of Django model or `ModelProxy` instances, or `None`.
+    """
+    if not is_proxy_model(obj.__class__):
+        return getattr(obj, get_prefetch_attr(related_name), None)
+
+    django_objs = getattr(obj._obj, get_prefetch_attr(related_name), None)
+    if django_objs is None:
+        return None
+
+    related_attribute = getattr(obj, related_name)
+    if callable(related_attribute):
+        related_manager, filter_kwargs = related_attribute()
+    else:
+        related_manager, filter_kwargs = related_attribute, {}
+
+    proxy_model = related_manager.proxy_model
+    if filter_kwargs:
+        # The filter arguments that could be translated were already applied
+        # in the database, the remaining ones can only be compared in Python.
+        proxy_queryset = ProxyQuerySet(proxy_model)
+        _, python_filter_fields = proxy_queryset.translate_filter(filter_kwargs)
+        if python_filter_fields:
+            django_objs = [
+                django_obj for django_obj in django_objs
+                if proxy_queryset.matches_computed_fields(django_obj, python_filter_fields, filter_kwargs)
+            ]
+
+    return proxy_model.from_django_objs(django_objs)
+
+
+def resolve_gerelateerde_types(objs, fk_name):
+    """
+    Retrieve the child objects of the (polymorphic) foreign key `fk_name` of
+    all `objs` at once, so determining the type of each of them doesn't
+    take a query per object (see `resolve_types`).
+
+    :param objs: A list of `ModelProxy` instances of the same proxy model.
+    :param fk_name: The RGBZ 1.0 name of the foreign key.
+    """
+    if not objs or not is_proxy_model(objs[0].__class__):
+        return
+
+    proxy_model = objs[0].__class__
+    try:
+        field = proxy_model._get_field(fk_name)
+    except ValueError:
+        return
+    if not isinstance(field, ProxyForeignKey) or proxy_model._to_rgbzx_method(field, 1):
+        return
+
+    fk_objs = [getattr(obj._obj, field.rgbz2_name) for obj in objs]
+    resolve_types(fk_obj for fk_obj in fk_objs if hasattr(fk_obj, 'is_type'))
+
+
+class PrefetchPlan:
+    """
+    The `select_related` and `prefetch_related` arguments for a queryset of
+    `model`.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.select_related = []
+        self.prefetch_related = []
+
+    def __repr__(self):
+        return '<PrefetchPlan: {} select_related={} prefetch_related={}>'.format(
+            self.model.__name__, self.select_related,
+            [getattr(lookup, 'prefetch_to', lookup) for lookup in self.prefetch_related])
+
+    def add_select_related(self, lookup):
+        if lookup and lookup not in self.select_related:
+            self.select_related.append(lookup)
+
+    def add_prefetch(self, prefetch):
+        if prefetch.prefetch_to not in [p.prefetch_to for p in self.prefetch_related]:
+            self.prefetch_related.append(prefetch)
+
+    def get_queryset(self):
+        """
+        Return a Django queryset for `model` with this plan applied.
+        """
+        return self.apply(get_django_model(self.model)._default_manager.all())
+
+    def apply(self, queryset):
+        """
+        Apply the plan to a Django `QuerySet` or a `ProxyQuerySet`.
+        """
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+class PrefetchPlanner:
+    """
+    Create a `PrefetchPlan` from a `StUFEntiteit` and the requested scope,
+    following the same rules as `La01Builder._create_fundamenteel`.
+    """
+    def __init__(self, max_foreign_key_depth=MAX_FOREIGN_KEY_DEPTH):
+        self.max_foreign_key_depth = max_foreign_key_depth
+
+    def plan(self, stuf_entiteit, model, scope_obj):
+        """
+        :param stuf_entiteit: The `StUFEntiteit` of the top level objects.
+        :param model: The model of the top level objects, either a Django
+            model or a `ModelProxy`.
+        :param scope_obj: The requested scope, also used as root scope.
+        :return: A `PrefetchPlan`.
+        """
+        plan = PrefetchPlan(model)
+        scope = scope_obj.scope if hasattr(scope_obj, 'scope') else None
+        self._plan_entiteit(plan, '', stuf_entiteit, model, scope_obj, scope)
+
+        logger.debug('Created %r for %s', plan, stuf_entiteit.__name__)
+        return plan
+
+    def _plan_entiteit(self, plan, prefix, stuf_entiteit, model, scope_obj, scope):
+        """
+        Add the lookups needed for `stuf_entiteit` to `plan`.
+
+        :param prefix: The lookup from the model of `plan` to `model`.
+        """
+        self._plan_foreign_keys(plan, prefix, model)
+
+        for field_name, django_field_name in stuf_entiteit.get_field_mapping():
+            fk_path = django_field_name.split(LOOKUP_SEP)[:-1]
+            if fk_path:
+                resolved = self._resolve_foreign_key_path(model, fk_path)
+                if resolved:
+                    plan.add_select_related(join_lookup(prefix, resolved[0]))
+
+        for related_field in stuf_entiteit.get_related_fields():
+            child_scope_obj = getattr(scope_obj, related_field.field_name, None) if scope_obj else None
+            if scope is None and child_scope_obj is None:
+                continue
+
+            if isinstance(related_field, ForeignKeyRelation):
+                self._plan_foreign_key(
+                    plan, prefix, related_field.fk_name, related_field.stuf_entiteit, model, child_scope_obj, scope)
+            elif isinstance(related_field, OneToManyRelation):
+                if related_field.related_name == 'self':
+                    self._plan_entiteit(plan, prefix, related_field.stuf_entiteit, model, child_scope_obj, scope)
+                else:
+                    self._plan_one_to_many(
+                        plan, prefix, related_field.related_name, related_field.stuf_entiteit, model,
+                        child_scope_obj, scope)
+
+        gerelateerde = stuf_entiteit.get_gerelateerde()
+        if gerelateerde:
+            gerelateerde_fk_name, gerelateerde_data = gerelateerde
+            child_scope_obj = getattr(scope_obj, 'gerelateerde', None) if scope_obj else None
+
+            if isinstance(gerelateerde_data, tuple) or isinstance(gerelateerde_data, list):
+                resolved = self._resolve_foreign_key_path(model, self._get_fk_path(model, gerelateerde_fk_name))
+                if resolved:
+                    fk_lookup, fk_model = resolved
+                    fk_lookup = join_lookup(prefix, fk_lookup)
+                    plan.add_select_related(fk_lookup)
+                    for relation_name, related_cls in gerelateerde_data:
+                        relation_scope_obj = getattr(child_scope_obj, relation_name, None) if child_scope_obj else None
+                        self._plan_subclass(plan, fk_lookup, fk_model, related_cls, relation_scope_obj, scope)
+            else:
+                self._plan_foreign_key(
+                    plan, prefix, gerelateerde_fk_name, gerelateerde_data, model, child_scope_obj, scope)
+
+    def _plan_foreign_keys(self, plan, prefix, model, path_models=(), depth=0):
+        """
+        A `ModelProxy` resolves all its foreign keys when it's instantiated,
+        make sure these are retrieved in the same query.
+        """
+        if not is_proxy_model(model) or depth >= self.max_foreign_key_depth:
+            return
+
+        path_models = path_models + (model, )
+        for field in model.get_fields(in_rgbz1=True, in_rgbz2=True, is_foreign_key=True, only_non_computed=True):
+            related_model = field.relation_proxy_model
+            if related_model in path_models or not self._is_forward_relation(model.get_model(), field.rgbz2_name):
+                continue
+
+            lookup = join_lookup(prefix, field.rgbz2_name)
+            plan.add_select_related(lookup)
+            self._plan_foreign_keys(plan, lookup, related_model, path_models, depth + 1)
+
+    def _plan_foreign_key(self, plan, prefix, fk_name, stuf_entiteit, model, scope_obj, scope):
+        if fk_name == 'self':
+            self._plan_entiteit(plan, prefix, stuf_entiteit, model, scope_obj, scope)
+            return
+
+        resolved = self._resolve_foreign_key_path(model, self._get_fk_path(model, fk_name))
+        if resolved:
+            fk_lookup, fk_model = resolved
+            fk_lookup = join_lookup(prefix, fk_lookup)
+            plan.add_select_related(fk_lookup)
+            self._plan_entiteit(plan, fk_lookup, stuf_entiteit, fk_model, scope_obj, scope)
+
+    def _plan_subclass(self, plan, prefix, model, stuf_entiteit, scope_obj, scope):
+        """
+        Retrieve the (multi-table inheritance) subclass that `is_type` returns
+        for a polymorphic relation.
+        """
+        subclass_model = stuf_entiteit.get_model()
+        path = self._get_subclass_path(get_django_model(model), get_django_model(subclass_model))
+        if path is None:
+            return
+
+        subclass_lookup = join_lookup(prefix, *path)
+        plan.add_select_related(subclass_lookup)
+        self._plan_entiteit(plan, subclass_lookup, stuf_entiteit, subclass_model, scope_obj, scope)
+
+    def _plan_one_to_many(self, plan, prefix, related_name, stuf_entiteit, model, scope_obj, scope):
+        resolved = self._resolve_one_to_many(model, related_name)
+        if not resolved:
+            return
+
+        lookup, related_model, django_filter = resolved
+
+        child_plan = PrefetchPlan(related_model)
+        self._plan_entiteit(child_plan, '', stuf_entiteit, related_model, scope_obj, scope)
+
+        plan.add_prefetch(Prefetch(
+            join_lookup(prefix, lookup),
+            queryset=child_plan.get_queryset().filter(django_filter),
+            to_attr=get_prefetch_attr(related_name)
+        ))
+
+    def _get_fk_path(self, model, name):
+        """
+        Return the RGBZ 1.0 foreign key path that is followed by the
+        attribute or method `name` on `model`.
+        """
+        attribute = getattr(model, name, None)
+        if callable(attribute):
+            follows = getattr(attribute, 'follows', None)
+            return follows.split(LOOKUP_SEP) if follows else []
+        return [name]
+
+    def _resolve_foreign_key_path(self, model, path):
+        """
+        Translate a path of foreign keys on `model` to a Django lookup.
+
+        :return: A 2-tuple of the lookup and the model at the end of the path,
+            or `None` if the path can not be retrieved with `select_related`.
+        """
+        if not path:
+            return None
+
+        lookup = []
+        for name in path:
+            if is_proxy_model(model):
+                try:
+                    field = model._get_field(name)
+                except ValueError:
+                    return None
+                if not isinstance(field, ProxyForeignKey) or model._to_rgbzx_method(field, 1):
+                    return None
+                name, related_model = field.rgbz2_name, field.relation_proxy_model
+            else:
+                related_model = self._get_related_model(model, name)
+
+            if not self._is_forward_relation(get_django_model(model), name):
+                return None
+
+            lookup.append(name)
+            model = related_model
+
+        return LOOKUP_SEP.join(lookup), model
+
+    def _resolve_one_to_many(self, model, related_name):
+        """
+        Translate the relation `related_name` on `model` to a Django lookup.
+
+        :return: A 3-tuple of the lookup, the related model and a `Q` object
+            to filter the related objects, or `None` if the relation can not
+            be prefetched.
+        """
+        attribute = getattr(model, related_name, None)
+
+        if is_proxy_model(model):
+            if isinstance(attribute, ProxyOneToManyDescriptor):
+                relation = attribute.relation
+                return relation.rgbz2_name, relation.relation_proxy_model, Q()
+
+            if not callable(attribute):
+                return None
+
+            # Methods returning a related manager and filter arguments need an
+            # instance, an unsaved one is enough to determine the relation.
+            try:
+                related_manager, filter_kwargs = getattr(model(_obj=model.get_model()()), related_name)()
+            except Exception as e:
+                logger.debug('Could not determine the relation %s on %s: %s', related_name, model.__name__, e)
+                return None
+
+            if not isinstance(related_manager, ProxyRelatedManager) or related_manager.relation is None:
+                return None
+
+            django_filter, _ = ProxyQuerySet(related_manager.proxy_model).translate_filter(filter_kwargs)
+            return related_manager.relation.rgbz2_name, related_manager.proxy_model, django_filter
+
+        if isinstance(attribute, ReverseManyToOneDescriptor):
+            rel = attribute.rel
+            if getattr(attribute, 'reverse', True):
+                return related_name, rel.related_model, Q()
+            return related_name, rel.model, Q()
+
+        return None
+
+    def _get_related_model(self, django_model, name):
+        try:
+            return django_model._meta.get_field(name).related_model
+        except FieldDoesNotExist:
+            return None
+
+    def _is_forward_relation(self, django_model, name):
+        """
+        Return whether `name` on `django_model` can be used in `select_related`.
+        """
+        try:
+            field = django_model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.is_relation and (field.many_to_one or field.one_to_one)
+
+    def _get_subclass_path(self, django_model, subclass_model):
+        """
+        Return the lookups to go from `django_model` to its multi-table
+        inheritance subclass `subclass_model`, or `None` if it's not a
+        subclass.
+        """
+        if subclass_model is django_model:
+            return []
+
+        for parent_model, parent_link in subclass_model._meta.parents.items():
+            if parent_link is None:
+                continue
+            path = self._get_subclass_path(django_model, parent_model)
+            if path is not None:
+                return path + [parent_link.related_query_name()]
+
+        return None
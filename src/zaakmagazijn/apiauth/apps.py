@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save
+)
 
-from .signals import update_service_operations
+from .signals import invalidate_authorization_cache, update_service_operations
 
 
 class ApiAuthConfig(AppConfig):
@@ -10,4 +12,17 @@ class ApiAuthConfig(AppConfig):
     verbose_name = "Authentication"
 
     def ready(self):
+        from . import checks  # noqa
+
         post_migrate.connect(update_service_operations, sender=self)
+
+        Application = self.get_model('Application')
+        ApplicationGroup = self.get_model('ApplicationGroup')
+        ServiceOperation = self.get_model('ServiceOperation')
+
+        for model in [Application, ApplicationGroup, ServiceOperation]:
+            post_save.connect(invalidate_authorization_cache, sender=model)
+            post_delete.connect(invalidate_authorization_cache, sender=model)
+
+        for through in [Application.groups.through, ApplicationGroup.service_operations.through]:
+            m2m_changed.connect(invalidate_authorization_cache, sender=through)
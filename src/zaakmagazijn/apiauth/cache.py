@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Application
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'zaakmagazijn.apiauth.authorizations'
+
+# Django caches that are kept per process.
+NOT_SHARED_CACHES = (DummyCache, LocMemCache)
+
+
+def load_authorizations():
+    """
+    Return the allowed operation names of all applications.
+
+    :return: A `dict` of application name to a `frozenset` of operation names.
+    """
+    authorizations = {name: set() for name in Application.objects.values_list('name', flat=True)}
+
+    operations = Application.objects.filter(
+        groups__service_operations__isnull=False
+    ).values_list('name', 'groups__service_operations__operation_name')
+    for name, operation_name in operations:
+        authorizations[name].add(operation_name)
+
+    return {name: frozenset(operation_names) for name, operation_names in authorizations.items()}
+
+
+class AuthorizationCache:
+    """
+    Keeps the allowed operation names of all applications, so an
+    authorization decision doesn't require any queries.
+
+    Depending on the `ZAAKMAGAZIJN_AUTHORIZATION_CACHE` setting, the
+    authorizations are kept in-process ('local') or in the Django cache with
+    that name. The cache is cleared whenever an `Application`,
+    `ApplicationGroup` or `ServiceOperation` changes (see `signals.py`) and
+    expires after `ZAAKMAGAZIJN_AUTHORIZATION_CACHE_TIMEOUT` seconds.
+
+    Clearing the cache only affects the other processes if the cache is
+    shared, see `is_shared`. Otherwise, like with 'local' or a
+    `LocMemCache`, the other processes see the changes when their cache
+    expires.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._authorizations = None
+        self._expires = 0
+
+    @property
+    def backend(self):
+        return getattr(settings, 'ZAAKMAGAZIJN_AUTHORIZATION_CACHE', None)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'ZAAKMAGAZIJN_AUTHORIZATION_CACHE_TIMEOUT', 300)
+
+    @property
+    def is_shared(self):
+        """
+        Whether the cache is shared between processes, so changes are seen by
+        all processes right away.
+        """
+        if not self.backend or self.backend == 'local':
+            return False
+        return not isinstance(caches[self.backend], NOT_SHARED_CACHES)
+
+    def _get(self):
+        if self.backend == 'local':
+            if self._expires > time.time():
+                return self._authorizations
+            return None
+        return caches[self.backend].get(CACHE_KEY)
+
+    def _set(self, authorizations):
+        if self.backend == 'local':
+            with self._lock:
+                self._authorizations = authorizations
+                self._expires = time.time() + self.timeout
+        else:
+            caches[self.backend].set(CACHE_KEY, authorizations, self.timeout)
+
+    def get_authorizations(self):
+        """
+        Return the allowed operation names of all applications, from the
+        cache if possible.
+        """
+        authorizations = self._get()
+        if authorizations is None:
+            authorizations = self.warm_up()
+        return authorizations
+
+    def warm_up(self):
+        """
+        (Re)load the authorizations of all applications into the cache.
+        """
+        authorizations = load_authorizations()
+        self._set(authorizations)
+
+        logger.debug('Loaded the authorizations of %d applications.', len(authorizations))
+        return authorizations
+
+    def clear(self):
+        if self.backend == 'local':
+            with self._lock:
+                self._authorizations = None
+                self._expires = 0
+        elif self.backend:
+            caches[self.backend].delete(CACHE_KEY)
+
+    def invalidate(self):
+        """
+        Clear the cache now and once the current transaction is committed, to
+        prevent caching data of the transaction before it's visible to others.
+        """
+        self.clear()
+        transaction.on_commit(self.clear)
+
+    def can_access(self, application, operation_name):
+        """
+        Same as `Application.objects.can_access` but using the cache, if
+        enabled.
+
+        :param application: The name of the application.
+        :param operation_name: The name of the `ServiceOperation`.
+        :return: `True` if the application is allowed to call the operation.
+        """
+        if not self.backend:
+            return Application.objects.can_access(application, operation_name)
+
+        try:
+            operation_names = self.get_authorizations()[application]
+        except KeyError:
+            raise Application.DoesNotExist(
+                'Application matching query does not exist.')
+        return operation_name in operation_names
+
+
+authorization_cache = AuthorizationCache()
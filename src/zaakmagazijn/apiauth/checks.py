@@ -0,0 +1,22 @@
+from django.core.checks import Warning, register
+
+from .cache import authorization_cache
+
+
+@register()
+def check_authorization_cache(app_configs, **kwargs):
+    """
+    Check that a Django cache used for the authorizations is shared between
+    processes, otherwise revoked authorizations are still allowed by the
+    other processes until the cache expires.
+    """
+    backend = authorization_cache.backend
+    if not backend or backend == 'local' or authorization_cache.is_shared:
+        return []
+
+    return [Warning(
+        'The authorization cache {!r} is not shared between processes.'.format(backend),
+        hint='Configure a shared cache (like memcached) in CACHES, or set ZAAKMAGAZIJN_AUTHORIZATION_CACHE '
+             "to 'local' to cache the authorizations for ZAAKMAGAZIJN_AUTHORIZATION_CACHE_TIMEOUT seconds.",
+        id='apiauth.W001',
+    )]
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
+
+from ...cache import authorization_cache
+
+
+class Command(BaseCommand):
+    """
+    Load the authorizations of all applications into the authorization cache.
+    """
+    help = _('Laadt de autorisaties van alle applicaties in de cache.')
+
+    def handle(self, *args, **options):
+        if not authorization_cache.backend:
+            raise CommandError('The authorization cache is disabled (ZAAKMAGAZIJN_AUTHORIZATION_CACHE).')
+        if not authorization_cache.is_shared:
+            raise CommandError('The authorization cache is not shared with other processes.')
+
+        authorizations = authorization_cache.warm_up()
+        self.stdout.write('Cached the authorizations of {} applications ({}).'.format(
+            len(authorizations), authorization_cache.backend))
@@ -5,15 +5,14 @@ from django.utils.text import capfirst
 
 
 def update_service_operations(sender, **kwargs):
-    # TODO [TECH]: Retrieve all application service from Spyne instead of importing all applications.
-    from ..api.applications import beantwoordvraag_app, verwerksynchroonvrijbericht_app, ontvangasynchroon_app
+    from ..api.applications import get_applications
     from .models import ServiceOperation
 
     existing_service_operations = []
     new_service_operations = []
 
     # Create new service operations.
-    for app in [beantwoordvraag_app, verwerksynchroonvrijbericht_app, ontvangasynchroon_app]:
+    for app in get_applications():
         for service in app.services:
             for public_method_name in service.public_methods.keys():
                 method, entity_level = public_method_name.split('_')
@@ -45,3 +44,9 @@ def update_service_operations(sender, **kwargs):
             nr_of_service_operations_deleted,
             nr_of_service_operations_created + len(existing_service_operations),
         ))
+
+
+def invalidate_authorization_cache(sender, **kwargs):
+    from .cache import authorization_cache
+
+    authorization_cache.invalidate()
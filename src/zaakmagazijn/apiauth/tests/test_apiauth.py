@@ -2,7 +2,7 @@ import io
 from contextlib import redirect_stdout
 
 from django.conf import settings
-from django.test import TestCase, override_settings
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from lxml import etree
 from zeep.xsd.const import Nil
@@ -11,7 +11,9 @@ from ...api.stuf.choices import BerichtcodeChoices
 from ...api.tests.base import BaseSoapTests
 from ...rgbz.choices import JaNee
 from ...rgbz.tests.factory_models import StatusFactory
-from ..models import ServiceOperation
+from ..cache import authorization_cache
+from ..checks import check_authorization_cache
+from ..models import Application, ServiceOperation
 from ..signals import update_service_operations
 from .factory_models import (
     ApplicationFactory, ApplicationGroupFactory, ServiceOperationFactory
@@ -139,6 +141,41 @@ class AuthorizationTests(BaseSoapTests):
         fault_xpath = '/soap11env:Envelope/soap11env:Body/soap11env:Fault'
         self._assert_xpath_results(xml, fault_xpath, 0, namespaces=self.nsmap)
 
+    @override_settings(ZAAKMAGAZIJN_OPEN_ACCESS=False)
+    def test_revoked_access_cached(self):
+        """
+        The cached authorizations are cleared when access is revoked, so the
+        next request is refused.
+        """
+        zender = {
+            'organisatie': 'Maykin Media',
+            'applicatie': 'Test',
+            'administratie': 'Support',
+            'gebruiker': 'john.doe@example.com',
+        }
+
+        service_operation = ServiceOperation.objects.filter(operation_name='geefZaakstatus_ZakLv01').first()
+
+        application = ApplicationFactory.create(name=zender['applicatie'])
+        group = ApplicationGroupFactory.create(name='Read-only')
+        group.service_operations.add(service_operation)
+
+        fault_xpath = '/soap11env:Envelope/soap11env:Body/soap11env:Fault'
+        refused_xpath = '*/soap11env:Fault/detail/stuf:Fo02Bericht/stuf:body/stuf:code[text()="StUF052"]'
+        for backend in ['local', 'default']:
+            with self.subTest(backend=backend), override_settings(ZAAKMAGAZIJN_AUTHORIZATION_CACHE=backend):
+                authorization_cache.clear()
+                self.addCleanup(authorization_cache.clear)
+                application.groups.add(group)
+
+                xml = self._simple_request(zender=zender)
+                self._assert_xpath_results(xml, fault_xpath, 0, namespaces=self.nsmap)
+
+                application.groups.remove(group)
+
+                xml = self._simple_request(zender=zender)
+                self._assert_xpath_results(xml, refused_xpath, 1, namespaces=self.nsmap)
+
     @override_settings(ZAAKMAGAZIJN_OPEN_ACCESS=False)
     def test_unknown_recipient(self):
         ontvanger = {
@@ -221,6 +258,76 @@ class ServiceOperationSignalTests(TestCase):
         ), out)
 
 
+@override_settings(ZAAKMAGAZIJN_AUTHORIZATION_CACHE='local')
+class AuthorizationCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.allowed = ServiceOperationFactory.create()
+        self.other = ServiceOperationFactory.create()
+        self.group = ApplicationGroupFactory.create()
+        self.group.service_operations.add(self.allowed)
+        self.application = ApplicationFactory.create()
+        self.application.groups.add(self.group)
+
+        authorization_cache.clear()
+        self.addCleanup(authorization_cache.clear)
+
+    def test_no_queries(self):
+        authorization_cache.warm_up()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(authorization_cache.can_access(self.application.name, self.allowed.operation_name))
+            self.assertFalse(authorization_cache.can_access(self.application.name, self.other.operation_name))
+
+    def test_unknown_application(self):
+        with self.assertRaises(Application.DoesNotExist):
+            authorization_cache.can_access('unknown', self.allowed.operation_name)
+
+    def test_invalidated_by_groups(self):
+        self.assertTrue(authorization_cache.can_access(self.application.name, self.allowed.operation_name))
+
+        self.application.groups.remove(self.group)
+
+        self.assertFalse(authorization_cache.can_access(self.application.name, self.allowed.operation_name))
+
+    def test_invalidated_by_service_operations(self):
+        self.assertFalse(authorization_cache.can_access(self.application.name, self.other.operation_name))
+
+        self.group.service_operations.add(self.other)
+
+        self.assertTrue(authorization_cache.can_access(self.application.name, self.other.operation_name))
+
+    def test_invalidated_by_application(self):
+        self.assertTrue(authorization_cache.can_access(self.application.name, self.allowed.operation_name))
+
+        self.application.name = 'renamed'
+        self.application.save()
+
+        self.assertTrue(authorization_cache.can_access('renamed', self.allowed.operation_name))
+
+
+class AuthorizationCacheCheckTests(SimpleTestCase):
+    @override_settings(ZAAKMAGAZIJN_AUTHORIZATION_CACHE='default', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_not_shared(self):
+        self.assertFalse(authorization_cache.is_shared)
+        self.assertEqual([warning.id for warning in check_authorization_cache(None)], ['apiauth.W001'])
+
+    @override_settings(ZAAKMAGAZIJN_AUTHORIZATION_CACHE='default', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'},
+    })
+    def test_shared(self):
+        self.assertTrue(authorization_cache.is_shared)
+        self.assertEqual(check_authorization_cache(None), [])
+
+    @override_settings(ZAAKMAGAZIJN_AUTHORIZATION_CACHE='local')
+    def test_local(self):
+        self.assertFalse(authorization_cache.is_shared)
+        self.assertEqual(check_authorization_cache(None), [])
+
+
 class MultitenancyTests(BaseSoapTests):
 
     def setUp(self):
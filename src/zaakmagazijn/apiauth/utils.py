@@ -7,6 +7,7 @@ from django.utils.translation import ugettext_lazy as _
 from ..api.stuf.choices import ClientFoutChoices, ServerFoutChoices
 from ..api.stuf.faults import StUFFault
 from ..api.stuf.utils import get_systeem
+from .cache import authorization_cache
 from .models import Application
 
 logger = logging.getLogger(__name__)
@@ -56,7 +57,7 @@ def handle_authorization(ctx):
 
         # Check if the sender exists
         try:
-            allow = Application.objects.can_access(zender.applicatie, method)
+            allow = authorization_cache.can_access(zender.applicatie, method)
         except Application.DoesNotExist:
             raise StUFFault(ClientFoutChoices.stuf013)
 
@@ -0,0 +1,10 @@
+from django.utils.translation import ugettext_lazy as _
+
+from djchoices import ChoiceItem, DjangoChoices
+
+
+class AsyncMessageStatus(DjangoChoices):
+    pending = ChoiceItem('pending', _('Pending'))
+    in_progress = ChoiceItem('in_progress', _('In progress'))
+    done = ChoiceItem('done', _('Done'))
+    failed = ChoiceItem('failed', _('Failed'))
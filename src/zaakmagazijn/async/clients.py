@@ -0,0 +1,128 @@
+"""
+Reuse zeep clients and HTTP connections for the messages sent by the
+`Consumer`.
+
+Creating a `zeep.Client` downloads and parses the WSDL of the endpoint and
+the XSDs it imports, which takes much longer than sending a message. The
+clients are cached per WSDL URL and refreshed after
+`ZAAKMAGAZIJN_CONSUMER_CLIENT_TIMEOUT` seconds. All clients share one
+`requests.Session`, so connections are kept alive between messages, and the
+downloaded documents are cached on disk for new processes.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from zeep import Client
+from zeep.cache import SqliteCache
+from zeep.transports import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class ClientCache:
+    """
+    A thread-safe cache of `zeep.Client` instances, by WSDL URL.
+    """
+    def __init__(self, timeout=None, pool_size=None, wsdl_cache_path=None, operation_timeout=None):
+        """
+        :param timeout: See the `ZAAKMAGAZIJN_CONSUMER_CLIENT_TIMEOUT` setting.
+        :param pool_size: See the `ZAAKMAGAZIJN_CONSUMER_POOL_SIZE` setting.
+        :param wsdl_cache_path: See the `ZAAKMAGAZIJN_CONSUMER_WSDL_CACHE` setting.
+        :param operation_timeout: See the `ZAAKMAGAZIJN_CONSUMER_TIMEOUT` setting.
+        """
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.wsdl_cache_path = wsdl_cache_path
+        self.operation_timeout = operation_timeout
+
+        self._lock = threading.Lock()
+        # URL to a tuple of the client and the time it expires.
+        self._clients = {}
+        # URL to the lock held while the client is created.
+        self._url_locks = {}
+        self._transport = None
+
+    def get(self, url: str, namespaces: dict=None) -> Client:
+        """
+        Return the client for the WSDL at :param:`url`. A client is created
+        once per URL, concurrent callers wait for it.
+
+        :param namespaces: The prefixes of the namespaces in the messages, by
+          prefix.
+        """
+        client = self._get(url)
+        if client is not None:
+            return client
+
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+
+        with url_lock:
+            client = self._get(url)
+            if client is None:
+                client = self.create_client(url, namespaces)
+                timeout = self.timeout if self.timeout is not None else settings.ZAAKMAGAZIJN_CONSUMER_CLIENT_TIMEOUT
+                self._clients[url] = (client, time.monotonic() + timeout)
+            return client
+
+    def _get(self, url):
+        entry = self._clients.get(url)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def create_client(self, url: str, namespaces: dict=None) -> Client:
+        logger.debug('Loading the WSDL at %s.', url)
+        client = Client(url, transport=self.transport)
+        for prefix, namespace in (namespaces or {}).items():
+            client.set_ns_prefix(prefix, namespace)
+        # The client is shared by threads, so it is not changed per message
+        # with `Client.options`. The `Consumer` checks the raw responses.
+        client.raw_response = True
+        return client
+
+    @property
+    def transport(self) -> Transport:
+        with self._lock:
+            if self._transport is None:
+                self._transport = self.create_transport()
+            return self._transport
+
+    def create_transport(self) -> Transport:
+        pool_size = self.pool_size if self.pool_size is not None else settings.ZAAKMAGAZIJN_CONSUMER_POOL_SIZE
+        path = self.wsdl_cache_path if self.wsdl_cache_path is not None else settings.ZAAKMAGAZIJN_CONSUMER_WSDL_CACHE
+        timeout = self.timeout if self.timeout is not None else settings.ZAAKMAGAZIJN_CONSUMER_CLIENT_TIMEOUT
+        operation_timeout = self.operation_timeout or settings.ZAAKMAGAZIJN_CONSUMER_TIMEOUT
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        cache = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cache = SqliteCache(path=path, timeout=timeout)
+
+        return Transport(cache=cache, session=session, operation_timeout=operation_timeout)
+
+    def clear(self) -> None:
+        """
+        Remove all clients, and close the connections.
+        """
+        with self._lock:
+            self._clients.clear()
+            self._url_locks.clear()
+            if self._transport is not None:
+                self._transport.session.close()
+                self._transport = None
+
+
+# The clients of this process, used by all `Consumer` instances.
+client_cache = ClientCache()
@@ -1,19 +1,30 @@
 from django.conf import settings
 
 from lxml import etree
-from zeep import Client
 
 from ..api.stuf.choices import BerichtcodeChoices
 from ..api.utils import create_unique_id
 from ..apiauth.choices import EndpointTypeChoices
 from ..utils import stuf_datetime
+from .clients import client_cache
 from .exceptions import ConsumerException, UnexpectedAnswerException
 
 
+def element_to_dict(element):
+    """
+    Convert an XML element to the (nested) data zeep expects, by the local
+    names of the child elements. Attributes are ignored.
+    """
+    if len(element) == 0:
+        return element.text
+    return {etree.QName(child).localname: element_to_dict(child) for child in element}
+
+
 class Consumer(object):
-    def __init__(self, application, dryrun=False):
+    def __init__(self, application, dryrun=False, client_cache=client_cache):
         self.application = application
         self.dryrun = dryrun
+        self.client_cache = client_cache
 
         self.endpoints = dict(application.endpoint_set.values_list('type', 'url'))
 
@@ -28,9 +39,7 @@ class Consumer(object):
         if endpoint_type not in EndpointTypeChoices.values.keys():
             raise ValueError('Invalid value for endpoint_type: {}'.format(endpoint_type))
 
-        client = Client(self.endpoints[endpoint_type])
-        for prefix, url in self.namespaces.items():
-            client.set_ns_prefix(prefix, url)
+        client = self.client_cache.get(self.endpoints[endpoint_type], self.namespaces)
 
         if self.dryrun:
             root = client.create_message(client.service, operation_name, **data)
@@ -39,8 +48,7 @@ class Consumer(object):
 
         # CommunicationLogEntry.objects.log(data, direction=CommunicationDirectionChoices.outgoing)
 
-        with client.options(raw_response=True):
-            response = client.service[operation_name](**data)
+        response = client.service[operation_name](**data)
 
         try:
             response_root = etree.fromstring(response.content)
@@ -94,3 +102,12 @@ class Consumer(object):
             data['melding'] = melding
 
         return self.request(EndpointTypeChoices.ontvang_asynchroon, operation_name, data)
+
+    def fo03(self, fault_detail):
+        """
+        Report that processing an asynchronous message failed.
+
+        :param fault_detail: The Fo03Bericht element, see `SpyneStUFFault`.
+        """
+        data = element_to_dict(fault_detail)
+        return self.request(EndpointTypeChoices.ontvang_asynchroon, 'Fo03', data)
@@ -1,3 +1,6 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.translation import ugettext as _
 
@@ -23,14 +26,32 @@ class Command(BaseCommand):
             'zaak_id',
             metavar='ZAAK_ID',
             action='store',
+            nargs='?',
             help='Zaak identification, as it is known by the system.'
         )
         parser.add_argument(
             'xrefnumber',
             metavar='XREFNUMBER',
             action='store',
+            nargs='?',
             help='The cross reference number.',
         )
+        parser.add_argument(
+            '-b', '--batch',
+            metavar='FILE',
+            action='store',
+            dest='batch',
+            default=None,
+            help='A file with a zaak identification and a cross reference number per line, instead of ZAAK_ID and '
+                 'XREFNUMBER. Use - to read from standard input.',
+        )
+        parser.add_argument(
+            '-w', '--workers',
+            type=int,
+            dest='workers',
+            default=4,
+            help='The number of messages of a batch that are sent at the same time.',
+        )
         parser.add_argument(
             '-m', '--message',
             metavar='MESSAGE',
@@ -65,10 +86,19 @@ class Command(BaseCommand):
             application = Application.objects.get(name=application_name)
         except Application.DoesNotExist as e:
             raise CommandError('Application "{}" does not exist.'.format(application_name))
-        try:
-            zaak = Zaak.objects.get(zaakidentificatie=zaak_id)
-        except Zaak.DoesNotExist as e:
-            raise CommandError('Zaak "{}" does not exist.'.format(zaak_id))
+
+        if options['batch']:
+            transfers = self._read_batch(options['batch'])
+        elif zaak_id and xrefnumber:
+            transfers = [(zaak_id, xrefnumber)]
+        else:
+            raise CommandError('Provide ZAAK_ID and XREFNUMBER, or a file with --batch.')
+
+        zaken = {zaak.zaakidentificatie: zaak for zaak in Zaak.objects.filter(
+            zaakidentificatie__in=[zaak_id for zaak_id, xrefnumber in transfers])}
+        missing = [zaak_id for zaak_id, xrefnumber in transfers if zaak_id not in zaken]
+        if missing:
+            raise CommandError('Zaak "{}" does not exist.'.format('", "'.join(missing)))
 
         sender_organisation = options.get('sender_organisation', None)
 
@@ -88,16 +118,46 @@ class Command(BaseCommand):
 
         consumer = Consumer(application, dryrun=dryrun)
 
+        def send(transfer):
+            zaak_id, xrefnumber = transfer
+            try:
+                result = consumer.overdragenZaak(zaken[zaak_id], accepted, xrefnumber, sender, melding=messages)
+                return 'Operation succeeded: {}'.format(result.content if result else '(no response)')
+            except UnexpectedAnswerException as e:
+                return 'Server returned an error: {}'.format(e)
+            except Exception as e:
+                return 'Operation failed: {}'.format(e)
+
+        # The messages are sent by threads, the database is only used here.
+        # The output of a dry run is printed, and should not be interleaved.
+        workers = 1 if dryrun else max(options['workers'], 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (zaak_id, xrefnumber), result in zip(transfers, executor.map(send, transfers)):
+                if len(transfers) > 1:
+                    result = 'Zaak "{}": {}'.format(zaak_id, result)
+                self.stdout.write(result)
+
+    def _read_batch(self, path):
+        """
+        Return the zaak identifications and cross reference numbers, separated
+        by whitespace, per line of the file at :param:`path`.
+        """
         try:
-            result = consumer.overdragenZaak(
-                zaak,
-                messages,
-                accepted,
-                xrefnumber,
-                sender,
-            )
-            self.stdout.write('Operation succeeded: {}'.format(result.content if result else '(no response)'))
-        except UnexpectedAnswerException as e:
-            self.stdout.write('Server returned an error: {}'.format(e))
-        except Exception as e:
-            self.stdout.write('Operation failed: {}'.format(e))
+            if path == '-':
+                lines = sys.stdin.readlines()
+            else:
+                with open(path) as f:
+                    lines = f.readlines()
+        except OSError as e:
+            raise CommandError('Could not read "{}": {}'.format(path, e))
+
+        transfers = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                zaak_id, xrefnumber = line.split()
+            except ValueError:
+                raise CommandError('Line {} of "{}" should contain ZAAK_ID and XREFNUMBER.'.format(number, path))
+            transfers.append((zaak_id, xrefnumber))
+        return transfers
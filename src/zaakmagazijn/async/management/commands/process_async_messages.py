@@ -0,0 +1,53 @@
+from django.utils.translation import ugettext as _
+
+from ....utils.workers import QueueWorkerCommand
+from ...choices import AsyncMessageStatus
+from ...models import AsyncMessage
+from ...processing import AsyncMessageWorker, get_statistics
+
+
+class Command(QueueWorkerCommand):
+    """
+    Processes the messages that were stored by the OntvangAsynchroon service,
+    see `zaakmagazijn.async.processing`.
+    """
+    help = _('Verwerkt de opgeslagen asynchrone berichten.')
+    items = 'messages'
+    retry_failed_help = 'Retry the messages that failed without sending a Fo03 to the sender.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            dest='stats',
+            default=False,
+            help='Show the number of waiting messages, the lag and the throughput per operation, and stop.',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            dest='window',
+            default=300,
+            help='The number of seconds over which the throughput is shown.',
+        )
+
+    def get_worker(self, options):
+        return AsyncMessageWorker(max_workers=options['workers'], batch_size=options['batch_size'])
+
+    def retry_failed(self):
+        # The sender already received a Fo03 for the other failed messages.
+        return AsyncMessage.objects.filter(status=AsyncMessageStatus.failed, fault_delivered=False).update(
+            status=AsyncMessageStatus.pending, last_error='')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            statistics = get_statistics(options['window'])
+            self.stdout.write('Pending: {pending}, in progress: {in_progress}, failed: {failed}'.format(**statistics))
+            self.stdout.write('Lag: {lag:.1f}s'.format(**statistics))
+            for operation, values in statistics['operations'].items():
+                self.stdout.write('{}: {} processed ({:.2f} messages/s, {:.3f}s on average)'.format(
+                    operation, values['processed'], values['per_second'], values['average_duration']))
+            return
+
+        super().handle(*args, **options)
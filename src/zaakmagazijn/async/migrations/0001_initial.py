@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsyncMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(db_index=True, max_length=100)),
+                ('referentienummer', models.CharField(blank=True, max_length=40)),
+                ('sender', models.CharField(blank=True, max_length=50)),
+                ('ordering_key', models.CharField(db_index=True, max_length=255)),
+                ('envelope', models.BinaryField(help_text='The SOAP envelope of the message.')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In progress'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('claimed_on', models.DateTimeField(blank=True, null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('completed_on', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('fault_delivered', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Async message',
+                'verbose_name_plural': 'Async messages',
+                'ordering': ('pk',),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+
+from .choices import AsyncMessageStatus
+
+
+class AsyncMessage(models.Model):
+    """
+    A message received by the OntvangAsynchroon service, confirmed with a Bv03
+    and processed later by the `process_async_messages` command. See
+    `zaakmagazijn.async.processing`.
+    """
+    # The name of the service function, for example "creeerZaak_ZakLk01".
+    operation = models.CharField(max_length=100, db_index=True)
+    referentienummer = models.CharField(max_length=40, blank=True)
+    # The application of the sender, which receives a Fo03 if processing fails.
+    sender = models.CharField(max_length=50, blank=True)
+    # Messages with the same ordering key are processed in order.
+    ordering_key = models.CharField(max_length=255, db_index=True)
+    envelope = models.BinaryField(help_text='The SOAP envelope of the message.')
+
+    status = models.CharField(
+        max_length=20, choices=AsyncMessageStatus.choices, default=AsyncMessageStatus.pending, db_index=True)
+    claimed_on = models.DateTimeField(null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    completed_on = models.DateTimeField(null=True, blank=True)
+    # The number of seconds it took to process the message.
+    duration = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    fault_delivered = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Async message'
+        verbose_name_plural = 'Async messages'
+        ordering = ('pk', )
+
+    def __str__(self):
+        return '{} {} ({})'.format(self.operation, self.referentienummer, self.status)
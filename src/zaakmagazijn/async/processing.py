@@ -0,0 +1,268 @@
+"""
+Asynchronous processing of the messages received by the OntvangAsynchroon
+service.
+
+With `ZAAKMAGAZIJN_ASYNC_PROCESSING`, a message that is valid and authorized
+is stored as an `AsyncMessage` and confirmed with a Bv03 right away. The
+`process_async_messages` command processes the stored messages with the same
+service functions, in order per zaak. If processing fails, the Fo03 is sent
+to the OntvangAsynchroon endpoint of the sender.
+"""
+import logging
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Min, Q
+from django.utils import timezone
+
+from lxml import etree
+from spyne import MethodContext
+from spyne.error import Fault
+
+from ..api.stuf.constants import STUF_XML_NS, ZKN_XML_NS
+from ..api.stuf.utils import get_bv03_stuurgegevens
+from ..api.utils import get_operation_name
+from ..apiauth.models import Application
+from ..utils.workers import QueueWorker
+from .choices import AsyncMessageStatus
+from .consumer import Consumer
+from .models import AsyncMessage
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = [AsyncMessageStatus.pending, AsyncMessageStatus.in_progress]
+
+NAMESPACES = {
+    'StUF': STUF_XML_NS,
+    'ZKN': ZKN_XML_NS,
+}
+
+
+def get_ordering_key(body) -> str:
+    """
+    Return the ordering key of a message: messages about the same zaak are
+    processed in the order they were received. Messages without a zaak are
+    ordered by their first entity, and other messages are not ordered.
+
+    :param body: The element in the SOAP body of the message.
+    """
+    for xpath in ['.//*[@StUF:entiteittype="ZAK"][ZKN:identificatie]', './/*[@StUF:entiteittype][ZKN:identificatie]']:
+        entities = body.xpath(xpath, namespaces=NAMESPACES)
+        if entities:
+            entity = entities[0]
+            identificatie = entity.find('{{{}}}identificatie'.format(ZKN_XML_NS)).text or ''
+            return '{}:{}'.format(entity.get('{{{}}}entiteittype'.format(STUF_XML_NS)), identificatie.strip())
+    return 'message:{}'.format(uuid.uuid4().hex)
+
+
+def is_processing(ctx) -> bool:
+    """
+    Return `True` if the service function is called by the worker, instead
+    of during the request.
+    """
+    return isinstance(ctx.udc, AsyncMessage)
+
+
+def accept_message(ctx) -> dict:
+    """
+    Store the message to be processed later.
+
+    :param ctx: The `MethodContext` of a valid and authorized message.
+    :return: The Bv03 response.
+    """
+    data = ctx.in_object[0]
+    zender = data.stuurgegevens.zender
+
+    message = AsyncMessage.objects.create(
+        operation=get_operation_name(ctx),
+        referentienummer=data.stuurgegevens.referentienummer or '',
+        sender=zender.applicatie or '' if zender else '',
+        ordering_key=get_ordering_key(ctx.in_body_doc),
+        envelope=etree.tostring(ctx.in_document),
+    )
+    logger.debug('Accepted message %s.', message)
+
+    return {
+        'stuurgegevens': get_bv03_stuurgegevens(data),
+    }
+
+
+def get_statistics(window: float=300) -> OrderedDict:
+    """
+    Return the state of the message queue.
+
+    :param window: The number of seconds over which the throughput is
+      calculated.
+    :return: A `OrderedDict` with the number of pending, in progress and
+      failed messages, the number of seconds the oldest pending message is
+      waiting, and per operation the number of messages processed per second
+      and their average duration.
+    """
+    now = timezone.now()
+    counts = dict(AsyncMessage.objects.filter(
+        status__in=UNFINISHED_STATUSES + [AsyncMessageStatus.failed]
+    ).values_list('status').annotate(Count('pk')))
+    oldest = AsyncMessage.objects.filter(status=AsyncMessageStatus.pending).aggregate(Min('created_on'))
+
+    operations = OrderedDict()
+    for operation, processed, duration in AsyncMessage.objects.filter(
+            completed_on__gte=now - timedelta(seconds=window)
+    ).order_by('operation').values_list('operation').annotate(Count('pk'), Avg('duration')):
+        operations[operation] = OrderedDict([
+            ('processed', processed),
+            ('per_second', processed / window),
+            ('average_duration', duration),
+        ])
+
+    return OrderedDict([
+        ('pending', counts.get(AsyncMessageStatus.pending, 0)),
+        ('in_progress', counts.get(AsyncMessageStatus.in_progress, 0)),
+        ('failed', counts.get(AsyncMessageStatus.failed, 0)),
+        ('lag', (now - oldest['created_on__min']).total_seconds() if oldest['created_on__min'] else 0.0),
+        ('operations', operations),
+    ])
+
+
+class AsyncMessageWorker(QueueWorker):
+    """
+    Processes the stored messages, using a pool of threads.
+
+    Multiple workers can run at the same time: the messages are claimed by a
+    worker before they are processed.
+    """
+    model = AsyncMessage
+    in_progress_status = AsyncMessageStatus.in_progress
+    unfinished_statuses = UNFINISHED_STATUSES
+
+    def __init__(self, max_workers: int=4, batch_size: int=100, claim_timeout: float=None):
+        """
+        :param max_workers: The number of threads processing messages.
+        :param batch_size: The maximum number of messages claimed at once.
+        :param claim_timeout: See the `ZAAKMAGAZIJN_ASYNC_CLAIM_TIMEOUT` setting.
+        """
+        super().__init__(max_workers=max_workers, batch_size=batch_size)
+        self.claim_timeout = claim_timeout or settings.ZAAKMAGAZIJN_ASYNC_CLAIM_TIMEOUT
+
+    def get_claimable(self, now):
+        stale = now - timedelta(seconds=self.claim_timeout)
+        return AsyncMessage.objects.filter(
+            Q(status=AsyncMessageStatus.pending) |
+            Q(status=AsyncMessageStatus.in_progress, claimed_on__lt=stale)
+        ).defer('envelope')
+
+    def process_group(self, messages: list) -> tuple:
+        """
+        Process `messages` in order. A failed message doesn't stop the next
+        messages: they fail or succeed as they would have synchronously.
+
+        :return: A tuple of the number of processed and failed messages.
+        """
+        results = [self.process(message) for message in messages]
+        return results.count(True), results.count(False)
+
+    def process(self, message: AsyncMessage):
+        """
+        Process a claimed message, and store the result. The changes of a
+        message that fails are rolled back.
+
+        The message is locked while it is processed, and its result is stored
+        in the same transaction as its changes. A locked message is not
+        reclaimed by another worker (see `claim`), so if a message is reclaimed
+        after `claim_timeout`, the changes of the earlier attempt were not
+        committed.
+
+        :return: `True` if the message was processed successfully, `False` if
+          it failed, or `None` if it was reclaimed by another worker.
+        """
+        start = time.perf_counter()
+        with transaction.atomic():
+            if not AsyncMessage.objects.select_for_update().filter(
+                    pk=message.pk, status=AsyncMessageStatus.in_progress, claimed_on=message.claimed_on).exists():
+                logger.warning('Message %s was reclaimed by another worker, skipping it.', message)
+                return None
+
+            try:
+                with transaction.atomic():
+                    error = self.call(message)
+                    if error is not None:
+                        transaction.set_rollback(True)
+            except Exception as e:
+                error = e
+                message.last_error = traceback.format_exc()
+            else:
+                if error is not None:
+                    message.last_error = '{}: {}'.format(
+                        error.faultstring,
+                        etree.tostring(error.detail).decode('utf-8') if error.detail is not None else '')
+
+            message.duration = time.perf_counter() - start
+            message.completed_on = timezone.now()
+            message.claimed_on = None
+            if error is None:
+                message.status = AsyncMessageStatus.done
+                message.last_error = ''
+                # The message is not needed anymore.
+                message.envelope = b''
+            else:
+                logger.error('Processing message %s failed: %s', message, error)
+                message.status = AsyncMessageStatus.failed
+
+            message.save(update_fields=[
+                'status', 'completed_on', 'claimed_on', 'duration', 'last_error', 'fault_delivered', 'envelope'])
+
+        # The Fo03 is sent after the failure is stored, so the message isn't
+        # locked while waiting for the sender.
+        if error is not None:
+            message.fault_delivered = self.deliver_fault(message, error)
+            if message.fault_delivered:
+                message.save(update_fields=['fault_delivered'])
+        return error is None
+
+    def call(self, message: AsyncMessage):
+        """
+        Call the service function of a message.
+
+        :return: The `Fault` if processing failed, or `None`.
+        """
+        from ..api.views import ontvangasynchroon_server  # circular import
+        server = ontvangasynchroon_server.server
+
+        ctx = MethodContext(server, MethodContext.SERVER)
+        ctx.in_string = [bytes(AsyncMessage.objects.values_list('envelope', flat=True).get(pk=message.pk))]
+
+        p_ctx = server.generate_contexts(ctx)[0]
+        try:
+            p_ctx.udc = message
+            if p_ctx.in_error is None:
+                server.get_in_object(p_ctx)
+            if p_ctx.in_error is not None:
+                return p_ctx.in_error
+
+            server.get_out_object(p_ctx)
+            return p_ctx.out_error
+        finally:
+            p_ctx.close()
+
+    def deliver_fault(self, message: AsyncMessage, error: Exception) -> bool:
+        """
+        Send the Fo03 of a failed message to the sender.
+
+        :return: `True` if the Fo03 was delivered.
+        """
+        # Only faults raised by the service contain a Fo03, other errors are
+        # logged for the administrator.
+        if not isinstance(error, Fault) or error.detail is None:
+            return False
+
+        try:
+            application = Application.objects.get(name=message.sender)
+            Consumer(application).fo03(error.detail)
+        except Exception:
+            logger.warning('Could not deliver the Fo03 for message %s.', message, exc_info=True)
+            return False
+        return True
@@ -0,0 +1,63 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from ..clients import ClientCache
+
+
+class ClientCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        patcher = patch('zaakmagazijn.async.clients.Client', side_effect=lambda url, transport: MagicMock(url=url))
+        self.Client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache = ClientCache(timeout=60, pool_size=2, wsdl_cache_path='')
+        self.addCleanup(self.cache.clear)
+
+    def test_get(self):
+        client = self.cache.get('http://example.com/?WSDL', {'stuf': 'http://www.egem.nl/StUF/StUF0301'})
+
+        self.assertIs(self.cache.get('http://example.com/?WSDL'), client)
+        self.assertIsNot(self.cache.get('http://example.org/?WSDL'), client)
+        self.assertEqual(self.Client.call_count, 2)
+
+        client.set_ns_prefix.assert_called_once_with('stuf', 'http://www.egem.nl/StUF/StUF0301')
+        self.assertTrue(client.raw_response)
+
+    def test_shared_transport(self):
+        self.cache.get('http://example.com/?WSDL')
+        self.cache.get('http://example.org/?WSDL')
+
+        transports = {call[1]['transport'] for call in self.Client.call_args_list}
+        self.assertEqual(len(transports), 1)
+        self.assertIsNone(transports.pop().cache)
+
+    def test_expired(self):
+        client = self.cache.get('http://example.com/?WSDL')
+
+        with patch('zaakmagazijn.async.clients.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNot(self.cache.get('http://example.com/?WSDL'), client)
+
+    def test_concurrent(self):
+        def create(url, transport):
+            # Loading the WSDL takes a while.
+            time.sleep(0.1)
+            return MagicMock(url=url)
+        self.Client.side_effect = create
+
+        clients = []
+        threads = [
+            threading.Thread(target=lambda: clients.append(self.cache.get('http://example.com/?WSDL')))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.Client.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
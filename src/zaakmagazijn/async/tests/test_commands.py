@@ -0,0 +1,78 @@
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from zaakmagazijn.apiauth.tests.factory_models import ApplicationFactory
+from zaakmagazijn.rgbz.tests.factory_models import ZaakFactory
+
+from ..choices import AsyncMessageStatus
+from ..models import AsyncMessage
+
+
+@patch('zaakmagazijn.async.consumer.Consumer.overdragenZaak', return_value=None)
+class OverdragenZaakCommandTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = ApplicationFactory.create(name='TTA')
+        self.zaken = ZaakFactory.create_batch(3)
+
+    def _write_batch(self, lines):
+        batch = tempfile.NamedTemporaryFile('w', suffix='.txt')
+        self.addCleanup(batch.close)
+        batch.write('\n'.join(lines))
+        batch.flush()
+        return batch.name
+
+    def test_single(self, overdragen_zaak):
+        out = StringIO()
+        call_command('overdragen_zaak', 'TTA', self.zaken[0].zaakidentificatie, 'xref', stdout=out)
+
+        overdragen_zaak.assert_called_once_with(self.zaken[0], True, 'xref', settings.ZAAKMAGAZIJN_SYSTEEM, melding=None)
+        self.assertEqual(out.getvalue(), 'Operation succeeded: (no response)\n')
+
+    def test_batch(self, overdragen_zaak):
+        path = self._write_batch(['{} xref-{}'.format(zaak.zaakidentificatie, i) for i, zaak in enumerate(self.zaken)])
+
+        out = StringIO()
+        call_command('overdragen_zaak', 'TTA', batch=path, workers=3, accepted=False, stdout=out)
+
+        self.assertEqual(overdragen_zaak.call_count, 3)
+        self.assertEqual(
+            sorted(call[0][2] for call in overdragen_zaak.call_args_list), ['xref-0', 'xref-1', 'xref-2'])
+        self.assertFalse(any(call[0][1] for call in overdragen_zaak.call_args_list))
+        # The results are written in the order of the batch.
+        self.assertEqual(out.getvalue().splitlines(), [
+            'Zaak "{}": Operation succeeded: (no response)'.format(zaak.zaakidentificatie) for zaak in self.zaken
+        ])
+
+    def test_batch_unknown_zaak(self, overdragen_zaak):
+        path = self._write_batch(['{} xref'.format(self.zaken[0].zaakidentificatie), 'unknown xref'])
+
+        with self.assertRaisesMessage(CommandError, 'Zaak "unknown" does not exist.'):
+            call_command('overdragen_zaak', 'TTA', batch=path)
+        overdragen_zaak.assert_not_called()
+
+    def test_batch_invalid_line(self, overdragen_zaak):
+        path = self._write_batch(['{}'.format(self.zaken[0].zaakidentificatie)])
+
+        with self.assertRaisesMessage(CommandError, 'Line 1'):
+            call_command('overdragen_zaak', 'TTA', batch=path)
+
+
+class ProcessAsyncMessagesCommandTests(TestCase):
+    def test_once(self):
+        message = AsyncMessage.objects.create(
+            operation='actualiseerZaakstatus_ZakLk01', sender='STP', ordering_key='ZAK:1', envelope=b'<xml/>',
+            status=AsyncMessageStatus.failed)
+        out = StringIO()
+
+        with patch('zaakmagazijn.async.processing.AsyncMessageWorker.call', return_value=None):
+            call_command('process_async_messages', once=True, retry_failed=True, stdout=out)
+
+        self.assertEqual(out.getvalue(), 'Retrying 1 failed messages.\nProcessed 1 messages, 0 failed.\n')
+        message.refresh_from_db()
+        self.assertEqual(message.status, AsyncMessageStatus.done)
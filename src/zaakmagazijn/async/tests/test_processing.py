@@ -0,0 +1,229 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lxml import etree
+from spyne.error import Fault
+
+from zaakmagazijn.api.stuf.choices import BerichtcodeChoices
+from zaakmagazijn.api.tests.base import BaseTestPlatformTests
+from zaakmagazijn.apiauth.tests.factory_models import ApplicationFactory
+from zaakmagazijn.rgbz.choices import JaNee
+from zaakmagazijn.rgbz.tests.factory_models import (
+    OrganisatorischeEenheidFactory, StatusTypeFactory, ZaakFactory
+)
+
+from ..choices import AsyncMessageStatus
+from ..models import AsyncMessage
+from ..processing import AsyncMessageWorker, get_ordering_key, get_statistics
+
+BODY = """
+<ZKN:zakLk01 xmlns:StUF="http://www.egem.nl/StUF/StUF0301" xmlns:ZKN="http://www.egem.nl/StUF/sector/zkn/0310">
+    <ZKN:object StUF:entiteittype="{entiteittype}">
+        <ZKN:identificatie>{identificatie}</ZKN:identificatie>
+        <ZKN:heeftBetrekkingOp StUF:entiteittype="ZAKOBJ">
+            <ZKN:gerelateerde StUF:entiteittype="EDC">
+                <ZKN:identificatie>document</ZKN:identificatie>
+            </ZKN:gerelateerde>
+        </ZKN:heeftBetrekkingOp>
+    </ZKN:object>
+</ZKN:zakLk01>
+"""
+
+
+class OrderingKeyTests(TestCase):
+    def test_zaak(self):
+        body = etree.fromstring(BODY.format(entiteittype='ZAK', identificatie=' 0000-1 '))
+        self.assertEqual(get_ordering_key(body), 'ZAK:0000-1')
+
+    def test_other_entity(self):
+        body = etree.fromstring(BODY.format(entiteittype='BSL', identificatie='besluit'))
+        self.assertEqual(get_ordering_key(body), 'BSL:besluit')
+
+    def test_no_entity(self):
+        body = etree.fromstring('<ZKN:zakLk01 xmlns:ZKN="http://www.egem.nl/StUF/sector/zkn/0310"/>')
+        self.assertTrue(get_ordering_key(body).startswith('message:'))
+        self.assertNotEqual(get_ordering_key(body), get_ordering_key(body))
+
+
+class AsyncMessageWorkerTests(TestCase):
+    def setUp(self):
+        self.worker = AsyncMessageWorker(max_workers=1)
+
+    def _create(self, ordering_key, status=AsyncMessageStatus.pending):
+        return AsyncMessage.objects.create(
+            operation='actualiseerZaakstatus_ZakLk01', sender='STP', ordering_key=ordering_key, envelope=b'<xml/>',
+            status=status)
+
+    def test_claim_in_order(self):
+        first = self._create('ZAK:1')
+        other = self._create('ZAK:2')
+        second = self._create('ZAK:1')
+
+        groups = self.worker.claim()
+
+        self.assertEqual(groups, [[first, second], [other]])
+        self.assertEqual(AsyncMessage.objects.filter(status=AsyncMessageStatus.in_progress).count(), 3)
+        self.assertEqual(self.worker.claim(), [])
+
+    def test_claim_waits_for_earlier_messages(self):
+        self._create('ZAK:1', status=AsyncMessageStatus.in_progress)
+        self._create('ZAK:1')
+        self._create('ZAK:2', status=AsyncMessageStatus.failed)
+        other = self._create('ZAK:2')
+
+        self.assertEqual(self.worker.claim(), [[other]])
+
+    def test_claim_skips_waiting_messages(self):
+        """
+        Messages waiting for a message that is being processed don't fill the
+        batch.
+        """
+        worker = AsyncMessageWorker(max_workers=1, batch_size=1)
+        self._create('ZAK:1', status=AsyncMessageStatus.in_progress)
+        self._create('ZAK:1')
+        self._create('ZAK:1')
+        other = self._create('ZAK:2')
+
+        self.assertEqual(worker.claim(), [[other]])
+
+    def test_process(self):
+        message = self._create('ZAK:1')
+
+        with patch.object(self.worker, 'call', return_value=None):
+            self.assertEqual(self.worker.run_once(), (1, 0))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, AsyncMessageStatus.done)
+        self.assertEqual(bytes(message.envelope), b'')
+        self.assertIsNotNone(message.duration)
+
+    @patch('zaakmagazijn.async.processing.Consumer')
+    def test_process_fault(self, consumer):
+        ApplicationFactory.create(name='STP')
+        message = self._create('ZAK:1')
+        detail = etree.fromstring('<Fo03Bericht/>')
+
+        with patch.object(self.worker, 'call', return_value=Fault(faultstring='Zaak not found', detail=detail)):
+            self.assertEqual(self.worker.run_once(), (0, 1))
+
+        consumer.return_value.fo03.assert_called_once_with(detail)
+        message.refresh_from_db()
+        self.assertEqual(message.status, AsyncMessageStatus.failed)
+        self.assertTrue(message.fault_delivered)
+        self.assertIn('Zaak not found', message.last_error)
+        # The message is kept, to be able to look into the problem.
+        self.assertEqual(bytes(message.envelope), b'<xml/>')
+
+    @patch('zaakmagazijn.async.processing.Consumer')
+    def test_process_error(self, consumer):
+        message = self._create('ZAK:1')
+
+        with patch.object(self.worker, 'call', side_effect=ValueError('unexpected')):
+            self.assertEqual(self.worker.run_once(), (0, 1))
+
+        consumer.assert_not_called()
+        message.refresh_from_db()
+        self.assertEqual(message.status, AsyncMessageStatus.failed)
+        self.assertFalse(message.fault_delivered)
+        self.assertIn('ValueError', message.last_error)
+
+    def test_process_reclaimed_message(self):
+        message = self._create('ZAK:1')
+        [[claimed]] = self.worker.claim()
+        # Another worker reclaimed the message after the claim timeout.
+        AsyncMessage.objects.filter(pk=message.pk).update(claimed_on=timezone.now() + timedelta(seconds=1))
+
+        with patch.object(self.worker, 'call', return_value=None) as call:
+            self.assertEqual(self.worker.process_group([claimed]), (0, 0))
+
+        call.assert_not_called()
+        message.refresh_from_db()
+        self.assertEqual(message.status, AsyncMessageStatus.in_progress)
+
+    def test_statistics(self):
+        self._create('ZAK:1')
+        self._create('ZAK:1')
+        self._create('ZAK:2', status=AsyncMessageStatus.failed)
+
+        with patch.object(self.worker, 'call', return_value=None):
+            self.worker.run_once()
+        self._create('ZAK:3')
+
+        statistics = get_statistics(window=60)
+        self.assertEqual(statistics['pending'], 1)
+        self.assertEqual(statistics['in_progress'], 0)
+        self.assertEqual(statistics['failed'], 1)
+        self.assertLess(statistics['lag'], 60)
+        self.assertEqual(statistics['operations']['actualiseerZaakstatus_ZakLk01']['processed'], 2)
+
+
+@override_settings(ZAAKMAGAZIJN_ASYNC_PROCESSING=True)
+class AsyncProcessingTests(BaseTestPlatformTests):
+    test_files_subfolder = 'stp_actualiseerZaakstatus'
+    porttype = 'OntvangAsynchroon'
+
+    def setUp(self):
+        super().setUp()
+        self.zaak = ZaakFactory.create()
+        self.status_type = StatusTypeFactory.create(
+            statustypeomschrijving='Intake afgerond', statustypevolgnummer=1, zaaktype=self.zaak.zaaktype)
+        self.oeh = OrganisatorischeEenheidFactory.create(
+            organisatieidentificatie=11111,
+            organisatieeenheididentificatie=33333,
+        )
+
+        self.context = {
+            'gemeentecode': '',
+            'referentienummer': self.genereerID(10),
+            'zds_zaaktype_code': '12345678',
+            'zds_zaaktype_omschrijving': 'Aanvraag burgerservicenummer behandelen',
+            'datumVandaag': self.genereerdatum(),
+            'datumEergisteren': self.genereerdatum(),
+            'tijdstipRegistratie': self.genereerdatumtijd(),
+            'organisatorischeEenheidIdentificatie': self.oeh.identificatie,
+            'genereerzaakident_identificatie_2': self.zaak.zaakidentificatie,
+            'zds_zaakstatus_code': '87654321',
+            'zds_zaakstatus_omschrijving': self.status_type.statustypeomschrijving,
+        }
+
+    def _do_actualiseer_zaakstatus(self):
+        response = self._do_request(self.porttype, 'actualiseerZaakstatus_ZakLk01_01.xml', self.context)
+        self.assertEquals(response.status_code, 200, response.content)
+
+        response_root = etree.fromstring(response.content)
+        response_berichtcode = response_root.xpath('//stuf:stuurgegevens/stuf:berichtcode', namespaces=self.nsmap)[0].text
+        self.assertEqual(response_berichtcode, BerichtcodeChoices.bv03, response.content)
+
+    def test_process(self):
+        self._do_actualiseer_zaakstatus()
+
+        message = AsyncMessage.objects.get()
+        self.assertEqual(message.status, AsyncMessageStatus.pending)
+        self.assertEqual(message.operation, 'actualiseerZaakstatus_ZakLk01')
+        self.assertEqual(message.sender, 'STP')
+        self.assertEqual(message.ordering_key, 'ZAK:{}'.format(self.zaak.zaakidentificatie))
+        self.assertFalse(self.zaak.status_set.exists())
+
+        self.assertEqual(AsyncMessageWorker(max_workers=1).run_once(), (1, 0))
+
+        status = self.zaak.status_set.get()
+        self.assertEqual(status.indicatie_laatst_gezette_status, JaNee.ja)
+        self.assertEqual(AsyncMessage.objects.get().status, AsyncMessageStatus.done)
+
+    @patch('zaakmagazijn.async.processing.Consumer')
+    def test_process_fault(self, consumer):
+        ApplicationFactory.create(name='STP')
+        self.context['genereerzaakident_identificatie_2'] = 'unknown'
+        self._do_actualiseer_zaakstatus()
+
+        self.assertEqual(AsyncMessageWorker(max_workers=1).run_once(), (0, 1))
+
+        message = AsyncMessage.objects.get()
+        self.assertEqual(message.status, AsyncMessageStatus.failed)
+        self.assertTrue(message.fault_delivered)
+
+        fault_detail = consumer.return_value.fo03.call_args[0][0]
+        self.assertEqual(etree.QName(fault_detail).localname, 'Fo03Bericht')
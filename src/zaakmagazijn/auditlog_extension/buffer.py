@@ -0,0 +1,110 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import router
+from django.db.models.signals import pre_save
+from django.utils import timezone
+
+from auditlog.models import LogEntry
+
+from ..utils.metrics import audit_log_entries, audit_log_entries_dropped
+from .spool import AuditSpool
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """
+    Collects log entries during a request, and writes them all at once at the
+    end of the request, see `AuditBufferMiddleware`.
+
+    Depending on the `ZAAKMAGAZIJN_AUDITLOG_MODE` setting, log entries are:
+
+    * 'direct': saved immediately, one query per log entry.
+    * 'buffer': saved with a single `bulk_create` at the end of the request,
+      or written to the spool if that fails.
+    * 'spool': written to a local spool file at the end of the request, and
+      stored in the database by the `drain_auditlog_spool` command. Saved
+      with `bulk_create` if writing the spool file fails.
+
+    Outside a request, log entries are written immediately (but still using
+    the spool, if configured).
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def mode(self):
+        return settings.ZAAKMAGAZIJN_AUDITLOG_MODE
+
+    @property
+    def spool(self):
+        return AuditSpool(settings.ZAAKMAGAZIJN_AUDITLOG_SPOOL_DIR)
+
+    @property
+    def is_active(self):
+        return getattr(self._local, 'entries', None) is not None
+
+    def start(self):
+        self._local.entries = []
+
+    def add(self, entry):
+        """
+        Add an unsaved `LogEntry` to the buffer.
+        """
+        if self.mode == 'direct':
+            entry.save()
+            audit_log_entries.inc(mode=self.mode)
+            return
+
+        # The time of reading, since the spool is drained later.
+        entry.timestamp = timezone.now()
+
+        # `bulk_create` doesn't send signals, but the receivers (see
+        # `signals.set_soap_data` and the `AuditlogMiddleware`) depend on the
+        # current request, so they are called right away.
+        pre_save.send(
+            sender=LogEntry, instance=entry, raw=False, using=router.db_for_write(LogEntry), update_fields=None)
+
+        if self.is_active:
+            self._local.entries.append(entry)
+        else:
+            self.write([entry])
+
+    def flush(self):
+        """
+        Write all buffered log entries and stop buffering.
+        """
+        entries = getattr(self._local, 'entries', None)
+        self._local.entries = None
+        if not entries:
+            return
+
+        self.write(entries)
+
+    def write(self, entries):
+        """
+        Write `entries` to the database or to the spool, depending on the mode.
+        If that fails, the other one is used, so the log entries aren't lost.
+        """
+        modes = ['spool', 'buffer'] if self.mode == 'spool' else ['buffer', 'spool']
+        for mode in modes:
+            try:
+                if mode == 'spool':
+                    self.spool.write(entries)
+                else:
+                    LogEntry.objects.bulk_create(entries)
+            except Exception:
+                logger.warning('Failed to write %d log entries (%s).', len(entries), mode, exc_info=True)
+                continue
+            audit_log_entries.inc(len(entries), mode=mode)
+            return
+
+        # The answer was already created, so don't fail the request.
+        audit_log_entries_dropped.inc(len(entries))
+        logger.error('Dropped %d log entries: %r', len(entries), [
+            (entry.content_type_id, entry.object_pk, entry.additional_data) for entry in entries])
+
+
+audit_buffer = AuditBuffer()
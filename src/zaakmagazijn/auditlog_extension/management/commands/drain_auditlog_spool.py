@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.translation import ugettext as _
+
+from ...spool import AuditSpool
+
+
+class Command(BaseCommand):
+    """
+    Store the log entries written to the spool files in the database.
+    """
+    help = _('Slaat de gespoolde audit log regels op in de database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=500,
+            help='The number of log entries created per query.',
+        )
+
+    def handle(self, *args, **options):
+        spool = AuditSpool(settings.ZAAKMAGAZIJN_AUDITLOG_SPOOL_DIR)
+        count = spool.drain(batch_size=options['batch_size'])
+
+        self.stdout.write('Drained {} log entries.'.format(count))
@@ -0,0 +1,15 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from .buffer import audit_buffer
+
+
+class AuditBufferMiddleware(MiddlewareMixin):
+    """
+    Buffer the log entries created during a request, see `AuditBuffer`.
+    """
+    def process_request(self, request):
+        audit_buffer.start()
+
+    def process_response(self, request, response):
+        audit_buffer.flush()
+        return response
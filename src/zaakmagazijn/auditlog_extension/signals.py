@@ -43,7 +43,8 @@ action_field.choices = LogEntry.Action.choices
 @receiver(service_read)
 def log_read(sender, instance, **kwargs):
     """
-    Signal receiver that creates a log entry.
+    Signal receiver that creates a log entry. Depending on the settings, the
+    log entry is saved at the end of the request, see `AuditBuffer`.
 
     This signal must be called explicitly, like:
 
@@ -75,4 +76,5 @@ def log_read(sender, instance, **kwargs):
     if callable(get_additional_data):
         attrs['additional_data'] = get_additional_data()
 
-    LogEntry.objects.create(**attrs)
+    from .buffer import audit_buffer
+    audit_buffer.add(LogEntry(**attrs))
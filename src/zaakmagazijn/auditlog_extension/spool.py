@@ -0,0 +1,132 @@
+import fcntl
+import json
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from auditlog.models import LogEntry
+
+logger = logging.getLogger(__name__)
+
+SPOOL_FIELDS = [
+    'action', 'content_type_id', 'object_pk', 'object_id', 'object_repr', 'changes', 'actor_id', 'remote_addr',
+    'timestamp', 'additional_data',
+]
+
+
+def entry_to_dict(entry):
+    data = {name: getattr(entry, name) for name in SPOOL_FIELDS}
+    # The `DjangoJSONEncoder` drops the microseconds.
+    data['timestamp'] = entry.timestamp.isoformat() if entry.timestamp else None
+    return data
+
+
+def entry_from_dict(data):
+    data = dict(data)
+    data['timestamp'] = parse_datetime(data['timestamp']) if data.get('timestamp') else None
+    return LogEntry(**data)
+
+
+@contextmanager
+def preserve_timestamps():
+    """
+    `LogEntry.timestamp` has `auto_now_add=True`, which would set the time
+    of draining instead of the time of reading. This is only safe to use
+    when no other threads are saving log entries, like in a management
+    command.
+    """
+    field = LogEntry._meta.get_field('timestamp')
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+class AuditSpool:
+    """
+    Writes log entries to local spool files, to be stored in the database
+    later by the `drain_auditlog_spool` management command.
+
+    Each process appends to its own file. Files are locked while writing, and
+    the drain renames a file before reading it, so no entries are lost when
+    both happen at the same time.
+    """
+    suffix = '.spool'
+    draining_suffix = '.draining'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self):
+        return os.path.join(self.directory, 'auditlog-{}{}'.format(os.getpid(), self.suffix))
+
+    def write(self, entries):
+        """
+        Append `entries` to the spool file of the current process.
+
+        :param entries: A list of unsaved `LogEntry` instances.
+        """
+        data = ''.join(json.dumps(entry_to_dict(entry), cls=DjangoJSONEncoder) + '\n' for entry in entries)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_path()
+        while True:
+            with open(path, 'a', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                # The file might have been renamed by the drain while waiting
+                # for the lock, in which case a new file is created.
+                try:
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue
+                except FileNotFoundError:
+                    continue
+                f.write(data)
+                return
+
+    def get_draining_files(self):
+        """
+        Rename all spool files, so new entries are written to new files, and
+        return the renamed files (including those of an interrupted drain).
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        for filename in os.listdir(self.directory):
+            if filename.endswith(self.suffix):
+                path = os.path.join(self.directory, filename)
+                # A unique name, in case an interrupted drain left a file.
+                os.rename(path, '{}.{}{}'.format(path, uuid.uuid4().hex, self.draining_suffix))
+
+        return sorted(
+            os.path.join(self.directory, filename)
+            for filename in os.listdir(self.directory) if filename.endswith(self.draining_suffix)
+        )
+
+    def drain(self, batch_size=500):
+        """
+        Store all spooled log entries in the database.
+
+        :param batch_size: The number of log entries created per query.
+        :return: The number of log entries created.
+        """
+        count = 0
+        for path in self.get_draining_files():
+            with open(path, encoding='utf-8') as f:
+                # Wait for a writer that opened the file before it was renamed.
+                fcntl.flock(f, fcntl.LOCK_EX)
+                entries = [entry_from_dict(json.loads(line)) for line in f if line.strip()]
+
+            with transaction.atomic(), preserve_timestamps():
+                LogEntry.objects.bulk_create(entries, batch_size=batch_size)
+            os.remove(path)
+
+            logger.debug('Drained %d log entries from %s.', len(entries), path)
+            count += len(entries)
+        return count
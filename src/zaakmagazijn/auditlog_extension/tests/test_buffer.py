@@ -0,0 +1,156 @@
+import os
+from datetime import timedelta
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auditlog.middleware import threadlocal
+from auditlog.models import LogEntry
+
+from ...apiauth.models import Organisation
+from ...apiauth.tests.factory_models import OrganisationFactory
+from ...utils.metrics import audit_log_entries_dropped
+from ..buffer import audit_buffer
+from ..signals import service_read
+from ..spool import AuditSpool
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.organisations = OrganisationFactory.create_batch(3)
+        # Make sure the content type is cached.
+        ContentType.objects.get_for_model(Organisation)
+
+        self.addCleanup(audit_buffer.flush)
+
+    def _read_all(self):
+        for organisation in self.organisations:
+            service_read.send(sender=self.__class__, instance=organisation)
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='buffer')
+    def test_buffer(self):
+        audit_buffer.start()
+        with self.assertNumQueries(0):
+            self._read_all()
+
+        with self.assertNumQueries(1):
+            audit_buffer.flush()
+
+        self.assertEqual(LogEntry.objects.filter(action=LogEntry.Action.READ).count(), 3)
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='buffer')
+    def test_additional_data(self):
+        threadlocal.auditlog = {'data': {'functie': 'geefZaakdetails_ZakLv01'}}
+        self.addCleanup(delattr, threadlocal, 'auditlog')
+
+        audit_buffer.start()
+        self._read_all()
+        audit_buffer.flush()
+
+        log_entry = LogEntry.objects.latest()
+        self.assertEqual(log_entry.additional_data, {'functie': 'geefZaakdetails_ZakLv01'})
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='buffer')
+    def test_not_started(self):
+        self._read_all()
+
+        self.assertEqual(LogEntry.objects.filter(action=LogEntry.Action.READ).count(), 3)
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='direct')
+    def test_direct(self):
+        audit_buffer.start()
+        with self.assertNumQueries(3):
+            self._read_all()
+
+        self.assertEqual(LogEntry.objects.filter(action=LogEntry.Action.READ).count(), 3)
+
+
+class AuditBufferFallbackTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.tempdir = TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+        spool_dir = override_settings(ZAAKMAGAZIJN_AUDITLOG_SPOOL_DIR=self.tempdir.name)
+        spool_dir.enable()
+        self.addCleanup(spool_dir.disable)
+
+        self.organisation = OrganisationFactory.create()
+        self.addCleanup(audit_buffer.flush)
+
+    def _read(self):
+        audit_buffer.start()
+        service_read.send(sender=self.__class__, instance=self.organisation)
+        audit_buffer.flush()
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='buffer')
+    def test_buffer_falls_back_to_spool(self):
+        with patch.object(LogEntry.objects, 'bulk_create', side_effect=DatabaseError('Database is down')):
+            self._read()
+
+        self.assertEqual(AuditSpool(self.tempdir.name).drain(), 1)
+        self.assertEqual(LogEntry.objects.get(action=LogEntry.Action.READ).object_id, self.organisation.pk)
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='spool')
+    def test_spool_falls_back_to_buffer(self):
+        with patch.object(AuditSpool, 'write', side_effect=OSError('Disk is full')):
+            self._read()
+
+        self.assertEqual(LogEntry.objects.get(action=LogEntry.Action.READ).object_id, self.organisation.pk)
+
+    @override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='buffer')
+    def test_dropped(self):
+        dropped = audit_log_entries_dropped.get() or 0
+
+        with patch.object(LogEntry.objects, 'bulk_create', side_effect=DatabaseError('Database is down')), \
+                patch.object(AuditSpool, 'write', side_effect=OSError('Disk is full')):
+            self._read()
+
+        self.assertEqual(audit_log_entries_dropped.get(), dropped + 1)
+
+
+class AuditSpoolTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.tempdir = TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+        self.organisation = OrganisationFactory.create()
+
+    def test_spool_and_drain(self):
+        with override_settings(ZAAKMAGAZIJN_AUDITLOG_MODE='spool', ZAAKMAGAZIJN_AUDITLOG_SPOOL_DIR=self.tempdir.name):
+            audit_buffer.start()
+            service_read.send(sender=self.__class__, instance=self.organisation)
+            audit_buffer.flush()
+
+        self.assertFalse(LogEntry.objects.filter(action=LogEntry.Action.READ).exists())
+        self.assertEqual(len(os.listdir(self.tempdir.name)), 1)
+
+        count = AuditSpool(self.tempdir.name).drain()
+
+        self.assertEqual(count, 1)
+        self.assertEqual(os.listdir(self.tempdir.name), [])
+        log_entry = LogEntry.objects.get(action=LogEntry.Action.READ)
+        self.assertEqual(log_entry.object_id, self.organisation.pk)
+        self.assertEqual(log_entry.object_repr, str(self.organisation))
+
+    def test_timestamp_preserved(self):
+        spool = AuditSpool(self.tempdir.name)
+        timestamp = timezone.now() - timedelta(hours=1)
+        spool.write([LogEntry(
+            action=LogEntry.Action.READ, content_type=ContentType.objects.get_for_model(Organisation),
+            object_pk=str(self.organisation.pk), object_id=self.organisation.pk,
+            object_repr=str(self.organisation), changes={}, timestamp=timestamp,
+        )])
+
+        spool.drain()
+
+        self.assertEqual(LogEntry.objects.get(action=LogEntry.Action.READ).timestamp, timestamp)
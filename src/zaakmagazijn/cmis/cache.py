@@ -0,0 +1,230 @@
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from .utils import get_cmis_object_id
+
+logger = logging.getLogger(__name__)
+
+
+class ObjectIdCache:
+    """
+    A thread-safe LRU cache with a time-to-live, from a document
+    identification or folder path to a CMIS object id.
+    """
+    def __init__(self, maxsize=1000, timeout=300):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, expires = self._entries[key]
+            except KeyError:
+                return None
+
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.maxsize:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ContentCache:
+    """
+    A size-bounded LRU cache of the content of DMS documents, stored as files
+    in a local directory which is shared by all processes.
+
+    Entries are keyed by the version series of the document, and the object
+    id and change token of the version, so changed content is never served
+    from the cache. Cached content is read through a memory map. The time a
+    file was last used is stored as its modification time.
+    """
+    suffix = '.content'
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _hash(self, value):
+        return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+    def _get_prefix(self, version_series_id):
+        # The change log only contains the bare object id.
+        return '{}-'.format(self._hash(get_cmis_object_id(version_series_id)))
+
+    def get_path(self, version_series_id, object_id, change_token=None):
+        filename = '{}{}{}'.format(
+            self._get_prefix(version_series_id), self._hash('{};{}'.format(object_id, change_token or '')),
+            self.suffix)
+        return os.path.join(self.directory, filename)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, version_series_id, object_id, change_token=None):
+        """
+        Return the cached content of a version of a document.
+
+        :param version_series_id: The `cmis:versionSeriesId` of the document.
+        :param object_id: The `cmis:objectId` of the version.
+        :param change_token: The `cmis:changeToken` of the version, if any.
+        :return: A memory map of the content, or `None` if it's not cached.
+        """
+        if not self.max_size:
+            return None
+
+        path = self.get_path(version_series_id, object_id, change_token)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    content = BytesIO()
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        self._count(hit=True)
+        return content
+
+    def set(self, version_series_id, object_id, change_token, stream):
+        """
+        Store the content of a version of a document. Content larger than the
+        cache is not stored.
+
+        :param version_series_id: The `cmis:versionSeriesId` of the document.
+        :param object_id: The `cmis:objectId` of the version.
+        :param change_token: The `cmis:changeToken` of the version, if any.
+        :param stream: A seekable file-like object with the content, which is
+          rewound afterwards.
+        """
+        if not self.max_size:
+            return
+
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        if size > self.max_size:
+            return
+
+        path = self.get_path(version_series_id, object_id, change_token)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Other processes never see a partially written entry.
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            try:
+                with open(fd, 'wb') as f:
+                    shutil.copyfileobj(stream, f)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as e:
+            logger.warning('Could not store the content of %s in the cache: %s', object_id, e)
+        finally:
+            stream.seek(0)
+
+        self.evict()
+
+    def invalidate(self, version_series_id):
+        """
+        Remove all cached versions of a document.
+
+        :param version_series_id: The `cmis:versionSeriesId` of the document,
+          or the object id in the CMIS change log.
+        """
+        if not self.max_size:
+            return
+
+        prefix = self._get_prefix(version_series_id)
+        for filename in self._listdir():
+            if filename.startswith(prefix):
+                self._remove(os.path.join(self.directory, filename))
+
+    def evict(self):
+        """
+        Remove the least recently used entries, until the cache fits its size.
+        """
+        entries = []
+        total_size = 0
+        for filename in self._listdir():
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def clear(self):
+        for filename in self._listdir():
+            self._remove(os.path.join(self.directory, filename))
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _listdir(self):
+        try:
+            return [filename for filename in os.listdir(self.directory) if filename.endswith(self.suffix)]
+        except FileNotFoundError:
+            return []
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
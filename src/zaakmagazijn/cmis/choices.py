@@ -71,3 +71,16 @@ class CMISCapabilityACL(DjangoChoices):
 class ChangeLogStatus(DjangoChoices):
     completed = ChoiceItem('completed', _('Completed'))
     in_progress = ChoiceItem('in_progress', _('In progress'))
+
+
+class DMSOperationType(DjangoChoices):
+    creeer_zaakfolder = ChoiceItem('creeer_zaakfolder', _('Creëer zaakfolder'))
+    maak_zaakdocument_met_inhoud = ChoiceItem('maak_zaakdocument_met_inhoud', _('Maak zaakdocument met inhoud'))
+    relateer_aan_zaak = ChoiceItem('relateer_aan_zaak', _('Relateer aan zaak'))
+
+
+class DMSOperationStatus(DjangoChoices):
+    pending = ChoiceItem('pending', _('Pending'))
+    in_progress = ChoiceItem('in_progress', _('In progress'))
+    done = ChoiceItem('done', _('Done'))
+    failed = ChoiceItem('failed', _('Failed'))
@@ -1,10 +1,9 @@
 import logging
+import posixpath
 from collections import OrderedDict
 from io import BytesIO
 
 from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
-from django.db import transaction
 from django.utils.functional import LazyObject
 from django.utils.module_loading import import_string
 
@@ -15,13 +14,15 @@ from cmislib.exceptions import ObjectNotFoundException, UpdateConflictException
 from zaakmagazijn.api.stuf.models import BinaireInhoud
 
 from ..rgbz.models.zaken import Zaak
-from .choices import ChangeLogStatus, CMISChangeType, CMISObjectType
+from ..utils.metrics import dms_request_duration, timed_methods
+from .cache import ContentCache, ObjectIdCache
+from .choices import CMISObjectType
 from .exceptions import (
     DocumentConflictException, DocumentDoesNotExistError, DocumentExistsError,
-    DocumentLockedException, SyncException
+    DocumentLockedException
 )
-from .models import ChangeLog
-from .utils import FolderConfig, get_cmis_object_id
+from .transport import install_connection_pool
+from .utils import FolderConfig
 
 logger = logging.getLogger(__name__)
 
@@ -105,6 +106,10 @@ class DMSClient:
         raise NotImplementedError  # noqa
 
 
+@timed_methods(dms_request_duration, [
+    'creeer_zaakfolder', 'maak_zaakdocument', 'maak_zaakdocument_met_inhoud', 'geef_inhoud', 'zet_inhoud',
+    'relateer_aan_zaak', 'update_zaakdocument', 'checkout', 'cancel_checkout', 'ontkoppel_zaakdocument', 'is_locked',
+    'verwijder_document', 'sync'])
 class CMISDMSClient(DMSClient):
     """
     DMS client implementation using the CMIS protocol.
@@ -112,6 +117,9 @@ class CMISDMSClient(DMSClient):
 
     document_query = CMISQuery("SELECT * FROM zsdms:document WHERE zsdms:documentIdentificatie = '%s'")
 
+    # Marks a folder path that was not found in the folder cache.
+    MISSING = object()
+
     def __init__(self, url=None, user=None, password=None):
         """
         Connect to the CMIS repository and store the root folder for further
@@ -128,13 +136,60 @@ class CMISDMSClient(DMSClient):
         if password is None:
             password = settings.CMIS_CLIENT_USER_PASSWORD
 
+        if settings.CMIS_CONNECTION_POOL_SIZE:
+            install_connection_pool(settings.CMIS_CONNECTION_POOL_SIZE, settings.CMIS_CONNECTION_TIMEOUT)
+
         _client = CmisClient(url, user, password)
         self._repo = _client.getDefaultRepository()
         self._root_folder = self._repo.getObjectByPath('/')
 
         self.upload_to = import_string(settings.CMIS_UPLOAD_TO)
 
-    def _get_or_create_folder(self, name: str, properties: dict=None, parent: AtomPubFolder=None) -> tuple:
+        # Document identification to CMIS version series id.
+        self._object_id_cache = ObjectIdCache(
+            settings.CMIS_OBJECT_ID_CACHE_SIZE, settings.CMIS_OBJECT_ID_CACHE_TIMEOUT)
+        # Folder path to CMIS object id, or `MISSING`.
+        self._folder_cache = ObjectIdCache(settings.CMIS_FOLDER_CACHE_SIZE, settings.CMIS_FOLDER_CACHE_TIMEOUT)
+        # Content of documents, stored on disk. The hit and miss counters are
+        # available via `content_cache.stats()`.
+        self.content_cache = ContentCache(settings.CMIS_CONTENT_CACHE_DIR, settings.CMIS_CONTENT_CACHE_SIZE)
+
+    def _get_folder(self, path: str, use_missing: bool=False) -> AtomPubFolder:
+        """
+        Retrieve the folder with :param:`path`, using the cached object id of
+        the folder if possible.
+
+        :param path: string, the absolute path of the folder.
+        :param use_missing: boolean, whether to trust the cache if the folder
+          was recently found to be missing. Only use this if the folder is
+          created next, since that fails if the folder exists after all.
+        :return: the folder, or `None` if it doesn't exist.
+        """
+        object_id = self._folder_cache.get(path)
+        if object_id is self.MISSING:
+            if use_missing:
+                return None
+        elif object_id is not None:
+            try:
+                folder = self._repo.getObject(object_id)
+            except ObjectNotFoundException:
+                folder = None
+            # The folder might have been moved, or removed.
+            if folder is not None and folder.properties.get('cmis:path') == path:
+                return folder
+            self._folder_cache.delete(path)
+
+        try:
+            folder = self._repo.getObjectByPath(path)
+        except ObjectNotFoundException:
+            self._folder_cache.set(path, self.MISSING)
+            return None
+
+        self._folder_cache.set(path, folder.getObjectId())
+        return folder
+
+    def _get_or_create_folder(self, name: str, properties: dict=None, parent: AtomPubFolder=None,
+                              lookup: bool=True) -> tuple:
         """
         Get or create the folder with :param:`name` in :param:`parent`.
 
@@ -143,29 +198,62 @@ class CMISDMSClient(DMSClient):
           pass to the folder object
         :param parent: parent folder to create the folder in as subfolder.
           Defaults to the root folder
+        :param lookup: boolean, whether to look up the folder before creating
+          it. Pass `False` if the folder probably doesn't exist.
         :return: a tuple of (folder, boolean) where the folder is the retrieved or created folder, and
           the boolean indicates whether the folder was created or not.
         """
         if parent is None:
             parent = self._root_folder
 
-        # check if it exists. Note that cmis:name is not guaranteed to be unique!
-        # NOTE: we're using getChildren, which MAY return files as well. However,
-        # the ZS/DMS spec does not allow for tree structures like that.
-        # NOTE: we return the first match by name - if there are more with the same
-        # name, we cannot decide which one would be the 'right' one
-        existing = next(
-            (child for child in parent.getChildren() if child.name == name),
-            None
-        )
-        if existing is not None:
-            # NOTE: properties may differ - we're not doing update actions here
-            return (existing, False)
+        path = posixpath.join(parent.properties['cmis:path'], name)
+        if lookup:
+            existing = self._get_folder(path, use_missing=True)
+            if existing is not None:
+                # NOTE: properties may differ - we're not doing update actions here
+                return (existing, False)
 
         # create the folder, since it didn't exist yet
-        # NOTE: concurrency may cause this to throw UpdateConflictException if
-        # another process creates the same folder name at the same time
-        return (parent.createFolder(name, properties=properties or {}), True)
+        try:
+            folder = parent.createFolder(name, properties=properties or {})
+        except UpdateConflictException:
+            # The folder exists already, possibly because another process
+            # created it at the same time.
+            existing = self._get_folder(path)
+            if existing is None:
+                raise
+            return (existing, False)
+
+        self._folder_cache.set(path, folder.getObjectId())
+        return (folder, True)
+
+    def _get_or_create_folders(self, folders: list) -> AtomPubFolder:
+        """
+        Get or create the folders in the path, described by :param:`folders`.
+
+        Starting with the parent of the last folder, the deepest existing
+        folder is looked up. The folders below it are created without looking
+        them up first. Usually, only the last folder is new, so this takes two
+        round trips: retrieving the parent folder and creating the folder.
+
+        :param folders: list of (name, properties) tuples, in order of root -> leaf.
+        :return: the last folder.
+        """
+        paths = []
+        for name, properties in folders:
+            paths.append(posixpath.join(paths[-1] if paths else '/', name))
+
+        parent = None
+        existing = len(folders) - 1
+        while existing > 0:
+            parent = self._get_folder(paths[existing - 1], use_missing=True)
+            if parent is not None:
+                break
+            existing -= 1
+
+        for name, properties in folders[existing:]:
+            parent, _ = self._get_or_create_folder(name, properties, parent=parent, lookup=False)
+        return parent
 
     def get_folder_name(self, zaak: Zaak, folder_config: FolderConfig) -> str:
         name = ''
@@ -181,7 +269,10 @@ class CMISDMSClient(DMSClient):
         upload_to = self.upload_to(zaak)
         bits = [self.get_folder_name(zaak, folder_config) for folder_config in upload_to]
         path = '/' + '/'.join(bits)
-        return self._repo.getObjectByPath(path)
+        folder = self._get_folder(path)
+        if folder is None:
+            raise ObjectNotFoundException(url=path)
+        return folder
 
     def _get_cmis_doc(self, document, checkout_id: str=None) -> AtomPubDocument:
         """
@@ -190,18 +281,23 @@ class CMISDMSClient(DMSClient):
         :param document: :class:`InformatieObject` instance.
         :return: :class:`AtomPubDocument` object
         """
-        query = self.document_query(document.informatieobjectidentificatie)
-        result_set = self._repo.query(query)
-        if not len(result_set):
-            raise DocumentDoesNotExistError(
-                "Document met identificatie {} bestaat niet in het DMS".format(
-                    document.informatieobjectidentificatie
+        identificatie = document.informatieobjectidentificatie
+        doc = self._get_cached_cmis_doc(identificatie)
+        if doc is None:
+            query = self.document_query(identificatie)
+            result_set = self._repo.query(query)
+            if not len(result_set):
+                raise DocumentDoesNotExistError(
+                    "Document met identificatie {} bestaat niet in het DMS".format(identificatie)
                 )
-            )
 
-        # NOTE: there should only be one document with this identification, but multiple versions can exist
-        doc = [item for item in result_set][0]
-        doc = doc.getLatestVersion()
+            # NOTE: there should only be one document with this identification, but multiple versions can exist
+            doc = [item for item in result_set][0]
+            doc = doc.getLatestVersion()
+
+            version_series_id = doc.properties.get('cmis:versionSeriesId')
+            if version_series_id:
+                self._object_id_cache.set(identificatie, version_series_id)
 
         if checkout_id is not None:
             # refresh and get the currently active private working copy
@@ -212,6 +308,36 @@ class CMISDMSClient(DMSClient):
                 raise DocumentConflictException("Foutieve 'pwc id' meegestuurd")
         return doc
 
+    def _get_cached_cmis_doc(self, identificatie: str):
+        """
+        Retrieve the latest version of the document by its cached version
+        series id, which avoids running a query in the DMS.
+
+        :param identificatie: The `informatieobjectidentificatie`.
+        :return: :class:`AtomPubDocument` object, or `None` if it's not cached
+          or the cached id is no longer valid.
+        """
+        version_series_id = self._object_id_cache.get(identificatie)
+        if version_series_id is None:
+            return None
+
+        try:
+            doc = self._repo.getObject(version_series_id)
+        except ObjectNotFoundException:
+            self._object_id_cache.delete(identificatie)
+            return None
+
+        # The id might have been reused, or the identification changed.
+        properties = doc.properties
+        if properties.get('cmis:versionSeriesId') != version_series_id or \
+                properties.get('zsdms:documentIdentificatie') != identificatie:
+            self._object_id_cache.delete(identificatie)
+            return None
+
+        if not properties.get('cmis:isLatestVersion'):
+            doc = doc.getLatestVersion()
+        return doc
+
     def _build_cmis_doc_properties(self, document, filename: str=None) -> dict:
         # build up the properties
         properties = document.get_cmis_properties()
@@ -241,7 +367,7 @@ class CMISDMSClient(DMSClient):
                     folder_config.type = 'cmis:folder'
 
         # create the folders according to the `upload_to` configuration
-        parent = None
+        folders = []
         for folder_config in upload_to:
             properties = {
                 'cmis:objectTypeId': folder_config.type,
@@ -254,9 +380,9 @@ class CMISDMSClient(DMSClient):
             elif folder_config.type == CMISObjectType.zaak_folder:
                 properties.update(zaak.get_cmis_properties())
 
-            parent, _ = self._get_or_create_folder(name, properties, parent=parent)
+            folders.append((name, properties))
 
-        zaak_folder = parent
+        zaak_folder = self._get_or_create_folders(folders)
         return zaak_folder
 
     def maak_zaakdocument(self, document, zaak: Zaak=None, filename: str=None, sender: str=None) -> AtomPubDocument:
@@ -351,6 +477,10 @@ class CMISDMSClient(DMSClient):
         # the objectId contains the version, which we strip off to always get the latest version back
         document._object_id = _doc.getObjectId().rsplit(';')[0]
         document.save(update_fields=['_object_id'])
+
+        version_series_id = _doc.properties.get('cmis:versionSeriesId')
+        if version_series_id:
+            self._object_id_cache.set(document.informatieobjectidentificatie, version_series_id)
         return _doc
 
     def geef_inhoud(self, document) -> tuple:
@@ -374,7 +504,21 @@ class CMISDMSClient(DMSClient):
         empty = doc.properties['cmis:contentStreamId'] is None
         if empty:
             return (filename, BytesIO())
-        return (filename, doc.getContentStream())
+
+        object_id = doc.getObjectId()
+        version_series_id = doc.properties.get('cmis:versionSeriesId') or object_id
+        change_token = doc.properties.get('cmis:changeToken')
+        content = self.content_cache.get(version_series_id, object_id, change_token)
+        if content is None:
+            content = doc.getContentStream()
+            self.content_cache.set(version_series_id, object_id, change_token, content)
+        return (filename, content)
+
+    def _invalidate_content(self, cmis_doc) -> None:
+        """
+        Remove the cached content of all versions of :param:`cmis_doc`.
+        """
+        self.content_cache.invalidate(cmis_doc.properties.get('cmis:versionSeriesId') or cmis_doc.getObjectId())
 
     def zet_inhoud(self, document, stream: BytesIO, content_type=None, checkout_id: str=None) -> None:
         """
@@ -389,6 +533,7 @@ class CMISDMSClient(DMSClient):
         cmis_doc = self._get_cmis_doc(document, checkout_id=checkout_id)
         cmis_doc = cmis_doc if not checkout_id else cmis_doc.getPrivateWorkingCopy()
         cmis_doc.setContentStream(stream, content_type)
+        self._invalidate_content(cmis_doc)
 
     def update_zaakdocument(self, document, checkout_id: str=None, inhoud: BinaireInhoud=None) -> None:
         cmis_doc = self._get_cmis_doc(document, checkout_id=checkout_id)
@@ -417,6 +562,7 @@ class CMISDMSClient(DMSClient):
         # all went well so far, so if we have a checkout_id, we must check the document back in
         if checkout_id:
             cmis_doc.checkin()
+        self._invalidate_content(cmis_doc)
 
     def relateer_aan_zaak(self, document, zaak: Zaak) -> None:
         """
@@ -428,7 +574,11 @@ class CMISDMSClient(DMSClient):
         zaakfolder = self._get_zaakfolder(zaak)
         # NOTE: can this ever be more than one entry?
         parent = [parent for parent in cmis_doc.getObjectParents()][0]
+        # The document might already be moved by a previous attempt.
+        if parent.getObjectId() == zaakfolder.getObjectId():
+            return
         cmis_doc.move(parent, zaakfolder)
+        self._object_id_cache.delete(document.informatieobjectidentificatie)
 
     def checkout(self, document) -> tuple:
         """
@@ -463,6 +613,7 @@ class CMISDMSClient(DMSClient):
         # cmis_folder.removeObject(cmis_doc)
         trash_folder, _ = self._get_or_create_folder(self.TRASH_FOLDER)
         cmis_doc.move(cmis_folder, trash_folder)
+        self._object_id_cache.delete(document.informatieobjectidentificatie)
 
     def is_locked(self, document) -> bool:
         cmis_doc = self._get_cmis_doc(document)
@@ -472,8 +623,9 @@ class CMISDMSClient(DMSClient):
     def verwijder_document(self, document) -> None:
         cmis_doc = self._get_cmis_doc(document)
         cmis_doc.delete()
+        self._object_id_cache.delete(document.informatieobjectidentificatie)
+        self._invalidate_content(cmis_doc)
 
-    @transaction.atomic
     def sync(self, dryrun=False) -> OrderedDict:
         """
         De zaakdocument registratie in het DMS wordt gesynchroniseerd met het
@@ -502,147 +654,16 @@ class CMISDMSClient(DMSClient):
 
         Zie: ZDS 1.2, paragraaf 5.4.2
 
+        De changelog wordt in pagina's verwerkt, zie `zaakmagazijn.cmis.sync`.
+
         :param dryrun: Retrieves all content changes from the DMS but doesn't
                        update the ZS.
         :return: A `OrderedDict` with all `CMISChangeType`s as key and the
                  number of actions as value.
         """
-        from zaakmagazijn.rgbz.models import EnkelvoudigInformatieObject  # circular import
-
-        # Eisen aan ZS:
-        #
-        # * De CMIS-changelog dient met een configureerbare tijdsinterval
-        #   opgehaald te worden uit het DMS;
-        # * Wijzigingen in de CMIS-changelog die nog niet verwerkt zijn in het
-        #   ZS dienen direct verwerkt te worden in het ZS;
-        # * Wijzigingen in het ZS mogen niet tot nieuwe wijzigingen in het DMS
-        #   leiden (een oneindige loop van updateberichten);
-
-        # TODO [TECH]: We should prolly update the ZS changelog token after WE update the DMS ourselves to prevent duplicate updates?
-        self._repo.reload()
-        try:
-            dms_change_log_token = int(self._repo.info['latestChangeLogToken'])
-        except KeyError:
-            raise ImproperlyConfigured('Could not retrieve the latest change log token from the DMS.')
-
-        if not dryrun:
-            change_log = ChangeLog.objects.create(token=dms_change_log_token)
-            if ChangeLog.objects.exclude(pk=change_log.pk).filter(status=ChangeLogStatus.in_progress).count() > 0:
-                change_log.delete()
-                raise SyncException('A synchronization process is already running.')
-        else:
-            change_log = None
-
-        # Check the last change log.
-        last_change_log = ChangeLog.objects.filter(status=ChangeLogStatus.completed).last()
-        # If no entry is found, assume this is the very first time to retrieve the change log.
-        last_zs_change_log_token = last_change_log.token if last_change_log else 0
-        # Determine the max items to retrieve to prevent the token from updating since the last retrieval.
-        max_items = dms_change_log_token - last_zs_change_log_token
-        # If the last ZS token, and the DMS token are the same, no updates are found.
-        if max_items < 0:
-            raise SyncException('The DMS change log token is older than our records.')
-        elif max_items == 0:
-            return {}
-
-        created, updated, deleted, security, failed = 0, 0, 0, 0, 0
-        cache = set()
-
-        result_set = self._repo.getContentChanges(
-            changeLogToken=last_zs_change_log_token,
-            includeProperties=True,
-            maxItems=max_items
-        )
-        for change_entry in result_set:
-            change_type = change_entry.changeType
-            object_id = get_cmis_object_id(change_entry.objectId)
-
-            # Skip already processed objects that have the same action.
-            cache_key = '{}-{}'.format(object_id, change_type)
-            if cache_key in cache:
-                continue
-            cache.add(cache_key)
-
-            try:
-                if change_type in [CMISChangeType.created, CMISChangeType.updated]:
-                    try:
-                        dms_document = self._repo.getObject(object_id)
-                    except ObjectNotFoundException as e:
-                        logger.error(
-                            '[%s-%s] Object was %s but could not be found in the DMS.',
-                            change_entry.id, object_id, change_type
-                        )
-                        failed += 1
-                        continue
-
-                    dms_object_type = dms_document.properties.get('cmis:objectTypeId')
-                    if dms_object_type == CMISObjectType.edc:
-                        if change_type == CMISChangeType.updated:
-                            # Update
-                            try:
-                                zs_document_id = dms_document.properties.get('zsdms:documentIdentificatie')
-                                edc = EnkelvoudigInformatieObject.objects.get(
-                                    informatieobjectidentificatie=zs_document_id
-                                )
-                            except EnkelvoudigInformatieObject.DoesNotExist as e:
-                                logger.error(
-                                    '[%s-%s] Object was %s but could not be found in the ZS.',
-                                    change_entry.id, object_id, change_type
-                                )
-                                failed += 1
-                            else:
-                                edc.update_cmis_properties(dms_document.properties, commit=not dryrun)
-                                updated += 1
-                        else:
-                            # Create ("Koppel Zaakdocument aan Zaak")
-                            zaak_folder = dms_document.getPaths()[0].split('/')[-2]
-                            zaak = Zaak.objects.get(zaakidentificatie=zaak_folder)
-                            if not dryrun:
-                                EnkelvoudigInformatieObject.objects.create_from_cmis_properties(
-                                    dms_document.properties, zaak, object_id
-                                )
-                            created += 1
-                    else:
-                        # The specification only indicates to synchronize EDC
-                        # properties from the DMS to the ZS.
-                        pass
-                elif change_type == CMISChangeType.deleted:
-                    # Delete
-                    if not dryrun:
-                        delete_count = EnkelvoudigInformatieObject.objects.filter(_object_id=object_id).delete()
-                        if delete_count[0] == 0:
-                            logger.warning(
-                                '[%s-%s] Object was %s but could not be found in the ZS.',
-                                change_entry.id, object_id, change_type
-                            )
-                            failed += 1
-                        else:
-                            deleted += 1
-                elif change_type == CMISChangeType.security:
-                    logger.info('[%s-%s] Security changes are not processed.', change_entry.id, object_id)
-                    security += 1
-                else:
-                    logger.error('[%s-%s] Unsupported change type: %s', change_entry.id, object_id, change_type)
-                    failed += 1
-            except Exception as e:
-                failed += 1
-                logger.exception(
-                    '[%s-%s] Could not process "%s" in ZS: %s',
-                    change_entry.id, object_id, change_type, e,
-                    exc_info=True
-                )
+        from .sync import ChangeLogSync  # circular import
 
-        if not dryrun:
-            change_log.status = ChangeLogStatus.completed
-            change_log.save()
-
-        return OrderedDict([
-            (CMISChangeType.created, created),
-            (CMISChangeType.updated, updated),
-            (CMISChangeType.deleted, deleted),
-            (CMISChangeType.security, security),
-            ('failed', failed),
-        ])
+        return ChangeLogSync(self).run(dryrun)
 
 
 class DummyDMSClient(DMSClient):
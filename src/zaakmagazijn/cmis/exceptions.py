@@ -20,3 +20,11 @@ class DocumentConflictException(DMSException):
 
 class DocumentLockedException(DMSException):
     pass
+
+
+class DMSOperationFailed(DMSException):
+    pass
+
+
+class DMSOperationTimeout(DMSException):
+    pass
@@ -1,6 +1,7 @@
 from zaakmagazijn.api.stuf.models import BinaireInhoud
 
 from .client import default_client as dms_client
+from .outbox import dms_outbox
 
 
 class DMSFieldDescriptor:
@@ -9,6 +10,7 @@ class DMSFieldDescriptor:
         self.field_name = field_name
 
     def __get__(self, instance, cls=None):
+        dms_outbox.wait_for_document(instance)
         filename, inhoud = dms_client.geef_inhoud(instance)
         return {
             'data': inhoud,
@@ -1,9 +1,11 @@
 import logging
+import signal
 
 from django.core.management.base import BaseCommand
 from django.utils.translation import ugettext as _
 
 from ...client import CMISDMSClient
+from ...sync import ChangeLogSync, SyncWorker, get_lag
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +24,62 @@ class Command(BaseCommand):
             default=False,
             help='Retrieves all content changes from the DMS but doesn\'t update the ZS.',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=None,
+            help='The number of change log entries processed per transaction.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=None,
+            help='The number of threads retrieving the changed objects from the DMS.',
+        )
+        parser.add_argument(
+            '--continuous',
+            action='store_true',
+            dest='continuous',
+            default=False,
+            help='Keep synchronizing, by polling the DMS for changes.',
+        )
+        parser.add_argument(
+            '--lag',
+            action='store_true',
+            dest='lag',
+            default=False,
+            help='Shows how far the ZS is behind the DMS, without synchronizing.',
+        )
 
     def handle(self, *args, **options):
         dryrun = options.get('dryrun', False)
         verbosity = options.get('verbosity', False)
 
-        client = CMISDMSClient()
-        result = client.sync(dryrun)
+        if options['lag']:
+            lag = get_lag(CMISDMSClient())
+            self.stdout.write('Sync lag: {}'.format(', '.join(['{}: {}'.format(k, v) for k, v in lag.items()])))
+            return
+
+        if options['continuous']:
+            worker = SyncWorker(batch_size=options.get('batch_size'), max_workers=options.get('workers'))
+
+            # Finish the current synchronization when stopped.
+            stopped = []
+
+            def stop(signum, frame):
+                logger.info('Stopping after the current synchronization.')
+                stopped.append(signum)
+
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+            worker.run(stop=lambda: bool(stopped))
+            return
+
+        sync = ChangeLogSync(CMISDMSClient(), batch_size=options.get('batch_size'), max_workers=options.get('workers'))
+        result = sync.run(dryrun)
 
         msg = ', '.join(['{}: {}'.format(k, v) for k, v in result.items()])
 
@@ -36,3 +87,5 @@ class Command(BaseCommand):
         if 'failed' in result and result['failed']:
             out = self.stderr
         out.write('Sync result: {}{}'.format(msg, ' (dryrun)' if dryrun else ''))
+        self.stdout.write('Processed {} entries in {:.1f}s ({:.1f} entries/s)'.format(
+            sync.entries, sync.duration, sync.throughput))
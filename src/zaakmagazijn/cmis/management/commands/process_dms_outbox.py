@@ -0,0 +1,24 @@
+from django.utils.translation import ugettext as _
+
+from ....utils.workers import QueueWorkerCommand
+from ...choices import DMSOperationStatus
+from ...models import DMSOperation
+from ...outbox import OutboxWorker
+
+
+class Command(QueueWorkerCommand):
+    """
+    Executes the operations in the DMS that were stored in the outbox, see
+    `zaakmagazijn.cmis.outbox`.
+    """
+    help = _('Voert de opgeslagen DMS operaties uit.')
+    items = 'operations'
+    processed = 'Executed'
+    retry_failed_help = 'Retry the operations that failed permanently.'
+
+    def get_worker(self, options):
+        return OutboxWorker(max_workers=options['workers'], batch_size=options['batch_size'])
+
+    def retry_failed(self):
+        return DMSOperation.objects.filter(status=DMSOperationStatus.failed).update(
+            status=DMSOperationStatus.pending, attempts=0)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rgbz', '0017_auto_20191011_1607'),
+        ('cmis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DMSOperation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('creeer_zaakfolder', 'Creëer zaakfolder'), ('maak_zaakdocument_met_inhoud', 'Maak zaakdocument met inhoud'), ('relateer_aan_zaak', 'Relateer aan zaak')], max_length=50)),
+                ('idempotency_key', models.CharField(max_length=255, unique=True)),
+                ('ordering_key', models.CharField(db_index=True, max_length=255)),
+                ('arguments', models.TextField(blank=True, help_text='Additional arguments of the operation, as JSON.')),
+                ('content', models.BinaryField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In progress'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_on', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('completed_on', models.DateTimeField(blank=True, null=True)),
+                ('informatieobject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rgbz.EnkelvoudigInformatieObject')),
+                ('zaak', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rgbz.Zaak')),
+            ],
+            options={
+                'verbose_name': 'DMS operation',
+                'verbose_name_plural': 'DMS operations',
+                'ordering': ('pk',),
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+import zaakmagazijn.cmis.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmis', '0004_lease'),
+    ]
+
+    operations = [
+        # The content of pending operations can't be kept, the outbox should
+        # be empty before migrating.
+        migrations.RemoveField(
+            model_name='dmsoperation',
+            name='content',
+        ),
+        migrations.AddField(
+            model_name='dmsoperation',
+            name='content',
+            field=models.FileField(
+                blank=True, null=True, storage=zaakmagazijn.cmis.models.OutboxContentStorage(),
+                upload_to='%Y/%m/%d'),
+        ),
+    ]
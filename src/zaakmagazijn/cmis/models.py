@@ -1,19 +1,27 @@
+import json
 import logging
 
+from django.conf import settings
 from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from zaakmagazijn.api.stuf.utils import get_model_field, get_model_value
 from zaakmagazijn.utils.fields import StUFDateField
 
-from .choices import ChangeLogStatus
+from .choices import ChangeLogStatus, DMSOperationStatus, DMSOperationType
 
 logger = logging.getLogger(__name__)
 
 
 class ChangeLog(models.Model):
     token = models.BigIntegerField()
+    # The change log token from which an interrupted synchronization resumes.
+    processed_token = models.BigIntegerField(null=True, blank=True)
     created_on = models.DateTimeField(auto_now_add=True, unique=True)
+    updated_on = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=ChangeLogStatus.choices, default=ChangeLogStatus.in_progress)
 
     class Meta:
@@ -22,6 +30,74 @@ class ChangeLog(models.Model):
         ordering = ('created_on', )
 
 
+class Lease(models.Model):
+    """
+    A lease on a process that should run only once at a time, like the
+    synchronization of the change log. See `zaakmagazijn.cmis.sync.Lease`.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=255, blank=True)
+    expires_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Lease'
+        verbose_name_plural = 'Leases'
+
+
+class OutboxContentStorage(FileSystemStorage):
+    """
+    Stores the content of the documents in the DMS outbox in
+    `ZAAKMAGAZIJN_DMS_OUTBOX_CONTENT_DIR`, instead of `MEDIA_ROOT`.
+    """
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.ZAAKMAGAZIJN_DMS_OUTBOX_CONTENT_DIR)
+
+
+outbox_content_storage = OutboxContentStorage()
+
+
+class DMSOperation(models.Model):
+    """
+    An operation in the DMS, stored in the same transaction as the changes in
+    the database and executed later by the `process_dms_outbox` command. See
+    `zaakmagazijn.cmis.outbox`.
+    """
+    operation = models.CharField(max_length=50, choices=DMSOperationType.choices)
+    # Enqueueing the same operation twice has no effect.
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    # Operations with the same ordering key are executed in order.
+    ordering_key = models.CharField(max_length=255, db_index=True)
+
+    zaak = models.ForeignKey(
+        'rgbz.Zaak', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    informatieobject = models.ForeignKey(
+        'rgbz.EnkelvoudigInformatieObject', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    arguments = models.TextField(blank=True, help_text='Additional arguments of the operation, as JSON.')
+    # The content is streamed to a file, instead of held in memory.
+    content = models.FileField(storage=outbox_content_storage, upload_to='%Y/%m/%d', null=True, blank=True)
+
+    status = models.CharField(
+        max_length=20, choices=DMSOperationStatus.choices, default=DMSOperationStatus.pending, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    claimed_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    completed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'DMS operation'
+        verbose_name_plural = 'DMS operations'
+        ordering = ('pk', )
+
+    def __str__(self):
+        return '{} ({})'.format(self.idempotency_key, self.status)
+
+    def get_arguments(self):
+        return json.loads(self.arguments) if self.arguments else {}
+
+
 class CMISMixin(models.Model):
     CMIS_MAPPING = None
 
@@ -0,0 +1,306 @@
+"""
+A transactional outbox for operations in the DMS.
+
+Instead of calling the DMS while holding database locks, services store the
+operations in the DMS with `dms_outbox`, in the same transaction as their
+changes in the database. The `process_dms_outbox` management command
+executes them afterwards with `OutboxWorker`, and retries failed operations.
+
+Operations with the same ordering key (all operations on one document, or on
+one zaak folder) are executed one at a time, in the order they were stored.
+Operations on a document in a zaak folder also wait for the earlier
+operations on the zaak folder.
+"""
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OuterRef, Q
+from django.utils import timezone
+
+from ..utils.workers import QueueWorker
+from .choices import DMSOperationStatus, DMSOperationType
+from .client import default_client
+from .exceptions import (
+    DMSOperationFailed, DMSOperationTimeout, DocumentExistsError
+)
+from .models import DMSOperation
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = [DMSOperationStatus.pending, DMSOperationStatus.in_progress, DMSOperationStatus.failed]
+
+
+def get_zaak_ordering_key(zaak):
+    return 'zaak:{}'.format(zaak.pk)
+
+
+def get_document_ordering_key(document):
+    return 'document:{}'.format(document.pk)
+
+
+class DMSOutbox:
+    """
+    Stores operations in the DMS, to be executed by the `OutboxWorker`. The
+    methods mirror those of `DMSClient`, but return the `DMSOperation`.
+    """
+    def enqueue(self, operation: str, idempotency_key: str, ordering_key: str, zaak=None, informatieobject=None,
+                stream=None, **arguments) -> DMSOperation:
+        """
+        Store an operation, unless an operation with the same idempotency key
+        already exists.
+
+        :param operation: A `DMSOperationType`.
+        :param idempotency_key: Uniquely identifies the operation.
+        :param ordering_key: Operations with the same key are executed in order.
+        :param zaak: The `Zaak` passed to the `DMSClient`.
+        :param informatieobject: The `EnkelvoudigInformatieObject` passed to the `DMSClient`.
+        :param stream: The content of the document, a file-like object. It's
+          copied to a file in `ZAAKMAGAZIJN_DMS_OUTBOX_CONTENT_DIR`.
+        :param arguments: Other arguments passed to the `DMSClient`, these should be JSON serializable.
+        :return: The `DMSOperation`.
+        """
+        dms_operation, created = DMSOperation.objects.get_or_create(
+            idempotency_key=idempotency_key,
+            defaults={
+                'operation': operation,
+                'ordering_key': ordering_key,
+                'zaak': zaak,
+                'informatieobject': informatieobject,
+                'arguments': json.dumps(arguments, cls=DjangoJSONEncoder),
+            }
+        )
+        if not created:
+            logger.debug('DMS operation %s was already stored.', idempotency_key)
+        elif stream is not None:
+            # Copied in chunks, the content isn't held in memory.
+            dms_operation.content.save('{}.bin'.format(dms_operation.pk), File(stream), save=False)
+            dms_operation.save(update_fields=['content'])
+        return dms_operation
+
+    def creeer_zaakfolder(self, zaak) -> DMSOperation:
+        return self.enqueue(
+            DMSOperationType.creeer_zaakfolder,
+            'creeer_zaakfolder:{}'.format(zaak.pk),
+            get_zaak_ordering_key(zaak),
+            zaak=zaak,
+        )
+
+    def maak_zaakdocument(self, document, zaak=None, filename: str=None, sender: str=None) -> DMSOperation:
+        return self.maak_zaakdocument_met_inhoud(document, zaak, filename, sender)
+
+    def maak_zaakdocument_met_inhoud(self, document, zaak=None, filename: str=None, sender: str=None,
+                                     stream: BytesIO=None, content_type=None) -> DMSOperation:
+        return self.enqueue(
+            DMSOperationType.maak_zaakdocument_met_inhoud,
+            'maak_zaakdocument_met_inhoud:{}'.format(document.pk),
+            get_document_ordering_key(document),
+            zaak=zaak,
+            informatieobject=document,
+            stream=stream,
+            filename=filename,
+            sender=sender,
+            content_type=content_type,
+        )
+
+    def relateer_aan_zaak(self, document, zaak) -> DMSOperation:
+        return self.enqueue(
+            DMSOperationType.relateer_aan_zaak,
+            'relateer_aan_zaak:{}:{}'.format(document.pk, zaak.pk),
+            get_document_ordering_key(document),
+            zaak=zaak,
+            informatieobject=document,
+        )
+
+    def wait(self, operations, timeout: float=None, poll_interval: float=0.1) -> None:
+        """
+        Wait until all `operations` are executed. This only works outside the
+        transaction in which the operations were stored.
+
+        :param operations: An iterable of `DMSOperation` instances.
+        :param timeout: The number of seconds to wait, defaults to the
+          `ZAAKMAGAZIJN_DMS_OUTBOX_WAIT_TIMEOUT` setting.
+        :param poll_interval: The number of seconds between checks.
+        :raises: `DMSOperationFailed` if an operation failed permanently, or
+          `DMSOperationTimeout` if the operations were not executed in time.
+        """
+        if timeout is None:
+            timeout = settings.ZAAKMAGAZIJN_DMS_OUTBOX_WAIT_TIMEOUT
+        deadline = time.monotonic() + timeout
+
+        pks = {operation.pk for operation in operations}
+        while pks:
+            unfinished = DMSOperation.objects.filter(pk__in=pks).exclude(status=DMSOperationStatus.done)
+            pks = set()
+            for pk, status, idempotency_key in unfinished.values_list('pk', 'status', 'idempotency_key'):
+                if status == DMSOperationStatus.failed:
+                    raise DMSOperationFailed('DMS operatie {} is mislukt.'.format(idempotency_key))
+                pks.add(pk)
+
+            if pks:
+                if time.monotonic() >= deadline:
+                    raise DMSOperationTimeout('{} DMS operatie(s) zijn niet op tijd uitgevoerd.'.format(len(pks)))
+                time.sleep(poll_interval)
+
+    def wait_for_document(self, document, timeout: float=None) -> None:
+        """
+        Wait until all stored operations on `document` are executed, before
+        reading the document from the DMS. Does nothing if the outbox is
+        disabled.
+
+        :param document: The `EnkelvoudigInformatieObject`.
+        :param timeout: See `wait`.
+        """
+        if not settings.ZAAKMAGAZIJN_DMS_OUTBOX:
+            return
+
+        operations = DMSOperation.objects.filter(
+            ordering_key=get_document_ordering_key(document), status__in=UNFINISHED_STATUSES)
+        self.wait(operations.only('pk'), timeout=timeout)
+
+
+dms_outbox = DMSOutbox()
+
+
+class OutboxWorker(QueueWorker):
+    """
+    Executes the operations stored in the outbox, using a pool of threads.
+
+    Multiple workers can run at the same time: the operations are claimed by
+    a worker before they are executed, outside of a database transaction.
+    """
+    model = DMSOperation
+    in_progress_status = DMSOperationStatus.in_progress
+    unfinished_statuses = UNFINISHED_STATUSES
+
+    def __init__(self, client=None, max_workers: int=4, batch_size: int=100, max_attempts: int=None,
+                 retry_delay: float=None, claim_timeout: float=None):
+        """
+        :param client: The `DMSClient`, defaults to the configured client.
+        :param max_workers: The number of threads executing operations.
+        :param batch_size: The maximum number of operations claimed at once.
+        :param max_attempts: See the `ZAAKMAGAZIJN_DMS_OUTBOX_MAX_ATTEMPTS` setting.
+        :param retry_delay: See the `ZAAKMAGAZIJN_DMS_OUTBOX_RETRY_DELAY` setting.
+        :param claim_timeout: See the `ZAAKMAGAZIJN_DMS_OUTBOX_CLAIM_TIMEOUT` setting.
+        """
+        super().__init__(max_workers=max_workers, batch_size=batch_size)
+        self.client = client if client is not None else default_client
+        self.max_attempts = max_attempts or settings.ZAAKMAGAZIJN_DMS_OUTBOX_MAX_ATTEMPTS
+        self.retry_delay = retry_delay if retry_delay is not None else settings.ZAAKMAGAZIJN_DMS_OUTBOX_RETRY_DELAY
+        self.claim_timeout = claim_timeout or settings.ZAAKMAGAZIJN_DMS_OUTBOX_CLAIM_TIMEOUT
+
+    def get_claimable(self, now):
+        stale = now - timedelta(seconds=self.claim_timeout)
+        return DMSOperation.objects.filter(
+            Q(status=DMSOperationStatus.pending, next_attempt_on__lte=now) |
+            Q(status=DMSOperationStatus.in_progress, claimed_on__lt=stale)
+        )
+
+    def get_dependencies(self, operation):
+        # An operation on a document in a zaak folder waits until the folder
+        # is created.
+        if operation.zaak_id is None:
+            return []
+        zaak_ordering_key = 'zaak:{}'.format(operation.zaak_id)
+        return [zaak_ordering_key] if operation.ordering_key != zaak_ordering_key else []
+
+    def get_blocked_by(self, unclaimable):
+        # The operations on a zaak folder are the operations with the zaak
+        # and an ordering key of a zaak.
+        return super().get_blocked_by(unclaimable) + [
+            unclaimable.filter(zaak_id=OuterRef('zaak_id'), ordering_key__startswith='zaak:')
+        ]
+
+    def get_claim_updates(self):
+        return {'attempts': F('attempts') + 1}
+
+    def claim(self) -> list:
+        groups = super().claim()
+        for group in groups:
+            for operation in group:
+                operation.attempts += 1
+        return groups
+
+    def process_group(self, operations: list) -> tuple:
+        """
+        Execute `operations` in order, until one fails. The remaining
+        operations are released, to be executed after the failed operation.
+
+        :return: A tuple of the number of executed and failed operations.
+        """
+        for i, operation in enumerate(operations):
+            if not self.execute(operation):
+                remaining = [other.pk for other in operations[i + 1:]]
+                if remaining:
+                    DMSOperation.objects.filter(pk__in=remaining).update(
+                        status=DMSOperationStatus.pending, claimed_on=None, attempts=F('attempts') - 1)
+                return i, 1
+        return len(operations), 0
+
+    def execute(self, operation: DMSOperation) -> bool:
+        """
+        Execute a claimed operation, and store the result.
+
+        :return: `True` if the operation was executed successfully.
+        """
+        try:
+            handler = getattr(self, 'handle_{}'.format(operation.operation))
+            handler(operation)
+        except Exception as exc:
+            operation.last_error = traceback.format_exc()
+            operation.claimed_on = None
+            # Retrying doesn't help if another document has the same identificatie.
+            if operation.attempts >= self.max_attempts or isinstance(exc, DocumentExistsError):
+                logger.error(
+                    'DMS operation %s failed after %d attempts.', operation.idempotency_key, operation.attempts,
+                    exc_info=True)
+                operation.status = DMSOperationStatus.failed
+            else:
+                delay = self.retry_delay * 2 ** (operation.attempts - 1)
+                logger.warning(
+                    'DMS operation %s failed, retrying in %d seconds.', operation.idempotency_key, delay,
+                    exc_info=True)
+                operation.status = DMSOperationStatus.pending
+                operation.next_attempt_on = timezone.now() + timedelta(seconds=delay)
+            operation.save(update_fields=['status', 'next_attempt_on', 'claimed_on', 'last_error'])
+            return False
+
+        operation.status = DMSOperationStatus.done
+        operation.completed_on = timezone.now()
+        operation.claimed_on = None
+        operation.last_error = ''
+        # The content is stored in the DMS now.
+        if operation.content:
+            operation.content.delete(save=False)
+        operation.save(update_fields=['status', 'completed_on', 'claimed_on', 'last_error', 'content'])
+        return True
+
+    def handle_creeer_zaakfolder(self, operation: DMSOperation) -> None:
+        self.client.creeer_zaakfolder(operation.zaak)
+
+    def handle_maak_zaakdocument_met_inhoud(self, operation: DMSOperation) -> None:
+        stream = operation.content.storage.open(operation.content.name) if operation.content else None
+        try:
+            self.client.maak_zaakdocument_met_inhoud(
+                operation.informatieobject, zaak=operation.zaak, stream=stream, **operation.get_arguments())
+        except DocumentExistsError:
+            # A previous attempt may have created the document, and failed
+            # before the operation was marked as done. The object id is only
+            # stored when the document was created for this informatieobject,
+            # otherwise it's a document with the same identificatie.
+            operation.informatieobject.refresh_from_db(fields=['_object_id'])
+            if not operation.informatieobject._object_id:
+                raise
+            logger.info('Document of DMS operation %s was already created.', operation.idempotency_key)
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def handle_relateer_aan_zaak(self, operation: DMSOperation) -> None:
+        self.client.relateer_aan_zaak(operation.informatieobject, operation.zaak)
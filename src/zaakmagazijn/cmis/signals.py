@@ -1,6 +1,7 @@
 """
 Signal handlers voor ZS-DMS interactie.
 """
+from django.conf import settings
 from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -8,6 +9,7 @@ from django.dispatch import receiver
 from zaakmagazijn.rgbz.models import Zaak
 
 from .client import default_client as client
+from .outbox import dms_outbox
 
 
 @receiver(post_save, sender=Zaak, dispatch_uid='cmis.creeer_zaakfolder')
@@ -16,6 +18,12 @@ def creeer_zaakfolder(signal, instance, **kwargs):
     if not kwargs['created'] or kwargs['raw']:
         return
 
+    # The folder is created by the outbox worker, and only if the transaction
+    # is committed.
+    if settings.ZAAKMAGAZIJN_DMS_OUTBOX:
+        dms_outbox.creeer_zaakfolder(instance)
+        return
+
     transaction.on_commit(
         lambda: client.creeer_zaakfolder(instance),
         using=kwargs['using']
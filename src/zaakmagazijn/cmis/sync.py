@@ -0,0 +1,593 @@
+"""
+Synchronization of the ZS with the CMIS change log of the DMS, see
+`CMISDMSClient.sync`.
+
+The change log is processed in pages of `batch_size` entries. The objects of
+a page are retrieved from the DMS concurrently, and the changes in the
+database are stored in one transaction per page. After each page, the change
+log token of the next page is stored in the `ChangeLog`, so an interrupted
+synchronization resumes from there instead of from the start.
+
+Only one synchronization runs at a time: it holds a `Lease`, which is renewed
+after each page and expires when the process holding it stops without
+releasing it. The `SyncWorker` synchronizes continuously, by polling the
+latest change log token of the DMS.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cmislib.exceptions import ObjectNotFoundException
+
+from ..rgbz.models import EnkelvoudigInformatieObject, Zaak
+from ..utils.metrics import (
+    REGISTRY, cmis_sync_seconds_since_last_batch, cmis_sync_token_lag
+)
+from .choices import ChangeLogStatus, CMISChangeType, CMISObjectType
+from .exceptions import SyncException
+from .models import ChangeLog, Lease as LeaseModel
+from .utils import get_cmis_object_id
+
+logger = logging.getLogger(__name__)
+
+SYNC_LEASE = 'cmis-sync'
+
+
+def get_latest_token(client) -> int:
+    """
+    Return the latest change log token of the DMS.
+
+    :param client: The `CMISDMSClient`.
+    """
+    repo = client._repo
+    repo.reload()
+    try:
+        return int(repo.info['latestChangeLogToken'])
+    except KeyError:
+        raise ImproperlyConfigured('Could not retrieve the latest change log token from the DMS.')
+
+
+def get_last_token() -> int:
+    """
+    Return the change log token up to which the ZS is synchronized.
+    """
+    last_change_log = ChangeLog.objects.filter(status=ChangeLogStatus.completed).last()
+    # If no entry is found, assume this is the very first time to retrieve the change log.
+    return last_change_log.token if last_change_log else 0
+
+
+def get_lag(client, dms_change_log_token: int=None) -> OrderedDict:
+    """
+    Return how far the ZS is behind the DMS.
+
+    :param client: The `CMISDMSClient`.
+    :param dms_change_log_token: The latest change log token of the DMS,
+      retrieved from the DMS if not given.
+    :return: A `OrderedDict` with the latest change log token of the DMS, the
+      token up to which the ZS is synchronized, the difference, and the number
+      of seconds since the last batch of changes was stored (`None` if the
+      ZS was never synchronized).
+    """
+    if dms_change_log_token is None:
+        dms_change_log_token = get_latest_token(client)
+
+    zs_change_log_token = get_last_token()
+    change_log = ChangeLog.objects.last()
+    if change_log is not None and change_log.status == ChangeLogStatus.in_progress and change_log.processed_token:
+        zs_change_log_token = change_log.processed_token
+
+    seconds_since_last_batch = None
+    if change_log is not None:
+        seconds_since_last_batch = (timezone.now() - change_log.updated_on).total_seconds()
+
+    return OrderedDict([
+        ('dms_token', dms_change_log_token),
+        ('zs_token', zs_change_log_token),
+        ('token_lag', max(dms_change_log_token - zs_change_log_token, 0)),
+        ('seconds_since_last_batch', seconds_since_last_batch),
+    ])
+
+
+class Lease:
+    """
+    A lease on a process that should run only once at a time, stored in the
+    database. The lease is held until it is released or expires, and can be
+    renewed by its owner.
+    """
+    def __init__(self, name: str, duration: float, owner: str=None):
+        """
+        :param name: The name of the process.
+        :param duration: The number of seconds after which the lease expires,
+          if it is not renewed.
+        :param owner: A unique name of the owner, defaults to the host, the
+          process id and a random suffix.
+        """
+        self.name = name
+        self.duration = duration
+        self.owner = owner or '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self._created = False
+        # The time (of `time.monotonic`) after which a held lease is renewed by `acquire`.
+        self._renew_after = None
+
+    def acquire(self) -> bool:
+        """
+        Acquire the lease. A held lease is only renewed if less than half of
+        its duration is left, so polling doesn't write to the database.
+
+        :return: `True` if the lease is held by this owner.
+        """
+        if self._renew_after is not None and time.monotonic() < self._renew_after:
+            return True
+        return self.renew()
+
+    def renew(self) -> bool:
+        """
+        Acquire or renew the lease.
+
+        :return: `True` if the lease is held by this owner.
+        """
+        self._create()
+        now = timezone.now()
+        # The conditional update is atomic, so only one owner can take over
+        # an expired lease.
+        held = bool(LeaseModel.objects.filter(
+            Q(owner=self.owner) | Q(expires_on__isnull=True) | Q(expires_on__lt=now), name=self.name
+        ).update(owner=self.owner, expires_on=now + timedelta(seconds=self.duration)))
+        self._renew_after = time.monotonic() + self.duration / 2 if held else None
+        return held
+
+    def release(self) -> None:
+        self._renew_after = None
+        LeaseModel.objects.filter(name=self.name, owner=self.owner).update(owner='', expires_on=None)
+
+    def _create(self) -> None:
+        if self._created:
+            return
+        if not LeaseModel.objects.filter(name=self.name).exists():
+            try:
+                with transaction.atomic():
+                    LeaseModel.objects.create(name=self.name)
+            except IntegrityError:
+                # Created by another owner at the same time.
+                pass
+        self._created = True
+
+
+class ChangeLogSync:
+    """
+    Processes the CMIS change log of the DMS, see the module documentation.
+    """
+    def __init__(self, client, batch_size: int=None, max_workers: int=None, timeout: float=None,
+                 lease: Lease=None):
+        """
+        :param client: The `CMISDMSClient`.
+        :param batch_size: See the `CMIS_SYNC_BATCH_SIZE` setting.
+        :param max_workers: See the `CMIS_SYNC_WORKERS` setting.
+        :param timeout: See the `CMIS_SYNC_TIMEOUT` setting.
+        :param lease: The `Lease` held by the caller. By default, a lease is
+          acquired and released by `run`.
+        """
+        self.client = client
+        self.batch_size = batch_size or settings.CMIS_SYNC_BATCH_SIZE
+        self.max_workers = max_workers or settings.CMIS_SYNC_WORKERS
+        self.timeout = timeout or settings.CMIS_SYNC_TIMEOUT
+        self.lease = lease
+
+        # The number of change log entries processed, and how long it took.
+        self.entries = 0
+        self.duration = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        The number of change log entries processed per second.
+        """
+        return self.entries / self.duration if self.duration else 0.0
+
+    def run(self, dryrun: bool=False, dms_change_log_token: int=None) -> OrderedDict:
+        """
+        Process the changes in the DMS since the last synchronization.
+
+        :param dryrun: Retrieves all content changes from the DMS but doesn't
+          update the ZS.
+        :param dms_change_log_token: The latest change log token of the DMS,
+          retrieved from the DMS if not given.
+        :return: A `OrderedDict` with all `CMISChangeType`s as key and the
+          number of actions as value.
+        """
+        # Eisen aan ZS:
+        #
+        # * De CMIS-changelog dient met een configureerbare tijdsinterval
+        #   opgehaald te worden uit het DMS;
+        # * Wijzigingen in de CMIS-changelog die nog niet verwerkt zijn in het
+        #   ZS dienen direct verwerkt te worden in het ZS;
+        # * Wijzigingen in het ZS mogen niet tot nieuwe wijzigingen in het DMS
+        #   leiden (een oneindige loop van updateberichten);
+        start = time.perf_counter()
+
+        if dms_change_log_token is None:
+            dms_change_log_token = get_latest_token(self.client)
+
+        # Check the last change log.
+        last_zs_change_log_token = get_last_token()
+        if dms_change_log_token < last_zs_change_log_token:
+            raise SyncException('The DMS change log token is older than our records.')
+
+        lease = self.lease
+        if not dryrun and lease is None:
+            lease = Lease(SYNC_LEASE, self.timeout)
+            if not lease.acquire():
+                raise SyncException('A synchronization process is already running.')
+        try:
+            counts = self._run(dryrun, dms_change_log_token, last_zs_change_log_token, lease)
+        finally:
+            if lease is not None and self.lease is None:
+                lease.release()
+
+        self.duration = time.perf_counter() - start
+        logger.info(
+            'Processed %d change log entries in %.1fs (%.1f entries/s).', self.entries, self.duration, self.throughput)
+        return counts
+
+    def _run(self, dryrun: bool, dms_change_log_token: int, last_zs_change_log_token: int, lease: Lease):
+        change_log = None if dryrun else self.start(dms_change_log_token)
+        if change_log is not None and change_log.processed_token is not None:
+            token = change_log.processed_token
+        else:
+            token = last_zs_change_log_token
+
+        counts = OrderedDict([
+            (CMISChangeType.created, 0),
+            (CMISChangeType.updated, 0),
+            (CMISChangeType.deleted, 0),
+            (CMISChangeType.security, 0),
+            ('failed', 0),
+        ])
+        # If the last ZS token, and the DMS token are the same, no updates are found.
+        if token < dms_change_log_token:
+            self.process(token, change_log, counts, dryrun, lease)
+
+        if change_log is not None:
+            change_log.status = ChangeLogStatus.completed
+            change_log.save()
+        return counts
+
+    def start(self, token: int) -> ChangeLog:
+        """
+        Return the `ChangeLog` of a new synchronization up to :param:`token`,
+        or of an interrupted synchronization which is resumed. The caller
+        holds the lease.
+        """
+        change_log = ChangeLog.objects.filter(status=ChangeLogStatus.in_progress).last()
+        if change_log is None:
+            return ChangeLog.objects.create(token=token)
+
+        change_log.token = token
+        change_log.save(update_fields=['token', 'updated_on'])
+        logger.info('Resuming the synchronization of change log %d from token %s.',
+                    change_log.pk, change_log.processed_token)
+        return change_log
+
+    def process(self, token: int, change_log: ChangeLog, counts: OrderedDict, dryrun: bool,
+                lease: Lease=None) -> None:
+        """
+        Process the change log from :param:`token`, one page at a time.
+
+        :raises SyncException: If the lease expired, and might be held by
+          another process.
+        """
+        processed = set()
+        result_set = self.client._repo.getContentChanges(
+            changeLogToken=token,
+            includeProperties=True,
+            maxItems=self.batch_size
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                entries = list(result_set)
+                self.process_batch(entries, processed, counts, executor, dryrun)
+                self.entries += len(entries)
+
+                if not entries or not result_set.hasNext():
+                    break
+
+                if lease is not None and not lease.renew():
+                    raise SyncException('The synchronization lease expired.')
+                if change_log is not None:
+                    next_token = self.get_next_token(result_set)
+                    if next_token is not None:
+                        change_log.processed_token = next_token
+                    change_log.save(update_fields=['processed_token', 'updated_on'])
+                result_set.getNext()
+
+    def get_next_token(self, result_set) -> int:
+        """
+        Return the change log token of the next page, from the link to the
+        next page in the Atom feed.
+
+        :return: The token, or `None` if the link doesn't contain it.
+        """
+        link = result_set._getLink('next')
+        if not link:
+            return None
+
+        tokens = parse_qs(urlparse(link).query).get('changeLogToken')
+        try:
+            return int(tokens[0])
+        except (TypeError, ValueError):
+            return None
+
+    def fetch(self, object_id: str, change_type: str):
+        """
+        Retrieve a changed object from the DMS. This is called in a thread.
+
+        :return: A tuple of the object, or `None` if it doesn't exist, and the
+          name of the zaakfolder of a created document.
+        """
+        try:
+            dms_object = self.client._repo.getObject(object_id)
+        except ObjectNotFoundException:
+            return None, None
+
+        zaak_folder = None
+        if change_type == CMISChangeType.created and \
+                dms_object.properties.get('cmis:objectTypeId') == CMISObjectType.edc:
+            zaak_folder = dms_object.getPaths()[0].split('/')[-2]
+        return dms_object, zaak_folder
+
+    def process_batch(self, entries: list, processed: set, counts: OrderedDict, executor, dryrun: bool) -> None:
+        """
+        Process a page of change log entries. The changed objects are
+        retrieved concurrently, and the changes are stored in one transaction.
+
+        :param entries: The `ChangeEntry` objects.
+        :param processed: The (object id, change type) tuples processed so far.
+        :param counts: The number of actions per `CMISChangeType`, updated in place.
+        :param executor: The `ThreadPoolExecutor` retrieving the objects.
+        :param dryrun: Don't update the ZS.
+        """
+        changes = []
+        for change_entry in entries:
+            change_type = change_entry.changeType
+            object_id = get_cmis_object_id(change_entry.objectId)
+
+            # Skip already processed objects that have the same action.
+            if (object_id, change_type) in processed:
+                continue
+            processed.add((object_id, change_type))
+
+            future = None
+            if change_type in [CMISChangeType.created, CMISChangeType.updated]:
+                future = executor.submit(self.fetch, object_id, change_type)
+            changes.append((change_entry.id, object_id, change_type, future))
+
+        results = {}
+        for entry_id, object_id, change_type, future in changes:
+            if future is not None:
+                try:
+                    results[entry_id] = future.result()
+                except Exception as e:
+                    results[entry_id] = e
+
+        # Retrieve the related objects in the ZS at once.
+        documents = [result[0] for result in results.values() if isinstance(result, tuple) and result[0] is not None]
+        edcs = {edc.informatieobjectidentificatie: edc for edc in EnkelvoudigInformatieObject.objects.filter(
+            informatieobjectidentificatie__in=[
+                document.properties.get('zsdms:documentIdentificatie') for document in documents
+            ]
+        )}
+        zaak_folders = [result[1] for result in results.values() if isinstance(result, tuple) and result[1]]
+        zaken = {zaak.zaakidentificatie: zaak for zaak in Zaak.objects.filter(zaakidentificatie__in=zaak_folders)}
+        existing_object_ids = set(EnkelvoudigInformatieObject.objects.filter(
+            _object_id__in=[change[1] for change in changes]
+        ).values_list('_object_id', flat=True))
+
+        deleted_object_ids = []
+        with transaction.atomic():
+            for entry_id, object_id, change_type, future in changes:
+                # The content of documents changed in the DMS is no longer valid.
+                if not dryrun and change_type in [CMISChangeType.updated, CMISChangeType.deleted]:
+                    self.client.content_cache.invalidate(object_id)
+
+                try:
+                    with transaction.atomic():
+                        if change_type in [CMISChangeType.created, CMISChangeType.updated]:
+                            result = results[entry_id]
+                            if isinstance(result, Exception):
+                                raise result
+
+                            dms_document, zaak_folder = result
+                            if dms_document is None:
+                                logger.error(
+                                    '[%s-%s] Object was %s but could not be found in the DMS.',
+                                    entry_id, object_id, change_type
+                                )
+                                counts['failed'] += 1
+                                continue
+
+                            dms_object_type = dms_document.properties.get('cmis:objectTypeId')
+                            if dms_object_type != CMISObjectType.edc:
+                                # The specification only indicates to synchronize EDC
+                                # properties from the DMS to the ZS.
+                                continue
+
+                            if change_type == CMISChangeType.updated:
+                                # Update
+                                zs_document_id = dms_document.properties.get('zsdms:documentIdentificatie')
+                                edc = edcs.get(zs_document_id)
+                                if edc is None:
+                                    logger.error(
+                                        '[%s-%s] Object was %s but could not be found in the ZS.',
+                                        entry_id, object_id, change_type
+                                    )
+                                    counts['failed'] += 1
+                                else:
+                                    edc.update_cmis_properties(dms_document.properties, commit=not dryrun)
+                                    counts[CMISChangeType.updated] += 1
+                            else:
+                                # Create ("Koppel Zaakdocument aan Zaak")
+                                zaak = zaken.get(zaak_folder)
+                                if zaak is None:
+                                    raise Zaak.DoesNotExist('Zaak {} does not exist.'.format(zaak_folder))
+                                # The entry might have been processed before an interruption.
+                                if not dryrun and object_id not in existing_object_ids:
+                                    edc = EnkelvoudigInformatieObject.objects.create_from_cmis_properties(
+                                        dms_document.properties, zaak, object_id
+                                    )
+                                    existing_object_ids.add(object_id)
+                                    # A later entry in the page may update the document.
+                                    edcs[edc.informatieobjectidentificatie] = edc
+                                counts[CMISChangeType.created] += 1
+                        elif change_type == CMISChangeType.deleted:
+                            # Delete
+                            if not dryrun:
+                                if object_id not in existing_object_ids:
+                                    logger.warning(
+                                        '[%s-%s] Object was %s but could not be found in the ZS.',
+                                        entry_id, object_id, change_type
+                                    )
+                                    counts['failed'] += 1
+                                else:
+                                    deleted_object_ids.append(object_id)
+                                    existing_object_ids.discard(object_id)
+                                    counts[CMISChangeType.deleted] += 1
+                        elif change_type == CMISChangeType.security:
+                            logger.info('[%s-%s] Security changes are not processed.', entry_id, object_id)
+                            counts[CMISChangeType.security] += 1
+                        else:
+                            logger.error('[%s-%s] Unsupported change type: %s', entry_id, object_id, change_type)
+                            counts['failed'] += 1
+                except Exception as e:
+                    counts['failed'] += 1
+                    logger.exception(
+                        '[%s-%s] Could not process "%s" in ZS: %s',
+                        entry_id, object_id, change_type, e,
+                        exc_info=True
+                    )
+
+            if deleted_object_ids:
+                EnkelvoudigInformatieObject.objects.filter(_object_id__in=deleted_object_ids).delete()
+
+
+class SyncWorker:
+    """
+    Synchronizes the ZS with the change log of the DMS continuously.
+
+    The worker polls the latest change log token of the DMS, which is cheap,
+    and only synchronizes if it changed. When there are no changes, the poll
+    interval doubles up to `max_poll_interval`. Multiple workers can run at
+    the same time: only the worker holding the lease synchronizes, the others
+    take over when it stops.
+    """
+    def __init__(self, client=None, poll_interval: float=None, max_poll_interval: float=None,
+                 batch_size: int=None, max_workers: int=None, timeout: float=None):
+        """
+        :param client: The `CMISDMSClient`.
+        :param poll_interval: See the `CMIS_SYNC_POLL_INTERVAL` setting.
+        :param max_poll_interval: See the `CMIS_SYNC_MAX_POLL_INTERVAL` setting.
+        :param batch_size: See the `CMIS_SYNC_BATCH_SIZE` setting.
+        :param max_workers: See the `CMIS_SYNC_WORKERS` setting.
+        :param timeout: See the `CMIS_SYNC_TIMEOUT` setting.
+        """
+        if client is None:
+            from .client import CMISDMSClient  # circular import
+            client = CMISDMSClient()
+        self.client = client
+        self.poll_interval = poll_interval or settings.CMIS_SYNC_POLL_INTERVAL
+        self.max_poll_interval = max_poll_interval or settings.CMIS_SYNC_MAX_POLL_INTERVAL
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout or settings.CMIS_SYNC_TIMEOUT
+        self.lease = Lease(SYNC_LEASE, self.timeout)
+
+        # The result of the last poll, see `get_lag`.
+        self.lag = None
+
+    def run_once(self) -> int:
+        """
+        Synchronize the changes in the DMS, if any.
+
+        :return: The number of change log entries processed.
+        """
+        if not self.lease.acquire():
+            logger.debug('Another process is synchronizing the change log.')
+            # The process that is synchronizing reports the lag.
+            cmis_sync_token_lag.clear()
+            cmis_sync_seconds_since_last_batch.clear()
+            return 0
+
+        dms_change_log_token = get_latest_token(self.client)
+        # An interrupted synchronization is resumed, even without new changes.
+        if dms_change_log_token == get_last_token() and \
+                not ChangeLog.objects.filter(status=ChangeLogStatus.in_progress).exists():
+            self.update_lag(dms_change_log_token)
+            return 0
+
+        sync = ChangeLogSync(
+            self.client, batch_size=self.batch_size, max_workers=self.max_workers, timeout=self.timeout,
+            lease=self.lease
+        )
+        counts = sync.run(dms_change_log_token=dms_change_log_token)
+        self.update_lag(dms_change_log_token)
+
+        logger.info('Sync result: %s', ', '.join(['{}: {}'.format(k, v) for k, v in counts.items()]))
+        return sync.entries
+
+    def update_lag(self, dms_change_log_token: int=None) -> None:
+        """
+        Store the lag in `lag`, and in the metrics.
+        """
+        self.lag = get_lag(self.client, dms_change_log_token)
+        cmis_sync_token_lag.set(self.lag['token_lag'])
+        if self.lag['seconds_since_last_batch'] is not None:
+            cmis_sync_seconds_since_last_batch.set(self.lag['seconds_since_last_batch'])
+
+    def run(self, stop=None) -> None:
+        """
+        Keep synchronizing, until `stop` returns `True`.
+
+        :param stop: A callable, called after every poll and while waiting.
+        """
+        interval = self.poll_interval
+        try:
+            while not (stop and stop()):
+                try:
+                    processed = self.run_once()
+                except Exception as e:
+                    logger.exception('Could not synchronize the change log: %s', e)
+                    processed = 0
+
+                if self.lag is not None:
+                    logger.debug('Sync lag: %s', ', '.join(['{}: {}'.format(k, v) for k, v in self.lag.items()]))
+                REGISTRY.flush()
+
+                if processed:
+                    interval = self.poll_interval
+                else:
+                    self.sleep(interval, stop)
+                    interval = min(interval * 2, self.max_poll_interval)
+        finally:
+            self.lease.release()
+
+    def sleep(self, seconds: float, stop=None) -> None:
+        """
+        Wait :param:`seconds`, or until `stop` returns `True`.
+        """
+        deadline = time.monotonic() + seconds
+        while not (stop and stop()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 1.0))
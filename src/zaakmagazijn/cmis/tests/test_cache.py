@@ -0,0 +1,384 @@
+import itertools
+import os
+import posixpath
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from cmislib.exceptions import ObjectNotFoundException, UpdateConflictException
+
+from ..cache import ContentCache, ObjectIdCache
+from ..client import CMISDMSClient
+from ..exceptions import DocumentDoesNotExistError
+from ..transport import ConnectionPool
+
+
+class ObjectIdCacheTests(SimpleTestCase):
+    def test_get_set(self):
+        cache = ObjectIdCache()
+        cache.set('123', 'workspace://SpacesStore/abc')
+
+        self.assertEqual(cache.get('123'), 'workspace://SpacesStore/abc')
+        self.assertIsNone(cache.get('456'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ObjectIdCache(maxsize=2)
+        cache.set('1', 'a')
+        cache.set('2', 'b')
+        cache.get('1')
+        cache.set('3', 'c')
+
+        self.assertEqual(cache.get('1'), 'a')
+        self.assertIsNone(cache.get('2'))
+        self.assertEqual(cache.get('3'), 'c')
+
+    @patch('zaakmagazijn.cmis.cache.time.monotonic')
+    def test_expires(self, mock_monotonic):
+        cache = ObjectIdCache(timeout=10)
+        mock_monotonic.return_value = 100
+        cache.set('1', 'a')
+
+        mock_monotonic.return_value = 109
+        self.assertEqual(cache.get('1'), 'a')
+        mock_monotonic.return_value = 110
+        self.assertIsNone(cache.get('1'))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        cache = ObjectIdCache(maxsize=0)
+        cache.set('1', 'a')
+
+        self.assertIsNone(cache.get('1'))
+
+
+class ContentCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = ContentCache(self.directory, max_size=10)
+
+    def test_get_set(self):
+        stream = BytesIO(b'foobar')
+        self.cache.set('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.0', 'token', stream)
+
+        self.assertEqual(stream.read(), b'foobar')
+        content = self.cache.get('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.0', 'token')
+        self.assertEqual(content.read(), b'foobar')
+        self.assertIsNone(self.cache.get('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.1', 'token'))
+        self.assertIsNone(self.cache.get('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.0', 'other'))
+
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 2})
+
+    def test_empty(self):
+        self.cache.set('abc', 'abc;1.0', None, BytesIO())
+
+        self.assertEqual(self.cache.get('abc', 'abc;1.0').read(), b'')
+
+    def test_too_large(self):
+        self.cache.set('abc', 'abc;1.0', None, BytesIO(b'x' * 11))
+
+        self.assertIsNone(self.cache.get('abc', 'abc;1.0'))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set('abc', 'abc;1.0', None, BytesIO(b'1234'))
+        self.cache.set('def', 'def;1.0', None, BytesIO(b'1234'))
+        os.utime(self.cache.get_path('abc', 'abc;1.0'), (100, 100))
+        os.utime(self.cache.get_path('def', 'def;1.0'), (200, 200))
+
+        self.cache.set('ghi', 'ghi;1.0', None, BytesIO(b'1234'))
+
+        self.assertIsNone(self.cache.get('abc', 'abc;1.0'))
+        self.assertIsNotNone(self.cache.get('def', 'def;1.0'))
+        self.assertIsNotNone(self.cache.get('ghi', 'ghi;1.0'))
+
+    def test_invalidate(self):
+        self.cache.set('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.0', None, BytesIO(b'1'))
+        self.cache.set('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.1', None, BytesIO(b'2'))
+        self.cache.set('workspace://SpacesStore/def', 'workspace://SpacesStore/def;1.0', None, BytesIO(b'3'))
+
+        # The change log contains the bare object id.
+        self.cache.invalidate('abc')
+
+        self.assertIsNone(self.cache.get('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.0'))
+        self.assertIsNone(self.cache.get('workspace://SpacesStore/abc', 'workspace://SpacesStore/abc;1.1'))
+        self.assertIsNotNone(self.cache.get('workspace://SpacesStore/def', 'workspace://SpacesStore/def;1.0'))
+
+    def test_disabled(self):
+        cache = ContentCache(self.directory, max_size=0)
+        cache.set('abc', 'abc;1.0', None, BytesIO(b'foobar'))
+
+        self.assertIsNone(cache.get('abc', 'abc;1.0'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connection_is_reused(self):
+        pool = ConnectionPool(maxsize=1)
+
+        with pool.connection() as http:
+            pass
+        with pool.connection() as http2:
+            self.assertIs(http2, http)
+
+    def test_concurrent_connections(self):
+        pool = ConnectionPool(maxsize=1)
+
+        with pool.connection() as http, pool.connection() as http2:
+            self.assertIsNot(http2, http)
+
+    def test_connection_is_discarded_on_error(self):
+        pool = ConnectionPool(maxsize=1)
+
+        with self.assertRaises(ValueError):
+            with pool.connection() as http:
+                raise ValueError()
+
+        with pool.connection() as http2:
+            self.assertIsNot(http2, http)
+
+
+@patch('zaakmagazijn.cmis.client.CmisClient')
+class CMISDocumentLookupTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.document = MagicMock(informatieobjectidentificatie='123')
+        self.cmis_doc = MagicMock(properties={
+            'cmis:versionSeriesId': 'workspace://SpacesStore/abc',
+            'cmis:isLatestVersion': True,
+            'zsdms:documentIdentificatie': '123',
+        })
+
+    def _get_client(self, mock_cmis_client):
+        client = CMISDMSClient()
+        repo = mock_cmis_client.return_value.getDefaultRepository.return_value
+        repo.query.return_value = [MagicMock(**{'getLatestVersion.return_value': self.cmis_doc})]
+        repo.getObject.return_value = self.cmis_doc
+        return client, repo
+
+    def test_object_id_is_cached(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+
+        self.assertIs(client._get_cmis_doc(self.document), self.cmis_doc)
+        self.assertIs(client._get_cmis_doc(self.document), self.cmis_doc)
+
+        self.assertEqual(repo.query.call_count, 1)
+        repo.getObject.assert_called_once_with('workspace://SpacesStore/abc')
+
+    def test_deleted_document(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+        client._get_cmis_doc(self.document)
+
+        repo.getObject.side_effect = ObjectNotFoundException()
+        repo.query.return_value = []
+        with self.assertRaises(DocumentDoesNotExistError):
+            client._get_cmis_doc(self.document)
+
+        self.assertIsNone(client._object_id_cache.get('123'))
+
+    def test_other_document(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+        client._get_cmis_doc(self.document)
+
+        repo.getObject.return_value = MagicMock(properties={
+            'cmis:versionSeriesId': 'workspace://SpacesStore/abc',
+            'zsdms:documentIdentificatie': '456',
+        })
+        self.assertIs(client._get_cmis_doc(self.document), self.cmis_doc)
+        self.assertEqual(repo.query.call_count, 2)
+
+    def test_verwijder_document(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+
+        client.verwijder_document(self.document)
+
+        self.cmis_doc.delete.assert_called_once_with()
+        self.assertIsNone(client._object_id_cache.get('123'))
+
+
+@patch('zaakmagazijn.cmis.client.CmisClient')
+class CMISContentCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(CMIS_CONTENT_CACHE_DIR=directory, CMIS_CONTENT_CACHE_SIZE=1024)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.document = MagicMock(informatieobjectidentificatie='123')
+        self.cmis_doc = MagicMock(properties={
+            'cmis:name': 'doc.txt',
+            'cmis:contentStreamId': 'store://abc.bin',
+            'cmis:versionSeriesId': 'workspace://SpacesStore/abc',
+            'cmis:changeToken': '1',
+            'cmis:isLatestVersion': True,
+            'zsdms:documentIdentificatie': '123',
+        })
+        self.cmis_doc.getObjectId.return_value = 'workspace://SpacesStore/abc;1.0'
+        self.cmis_doc.getContentStream.side_effect = lambda: BytesIO(b'inhoud')
+
+    def _get_client(self, mock_cmis_client):
+        client = CMISDMSClient()
+        repo = mock_cmis_client.return_value.getDefaultRepository.return_value
+        repo.query.return_value = [MagicMock(**{'getLatestVersion.return_value': self.cmis_doc})]
+        repo.getObject.return_value = self.cmis_doc
+        return client
+
+    def test_content_is_cached(self, mock_cmis_client):
+        client = self._get_client(mock_cmis_client)
+
+        for i in range(2):
+            filename, content = client.geef_inhoud(self.document)
+            self.assertEqual(filename, 'doc.txt')
+            self.assertEqual(content.read(), b'inhoud')
+
+        self.cmis_doc.getContentStream.assert_called_once_with()
+        self.assertEqual(client.content_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_new_version(self, mock_cmis_client):
+        client = self._get_client(mock_cmis_client)
+        client.geef_inhoud(self.document)
+
+        self.cmis_doc.properties['cmis:changeToken'] = '2'
+        client.geef_inhoud(self.document)
+
+        self.assertEqual(self.cmis_doc.getContentStream.call_count, 2)
+
+    def test_zet_inhoud(self, mock_cmis_client):
+        client = self._get_client(mock_cmis_client)
+        client.geef_inhoud(self.document)
+
+        client.zet_inhoud(self.document, BytesIO(b'nieuw'))
+        client.geef_inhoud(self.document)
+
+        self.assertEqual(self.cmis_doc.getContentStream.call_count, 2)
+
+    def test_invalidate_from_change_log(self, mock_cmis_client):
+        client = self._get_client(mock_cmis_client)
+        client.geef_inhoud(self.document)
+
+        client.content_cache.invalidate('abc')
+        client.geef_inhoud(self.document)
+
+        self.assertEqual(self.cmis_doc.getContentStream.call_count, 2)
+
+
+@patch('zaakmagazijn.cmis.client.CmisClient')
+class CMISFolderCacheTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.folders = {}
+        self.ids = itertools.count()
+        self._add_folder('/')
+        self.folders_to_create = [('Zaken', {}), ('998877', {}), ('123456789', {})]
+
+    def _add_folder(self, path):
+        folder = MagicMock(properties={'cmis:path': path})
+        folder.getObjectId.return_value = 'workspace://SpacesStore/{}'.format(next(self.ids))
+        folder.createFolder.side_effect = lambda name, properties: self._add_folder(posixpath.join(path, name))
+        self.folders[path] = folder
+        return folder
+
+    def _get_object_by_path(self, path):
+        try:
+            return self.folders[path]
+        except KeyError:
+            raise ObjectNotFoundException()
+
+    def _get_object(self, object_id):
+        for folder in self.folders.values():
+            if folder.getObjectId() == object_id:
+                return folder
+        raise ObjectNotFoundException()
+
+    def _get_client(self, mock_cmis_client):
+        repo = mock_cmis_client.return_value.getDefaultRepository.return_value
+        repo.getObjectByPath.side_effect = self._get_object_by_path
+        repo.getObject.side_effect = self._get_object
+        client = CMISDMSClient()
+        repo.reset_mock()
+        return client, repo
+
+    def test_create_folder(self, mock_cmis_client):
+        self._add_folder('/Zaken')
+        parent = self._add_folder('/Zaken/998877')
+        client, repo = self._get_client(mock_cmis_client)
+
+        folder = client._get_or_create_folders(self.folders_to_create)
+
+        self.assertIs(folder, self.folders['/Zaken/998877/123456789'])
+        repo.getObjectByPath.assert_called_once_with('/Zaken/998877')
+        parent.createFolder.assert_called_once_with('123456789', properties={})
+
+        # The parent folder is retrieved by its object id.
+        repo.reset_mock()
+        client._get_or_create_folders([('Zaken', {}), ('998877', {}), ('987654321', {})])
+
+        repo.getObjectByPath.assert_not_called()
+        repo.getObject.assert_called_once_with(parent.getObjectId())
+        self.assertIn('/Zaken/998877/987654321', self.folders)
+
+    def test_create_all_folders(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+
+        folder = client._get_or_create_folders(self.folders_to_create)
+
+        self.assertIs(folder, self.folders['/Zaken/998877/123456789'])
+        self.assertEqual(
+            [call[0][0] for call in repo.getObjectByPath.call_args_list], ['/Zaken/998877', '/Zaken'])
+
+        # The missing folders are not looked up again.
+        del self.folders['/Zaken']
+        del self.folders['/Zaken/998877']
+        del self.folders['/Zaken/998877/123456789']
+        client._folder_cache.clear()
+        client._get_folder('/Zaken')
+        client._get_folder('/Zaken/998877')
+        repo.reset_mock()
+
+        client._get_or_create_folders(self.folders_to_create)
+        repo.getObjectByPath.assert_not_called()
+
+    def test_created_concurrently(self, mock_cmis_client):
+        parent = self._add_folder('/Zaken/998877')
+        client, repo = self._get_client(mock_cmis_client)
+
+        def create_folder(name, properties):
+            self._add_folder(posixpath.join('/Zaken/998877', name))
+            raise UpdateConflictException()
+        parent.createFolder.side_effect = create_folder
+
+        folder = client._get_or_create_folders(self.folders_to_create)
+
+        self.assertIs(folder, self.folders['/Zaken/998877/123456789'])
+
+    def test_removed_folder(self, mock_cmis_client):
+        self._add_folder('/Zaken')
+        self._add_folder('/Zaken/998877')
+        client, repo = self._get_client(mock_cmis_client)
+        client._get_or_create_folders(self.folders_to_create)
+
+        # The folder is removed, and created again by someone else.
+        parent = self._add_folder('/Zaken/998877')
+        repo.reset_mock()
+
+        client._get_or_create_folders([('Zaken', {}), ('998877', {}), ('987654321', {})])
+
+        repo.getObjectByPath.assert_called_once_with('/Zaken/998877')
+        parent.createFolder.assert_called_once_with('987654321', properties={})
+
+    def test_missing_folder_is_looked_up_again(self, mock_cmis_client):
+        client, repo = self._get_client(mock_cmis_client)
+        client._get_folder('/Zaken')
+
+        # Missing folders are looked up again when reading.
+        self._add_folder('/Zaken')
+        self.assertIs(client._get_folder('/Zaken'), self.folders['/Zaken'])
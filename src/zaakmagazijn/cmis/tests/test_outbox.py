@@ -0,0 +1,306 @@
+import time
+from datetime import timedelta
+from io import BytesIO
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from zaakmagazijn.rgbz.tests.factory_models import (
+    EnkelvoudigInformatieObjectFactory, ZaakFactory
+)
+from zaakmagazijn.utils.tests import should_run_benchmarks
+
+from ..choices import DMSOperationStatus, DMSOperationType
+from ..client import DummyDMSClient
+from ..exceptions import (
+    DMSOperationFailed, DMSOperationTimeout, DocumentExistsError
+)
+from ..models import DMSOperation, outbox_content_storage
+from ..outbox import OutboxWorker, dms_outbox
+
+
+class DMSOutboxTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.zaak = ZaakFactory.create()
+        self.document = EnkelvoudigInformatieObjectFactory.create()
+
+    def test_enqueue(self):
+        operation = dms_outbox.maak_zaakdocument_met_inhoud(
+            self.document, filename='doc.txt', sender='ZSC', stream=BytesIO(b'inhoud'), content_type='text/plain')
+
+        operation.refresh_from_db()
+        self.assertEqual(operation.operation, DMSOperationType.maak_zaakdocument_met_inhoud)
+        self.assertEqual(operation.status, DMSOperationStatus.pending)
+        self.assertEqual(operation.informatieobject, self.document)
+        self.assertIsNone(operation.zaak)
+        with operation.content.storage.open(operation.content.name) as f:
+            self.assertEqual(f.read(), b'inhoud')
+        self.assertEqual(operation.get_arguments(), {
+            'filename': 'doc.txt',
+            'sender': 'ZSC',
+            'content_type': 'text/plain',
+        })
+
+    def test_enqueue_is_idempotent(self):
+        operation = dms_outbox.relateer_aan_zaak(self.document, self.zaak)
+        self.assertEqual(dms_outbox.relateer_aan_zaak(self.document, self.zaak), operation)
+
+        self.assertEqual(DMSOperation.objects.filter(operation=DMSOperationType.relateer_aan_zaak).count(), 1)
+
+    @patch('zaakmagazijn.cmis.signals.client')
+    def test_zaakfolder(self, mock_client):
+        with override_settings(ZAAKMAGAZIJN_DMS_OUTBOX=True):
+            zaak = ZaakFactory.create()
+
+        operation = DMSOperation.objects.get(zaak=zaak)
+        self.assertEqual(operation.operation, DMSOperationType.creeer_zaakfolder)
+        mock_client.creeer_zaakfolder.assert_not_called()
+
+    def test_wait(self):
+        operation = dms_outbox.relateer_aan_zaak(self.document, self.zaak)
+
+        with self.assertRaises(DMSOperationTimeout):
+            dms_outbox.wait([operation], timeout=0)
+
+        DMSOperation.objects.filter(pk=operation.pk).update(status=DMSOperationStatus.done)
+        dms_outbox.wait([operation], timeout=0)
+
+        DMSOperation.objects.filter(pk=operation.pk).update(status=DMSOperationStatus.failed)
+        with self.assertRaises(DMSOperationFailed):
+            dms_outbox.wait([operation], timeout=0)
+
+    def test_wait_for_document(self):
+        dms_outbox.relateer_aan_zaak(self.document, self.zaak)
+
+        # The outbox is disabled.
+        with self.assertNumQueries(0):
+            dms_outbox.wait_for_document(self.document, timeout=0)
+
+        with override_settings(ZAAKMAGAZIJN_DMS_OUTBOX=True):
+            with self.assertRaises(DMSOperationTimeout):
+                dms_outbox.wait_for_document(self.document, timeout=0)
+
+            dms_outbox.wait_for_document(EnkelvoudigInformatieObjectFactory.create(), timeout=0)
+
+
+class OutboxWorkerTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.zaak = ZaakFactory.create()
+        self.document = EnkelvoudigInformatieObjectFactory.create()
+        self.client = MagicMock()
+        self.worker = OutboxWorker(client=self.client, max_workers=1, max_attempts=2, retry_delay=60)
+
+        self.maak = dms_outbox.maak_zaakdocument_met_inhoud(
+            self.document, filename='doc.txt', stream=BytesIO(b'inhoud'))
+        self.relateer = dms_outbox.relateer_aan_zaak(self.document, self.zaak)
+
+    def test_execute(self):
+        content = self.maak.content.name
+        self.assertTrue(outbox_content_storage.exists(content))
+
+        self.assertEqual(self.worker.run_once(), (2, 0))
+
+        self.assertEqual([call[0] for call in self.client.method_calls], [
+            'maak_zaakdocument_met_inhoud', 'relateer_aan_zaak'
+        ])
+        args, kwargs = self.client.maak_zaakdocument_met_inhoud.call_args
+        self.assertEqual(args, (self.document, ))
+        self.assertEqual(kwargs['filename'], 'doc.txt')
+        self.assertEqual(kwargs['stream'].read(), b'inhoud')
+        self.client.relateer_aan_zaak.assert_called_once_with(self.document, self.zaak)
+
+        self.maak.refresh_from_db()
+        self.assertEqual(self.maak.status, DMSOperationStatus.done)
+        self.assertEqual(self.maak.attempts, 1)
+        self.assertIsNotNone(self.maak.completed_on)
+        self.assertFalse(self.maak.content)
+        self.assertFalse(outbox_content_storage.exists(content))
+
+        self.assertEqual(self.worker.run_once(), (0, 0))
+
+    def test_retry(self):
+        self.client.maak_zaakdocument_met_inhoud.side_effect = Exception('DMS is down')
+
+        self.assertEqual(self.worker.run_once(), (0, 1))
+
+        # The next operation on the document waits for the failed operation.
+        self.client.relateer_aan_zaak.assert_not_called()
+        self.relateer.refresh_from_db()
+        self.assertEqual(self.relateer.status, DMSOperationStatus.pending)
+        self.assertEqual(self.relateer.attempts, 0)
+
+        self.maak.refresh_from_db()
+        self.assertEqual(self.maak.status, DMSOperationStatus.pending)
+        self.assertEqual(self.maak.attempts, 1)
+        self.assertIn('DMS is down', self.maak.last_error)
+        self.assertGreater(self.maak.next_attempt_on, timezone.now())
+
+        # Not before the next attempt.
+        self.assertEqual(self.worker.run_once(), (0, 0))
+
+        DMSOperation.objects.filter(pk=self.maak.pk).update(next_attempt_on=timezone.now())
+        self.client.maak_zaakdocument_met_inhoud.side_effect = None
+        self.assertEqual(self.worker.run_once(), (2, 0))
+
+    def test_failed(self):
+        self.client.maak_zaakdocument_met_inhoud.side_effect = Exception('DMS is down')
+
+        for i in range(2):
+            self.worker.run_once()
+            DMSOperation.objects.filter(pk=self.maak.pk).update(next_attempt_on=timezone.now())
+
+        self.maak.refresh_from_db()
+        self.assertEqual(self.maak.status, DMSOperationStatus.failed)
+        self.assertEqual(self.maak.attempts, 2)
+
+        self.assertEqual(self.worker.run_once(), (0, 0))
+        self.client.relateer_aan_zaak.assert_not_called()
+
+    def test_document_created_by_previous_attempt(self):
+        DMSOperation.objects.filter(pk=self.maak.pk).update(attempts=1)
+        # Stored by the client when the document was created.
+        self.document._object_id = 'workspace://SpacesStore/abc'
+        self.document.save(update_fields=['_object_id'])
+        self.client.maak_zaakdocument_met_inhoud.side_effect = DocumentExistsError()
+
+        self.assertEqual(self.worker.run_once(), (2, 0))
+
+    def test_document_exists(self):
+        """
+        A document with the same identificatie, that wasn't created by the
+        operation, fails the operation without retrying.
+        """
+        self.client.maak_zaakdocument_met_inhoud.side_effect = DocumentExistsError()
+
+        self.assertEqual(self.worker.run_once(), (0, 1))
+
+        self.maak.refresh_from_db()
+        self.assertEqual(self.maak.status, DMSOperationStatus.failed)
+        self.assertEqual(self.maak.attempts, 1)
+        self.assertIn('DocumentExistsError', self.maak.last_error)
+        self.client.relateer_aan_zaak.assert_not_called()
+
+    def test_abandoned_operation(self):
+        self.worker.claim()
+        self.assertEqual(self.worker.claim(), [])
+
+        DMSOperation.objects.update(claimed_on=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.worker.claim(), [[self.maak, self.relateer]])
+
+    def test_wait_for_zaakfolder(self):
+        """
+        Operations on a document in a zaak folder wait until the folder is
+        created.
+        """
+        zaak = ZaakFactory.create()
+        document = EnkelvoudigInformatieObjectFactory.create()
+        creeer = dms_outbox.creeer_zaakfolder(zaak)
+        maak = dms_outbox.maak_zaakdocument_met_inhoud(document, zaak=zaak)
+        relateer = dms_outbox.relateer_aan_zaak(self.document, zaak)
+
+        self.assertEqual(self.worker.claim(), [[self.maak, self.relateer], [creeer]])
+
+        DMSOperation.objects.filter(pk=creeer.pk).update(status=DMSOperationStatus.done)
+        self.assertEqual(self.worker.claim(), [[maak]])
+
+        # It also waits for the earlier operations on its document.
+        DMSOperation.objects.filter(pk__in=[self.maak.pk, self.relateer.pk]).update(status=DMSOperationStatus.done)
+        self.assertEqual(self.worker.claim(), [[relateer]])
+
+    def test_other_documents(self):
+        """
+        A failed operation only blocks the operations on the same document.
+        """
+        def maak_zaakdocument_met_inhoud(document, **kwargs):
+            if document == self.document:
+                raise Exception('DMS is down')
+        self.client.maak_zaakdocument_met_inhoud.side_effect = maak_zaakdocument_met_inhoud
+
+        zaak = ZaakFactory.create()
+        document = EnkelvoudigInformatieObjectFactory.create()
+        dms_outbox.creeer_zaakfolder(zaak)
+        dms_outbox.maak_zaakdocument_met_inhoud(document)
+        dms_outbox.relateer_aan_zaak(document, zaak)
+
+        self.assertEqual(self.worker.run_once(), (2, 1))
+        self.client.creeer_zaakfolder.assert_called_once_with(zaak)
+        # After the zaak folder is created.
+        self.assertEqual(self.worker.run_once(), (1, 0))
+        self.client.relateer_aan_zaak.assert_called_once_with(document, zaak)
+
+    def test_claim_skips_waiting_operations(self):
+        """
+        Operations waiting for a failed operation don't fill the batch.
+        """
+        worker = OutboxWorker(client=self.client, max_workers=1, batch_size=1)
+        DMSOperation.objects.filter(pk=self.maak.pk).update(status=DMSOperationStatus.failed)
+
+        zaak = ZaakFactory.create()
+        creeer = dms_outbox.creeer_zaakfolder(zaak)
+        DMSOperation.objects.filter(pk=creeer.pk).update(status=DMSOperationStatus.failed)
+        dms_outbox.maak_zaakdocument_met_inhoud(EnkelvoudigInformatieObjectFactory.create(), zaak=zaak)
+
+        maak = dms_outbox.maak_zaakdocument_met_inhoud(EnkelvoudigInformatieObjectFactory.create())
+
+        self.assertEqual(worker.claim(), [[maak]])
+        self.assertEqual(worker.claim(), [])
+
+
+class LocalDMSClient(DummyDMSClient):
+    """
+    Stands in for a DMS, with a fixed latency for every operation.
+    """
+    def __init__(self, latency):
+        self.latency = latency
+
+    def creeer_zaakfolder(self, zaak):
+        time.sleep(self.latency)
+
+    def maak_zaakdocument_met_inhoud(self, document, zaak=None, filename=None, sender=None, stream=None,
+                                     content_type=None):
+        time.sleep(self.latency)
+
+    def relateer_aan_zaak(self, document, zaak):
+        time.sleep(self.latency)
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+@override_settings(ZAAKMAGAZIJN_DMS_OUTBOX=True)
+class OutboxWorkerBenchmarkTests(TransactionTestCase):
+    """
+    Measure the throughput of the outbox worker, for a DMS with a latency of
+    20 milliseconds per operation.
+    """
+    number_of_documents = 100
+    latency = 0.02
+
+    def _enqueue(self):
+        zaak = ZaakFactory.create()
+        for document in EnkelvoudigInformatieObjectFactory.create_batch(self.number_of_documents):
+            dms_outbox.maak_zaakdocument_met_inhoud(document, zaak, stream=BytesIO(b'inhoud'))
+            dms_outbox.relateer_aan_zaak(document, zaak)
+        return DMSOperation.objects.filter(status=DMSOperationStatus.pending).count()
+
+    def test_benchmark(self):
+        for max_workers in [1, 4, 16]:
+            DMSOperation.objects.all().delete()
+            count = self._enqueue()
+
+            worker = OutboxWorker(client=LocalDMSClient(self.latency), max_workers=max_workers)
+            start = time.perf_counter()
+            try:
+                while any(worker.run_once()):
+                    pass
+            finally:
+                worker.close()
+            duration = time.perf_counter() - start
+
+            self.assertFalse(DMSOperation.objects.exclude(status=DMSOperationStatus.done).exists())
+            print('\n{} workers: {:.3f}s for {} operations ({:.0f} operations/s)'.format(
+                max_workers, duration, count, count / duration))
@@ -0,0 +1,309 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from cmislib.exceptions import ObjectNotFoundException
+
+from zaakmagazijn.rgbz.models import EnkelvoudigInformatieObject
+from zaakmagazijn.rgbz.tests.factory_models import (
+    EnkelvoudigInformatieObjectFactory, ZaakFactory
+)
+
+from ..choices import ChangeLogStatus, CMISChangeType, CMISObjectType
+from ..exceptions import SyncException
+from ..models import ChangeLog, Lease as LeaseModel
+from ..sync import SYNC_LEASE, ChangeLogSync, Lease, SyncWorker, get_lag
+
+
+class ChangeEntry:
+    def __init__(self, entry_id, object_id, change_type):
+        self.id = entry_id
+        self.objectId = object_id
+        self.changeType = change_type
+
+
+class ResultSet:
+    """
+    A paged result of `getContentChanges`, starting at :param:`token`.
+    """
+    def __init__(self, entries, token, page_size):
+        self.entries = entries
+        self.token = token
+        self.page_size = page_size
+
+    def __iter__(self):
+        return iter(self.entries[self.token:self.token + self.page_size])
+
+    def hasNext(self):
+        return self.token + self.page_size < len(self.entries)
+
+    def getNext(self):
+        self.token += self.page_size
+
+    def _getLink(self, rel):
+        return 'http://dms/changes?changeLogToken={}&maxItems={}'.format(self.token + self.page_size, self.page_size)
+
+
+class DMSMixin:
+    """
+    Provides a mocked `CMISDMSClient`, with a change log of `entries`.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.entries = []
+        self.client = MagicMock()
+        self.client._repo.info = {'latestChangeLogToken': '0'}
+        self.client._repo.getContentChanges.side_effect = lambda changeLogToken, includeProperties, maxItems: \
+            ResultSet(self.entries, changeLogToken, maxItems)
+
+        folder = MagicMock()
+        folder.properties = {'cmis:objectTypeId': CMISObjectType.zaak_folder}
+
+        def get_object(object_id):
+            if object_id != 'folder':
+                raise ObjectNotFoundException()
+            return folder
+        self.client._repo.getObject.side_effect = get_object
+
+    def _add_entries(self, *entries):
+        for object_id, change_type in entries:
+            self.entries.append(ChangeEntry(len(self.entries), object_id, change_type))
+        self.client._repo.info['latestChangeLogToken'] = str(len(self.entries))
+
+
+class ChangeLogSyncTests(DMSMixin, TestCase):
+    def test_sync_no_changes(self):
+        ChangeLog.objects.create(token=0, status=ChangeLogStatus.completed)
+
+        result = ChangeLogSync(self.client).run()
+
+        self.assertEqual(set(result.values()), {0})
+        self.assertEqual(ChangeLog.objects.filter(status=ChangeLogStatus.completed).count(), 2)
+        self.client._repo.getContentChanges.assert_not_called()
+
+    def test_sync_pages(self):
+        documents = EnkelvoudigInformatieObjectFactory.create_batch(3)
+        for i, document in enumerate(documents):
+            document._object_id = 'doc-{}'.format(i)
+            document.save()
+        self._add_entries(
+            ('doc-0', CMISChangeType.deleted),
+            ('folder', CMISChangeType.updated),
+            ('doc-1', CMISChangeType.deleted),
+            ('doc-1', CMISChangeType.deleted),
+            ('missing', CMISChangeType.updated),
+            ('doc-2', CMISChangeType.security),
+        )
+
+        sync = ChangeLogSync(self.client, batch_size=2, max_workers=2)
+        result = sync.run()
+
+        self.assertEqual(result[CMISChangeType.deleted], 2)
+        self.assertEqual(result[CMISChangeType.updated], 0)
+        self.assertEqual(result[CMISChangeType.security], 1)
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(sync.entries, 6)
+        self.assertEqual(self.client._repo.getContentChanges.call_count, 1)
+
+        self.assertEqual(
+            list(EnkelvoudigInformatieObject.objects.values_list('_object_id', flat=True)), ['doc-2'])
+        self.client.content_cache.invalidate.assert_any_call('doc-0')
+
+        change_log = ChangeLog.objects.get()
+        self.assertEqual(change_log.status, ChangeLogStatus.completed)
+        self.assertEqual(change_log.token, 6)
+        # The last page has no next page, so the progress points to the start of it.
+        self.assertEqual(change_log.processed_token, 4)
+
+    def test_sync_created_and_updated(self):
+        """
+        A document that is created and updated in the same page is updated in
+        the ZS too.
+        """
+        zaak = ZaakFactory.create()
+        document = MagicMock()
+        document.properties = {'cmis:objectTypeId': CMISObjectType.edc, 'zsdms:documentIdentificatie': 'doc'}
+        document.getPaths.return_value = ['/Zaken/{}/doc'.format(zaak.zaakidentificatie)]
+        self.client._repo.getObject.side_effect = lambda object_id: document
+        self._add_entries(('doc-0', CMISChangeType.created), ('doc-0', CMISChangeType.updated))
+
+        def create_from_cmis_properties(properties, zaak, object_id):
+            return EnkelvoudigInformatieObjectFactory.create(
+                informatieobjectidentificatie=properties['zsdms:documentIdentificatie'], _object_id=object_id)
+
+        with patch.object(EnkelvoudigInformatieObject.objects, 'create_from_cmis_properties',
+                          side_effect=create_from_cmis_properties), \
+                patch.object(EnkelvoudigInformatieObject, 'update_cmis_properties') as update_cmis_properties:
+            result = ChangeLogSync(self.client).run()
+
+        self.assertEqual(result[CMISChangeType.created], 1)
+        self.assertEqual(result[CMISChangeType.updated], 1)
+        self.assertEqual(result['failed'], 0)
+        update_cmis_properties.assert_called_once_with(document.properties, commit=True)
+
+    def test_sync_dryrun(self):
+        EnkelvoudigInformatieObjectFactory.create(_object_id='doc-0')
+        self._add_entries(('doc-0', CMISChangeType.deleted))
+
+        ChangeLogSync(self.client).run(dryrun=True)
+
+        self.assertEqual(EnkelvoudigInformatieObject.objects.count(), 1)
+        self.assertFalse(ChangeLog.objects.exists())
+        self.client.content_cache.invalidate.assert_not_called()
+
+    def test_sync_resume(self):
+        ChangeLog.objects.create(token=0, status=ChangeLogStatus.completed)
+        change_log = ChangeLog.objects.create(token=2, processed_token=2)
+        self._add_entries(
+            ('doc-0', CMISChangeType.security),
+            ('doc-1', CMISChangeType.security),
+            ('doc-2', CMISChangeType.security),
+        )
+
+        result = ChangeLogSync(self.client).run()
+
+        self.assertEqual(result[CMISChangeType.security], 1)
+        self.client._repo.getContentChanges.assert_called_once_with(
+            changeLogToken=2, includeProperties=True, maxItems=100)
+
+        change_log.refresh_from_db()
+        self.assertEqual(change_log.status, ChangeLogStatus.completed)
+        self.assertEqual(change_log.token, 3)
+
+        # The lease is released.
+        self.assertTrue(Lease(SYNC_LEASE, 60).acquire())
+
+    def test_sync_already_running(self):
+        self.assertTrue(Lease(SYNC_LEASE, 60).acquire())
+        self._add_entries(('doc-0', CMISChangeType.security))
+
+        with self.assertRaises(SyncException):
+            ChangeLogSync(self.client).run()
+
+        self.client._repo.getContentChanges.assert_not_called()
+        self.assertFalse(ChangeLog.objects.exists())
+
+    def test_sync_lease_expired(self):
+        lease = Lease(SYNC_LEASE, 60)
+        self.assertTrue(lease.acquire())
+        LeaseModel.objects.update(owner='other')
+        self._add_entries(*[('doc-{}'.format(i), CMISChangeType.security) for i in range(4)])
+
+        with self.assertRaises(SyncException):
+            ChangeLogSync(self.client, batch_size=2, lease=lease).run()
+
+        change_log = ChangeLog.objects.get()
+        self.assertEqual(change_log.status, ChangeLogStatus.in_progress)
+        self.assertIsNone(change_log.processed_token)
+
+    def test_get_lag(self):
+        self._add_entries(*[('doc-{}'.format(i), CMISChangeType.security) for i in range(4)])
+
+        lag = get_lag(self.client)
+        self.assertEqual(lag['dms_token'], 4)
+        self.assertEqual(lag['zs_token'], 0)
+        self.assertEqual(lag['token_lag'], 4)
+        self.assertIsNone(lag['seconds_since_last_batch'])
+
+        ChangeLog.objects.create(token=4, processed_token=3)
+        lag = get_lag(self.client)
+        self.assertEqual(lag['zs_token'], 3)
+        self.assertEqual(lag['token_lag'], 1)
+        self.assertLess(lag['seconds_since_last_batch'], 60)
+
+
+class LeaseTests(TestCase):
+    def test_acquire(self):
+        lease = Lease('test', 60)
+        other = Lease('test', 60)
+
+        self.assertTrue(lease.acquire())
+        self.assertTrue(lease.renew())
+        self.assertFalse(other.acquire())
+
+        lease.release()
+        self.assertTrue(other.acquire())
+        self.assertFalse(lease.acquire())
+
+    def test_acquire_while_held(self):
+        lease = Lease('test', 60)
+        other = Lease('test', 60)
+        self.assertTrue(lease.acquire())
+        self.assertFalse(other.acquire())
+
+        # Polling doesn't write to the database until the lease is half expired.
+        with self.assertNumQueries(0):
+            self.assertTrue(lease.acquire())
+        with self.assertNumQueries(1):
+            self.assertFalse(other.acquire())
+
+    def test_acquire_created_concurrently(self):
+        LeaseModel.objects.create(name='test')
+        lease = Lease('test', 60)
+
+        # Another owner created the lease after it was checked.
+        with patch('django.db.models.query.QuerySet.exists', return_value=False):
+            self.assertTrue(lease.acquire())
+        self.assertEqual(LeaseModel.objects.get().owner, lease.owner)
+
+    def test_acquire_expired(self):
+        lease = Lease('test', 60)
+        other = Lease('test', 60)
+
+        self.assertTrue(lease.acquire())
+        LeaseModel.objects.update(expires_on=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(other.acquire())
+        self.assertFalse(lease.renew())
+        self.assertEqual(LeaseModel.objects.get().owner, other.owner)
+
+
+class SyncWorkerTests(DMSMixin, TestCase):
+    def _worker(self):
+        return SyncWorker(self.client, poll_interval=1, max_poll_interval=4)
+
+    def test_run_once_no_changes(self):
+        worker = self._worker()
+
+        self.assertEqual(worker.run_once(), 0)
+        self.assertFalse(ChangeLog.objects.exists())
+        self.assertEqual(worker.lag['token_lag'], 0)
+        self.client._repo.getContentChanges.assert_not_called()
+
+    def test_run_once(self):
+        worker = self._worker()
+        self._add_entries(('doc-0', CMISChangeType.security), ('doc-1', CMISChangeType.security))
+
+        self.assertEqual(worker.run_once(), 2)
+        self.assertEqual(ChangeLog.objects.get().status, ChangeLogStatus.completed)
+        self.assertEqual(worker.lag['token_lag'], 0)
+
+        # The worker keeps the lease.
+        self.assertFalse(Lease(SYNC_LEASE, 60).acquire())
+
+    def test_run_once_other_worker(self):
+        self.assertTrue(Lease(SYNC_LEASE, 60).acquire())
+        self._add_entries(('doc-0', CMISChangeType.security))
+
+        self.assertEqual(self._worker().run_once(), 0)
+        self.assertFalse(ChangeLog.objects.exists())
+
+    def test_run_backoff(self):
+        worker = self._worker()
+        polls = []
+
+        def run_once():
+            polls.append(None)
+            # Changes appear at the fourth poll.
+            return 1 if len(polls) == 4 else 0
+
+        with patch.object(worker, 'run_once', side_effect=run_once), \
+                patch.object(worker, 'sleep') as sleep:
+            worker.run(stop=lambda: len(polls) == 7)
+
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [1, 2, 4, 1, 2, 4])
+        # The lease is released.
+        self.assertTrue(Lease(SYNC_LEASE, 60).acquire())
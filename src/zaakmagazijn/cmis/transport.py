@@ -0,0 +1,116 @@
+"""
+Reuse HTTP connections to the DMS.
+
+`cmislib.net.RESTService` creates a new `httplib2.Http` instance, and thus
+a new connection, for every request. `install_connection_pool` replaces it
+with `PooledHttp`, which borrows an `httplib2.Http` instance from a pool
+shared by all threads, so connections are kept alive between requests.
+"""
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import httplib2
+from cmislib import net
+
+from ..utils.performance import performance_recorder
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of `httplib2.Http` instances. An instance is only
+    used by one thread at a time, since `httplib2.Http` is not thread-safe.
+    """
+    def __init__(self, maxsize=10, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize)
+
+    @contextmanager
+    def connection(self):
+        try:
+            http = self._pool.get_nowait()
+        except queue.Empty:
+            http = httplib2.Http(timeout=self.timeout)
+
+        try:
+            yield http
+        except Exception:
+            # The connection might be in an unknown state.
+            self._close(http)
+            raise
+
+        try:
+            self._pool.put_nowait(http)
+        except queue.Full:
+            self._close(http)
+
+    def clear(self):
+        while True:
+            try:
+                http = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            self._close(http)
+
+    def _close(self, http):
+        for connection in http.connections.values():
+            try:
+                connection.close()
+            except Exception:
+                logger.debug('Could not close connection %r.', connection, exc_info=True)
+        http.connections.clear()
+
+
+class PooledHttp:
+    """
+    Stand-in for `httplib2.Http`, as used by `cmislib.net.RESTService`.
+    """
+    def __init__(self, pool, **kwargs):
+        self.pool = pool
+        self.credentials = None
+
+    def add_credentials(self, name, password, domain=''):
+        self.credentials = (name, password, domain)
+
+    def request(self, *args, **kwargs):
+        with performance_recorder.call('cmis'), self.pool.connection() as http:
+            http.clear_credentials()
+            if self.credentials:
+                http.add_credentials(*self.credentials)
+            return http.request(*args, **kwargs)
+
+
+class PooledHttplib2:
+    """
+    Stand-in for the `httplib2` module in `cmislib.net`.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+
+    def Http(self, *args, **kwargs):
+        return PooledHttp(self.pool, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(httplib2, name)
+
+
+_install_lock = threading.Lock()
+
+
+def install_connection_pool(maxsize=10, timeout=None):
+    """
+    Make `cmislib` use a shared pool of connections. Calling this again has
+    no effect.
+
+    :param maxsize: The maximum number of idle connections that are kept.
+    :param timeout: The socket timeout in seconds, or `None` for no timeout.
+    :return: The `ConnectionPool`.
+    """
+    with _install_lock:
+        if not isinstance(net.httplib2, PooledHttplib2):
+            net.httplib2 = PooledHttplib2(ConnectionPool(maxsize, timeout))
+        return net.httplib2.pool
@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'zaakmagazijn.utils.middleware.MetricsMiddleware',
+    'zaakmagazijn.utils.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # 'django.middleware.locale.LocaleMiddleware',
@@ -67,6 +69,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auditlog.middleware.AuditlogMiddleware',
+    'zaakmagazijn.auditlog_extension.middleware.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'zaakmagazijn.urls'
@@ -243,6 +246,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'cmislib': {
             'handlers': ['project', 'console'],
             'level': 'WARNING',
@@ -314,9 +322,25 @@ ZAAKMAGAZIJN_GEMEENTE_CODE = '0000'
 # (excluding any other payload)
 ZAAKMAGAZIJN_MAX_CONTENT_LENGTH = 40 * 1024 * 1024  # 40mb
 
+# The content of documents in requests is decoded in chunks to a temporary
+# file, which is kept in memory up to this size.
+ZAAKMAGAZIJN_CONTENT_SPOOL_SIZE = 1024 * 1024  # 1mb
+
+# Responses with the content of a document larger than this size are streamed,
+# the content is encoded in chunks while the response is sent.
+ZAAKMAGAZIJN_CONTENT_STREAM_SIZE = 1024 * 1024  # 1mb
+
 # Allow everyone or use the authentication scheme.
 ZAAKMAGAZIJN_OPEN_ACCESS = True
 
+# Where the authorizations of applications are cached: 'local' (in-process),
+# the name of a Django cache or None to disable caching. Changes are seen by
+# all processes right away only with a cache shared between processes, like
+# memcached. Otherwise, a revoked authorization is still allowed by the other
+# processes for up to ZAAKMAGAZIJN_AUTHORIZATION_CACHE_TIMEOUT seconds.
+ZAAKMAGAZIJN_AUTHORIZATION_CACHE = 'local'
+ZAAKMAGAZIJN_AUTHORIZATION_CACHE_TIMEOUT = 60
+
 # Based on XSD parametersVraag -> maximumAantal
 ZAAKMAGAZIJN_DEFAULT_MAX_NR_RESULTS = 15
 
@@ -335,6 +359,12 @@ ZAAKMAGAZIJN_ZAAK_ID_GENERATOR = 'zaakmagazijn.api.utils.create_unique_id'
 ZAAKMAGAZIJN_DOCUMENT_ID_GENERATOR = 'zaakmagazijn.api.utils.create_unique_id'
 ZAAKMAGAZIJN_BESLUIT_ID_GENERATOR = 'zaakmagazijn.api.utils.create_unique_id'
 
+# The number of incremental year identifiers a process reserves at once, see
+# `zaakmagazijn.contrib.idgenerator`. With more than 1, fewer requests wait
+# for each other, but identifiers are not handed out in order by multiple
+# processes and unused identifiers are skipped when a process stops.
+ZAAKMAGAZIJN_ID_GENERATOR_BLOCK_SIZE = 1
+
 # Absolute URL of the Zaakmagazijn. Used in the WSDL and should not be altered.
 ZAAKMAGAZIJN_ZDS_URL = '/static/schema/'
 ZAAKMAGAZIJN_ZDS_PATH = os.path.join(BASE_DIR, 'zds', 'ZDS 1.2 2017 Q1 Resolved')
@@ -343,6 +373,44 @@ ZAAKMAGAZIJN_ZDS_PATH = os.path.join(BASE_DIR, 'zds', 'ZDS 1.2 2017 Q1 Resolved'
 # the proper locations or if the original schema's should be used.
 ZAAKMAGAZIJN_REFERENCE_WSDL = True
 
+# How READ log entries are written: 'direct' (one query per entry), 'buffer'
+# (one query at the end of the request) or 'spool' (to a spool file, stored
+# in the database by the drain_auditlog_spool command). With 'buffer', the
+# entries are written to the spool if the query fails, so the
+# drain_auditlog_spool command should run periodically with either mode.
+ZAAKMAGAZIJN_AUDITLOG_MODE = 'buffer'
+ZAAKMAGAZIJN_AUDITLOG_SPOOL_DIR = os.path.join(BASE_DIR, 'spool', 'auditlog')
+
+# Whether the (rewritten) reference WSDL is served gzipped to clients that
+# accept it.
+ZAAKMAGAZIJN_WSDL_GZIP = False
+
+# The SOAP services are created on the first request to their endpoint. With
+# this setting, wsgi.py creates all of them when it is loaded, so workers
+# forked by a master process that loads it (uWSGI without lazy-apps) share
+# them instead of creating them for their first request.
+ZAAKMAGAZIJN_WARM_UP = False
+
+# The fraction (0 to 1) of the SOAP requests for which the time per phase,
+# the queries and the DMS requests are logged to performance.log. Queries are
+# timed with the debug cursor, DMS requests only with CMIS_CONNECTION_POOL_SIZE.
+ZAAKMAGAZIJN_PERFORMANCE_SAMPLE_RATE = 0
+
+# Serve the metrics of the SOAP requests, the DMS and the synchronization
+# with the DMS on /metrics, in the Prometheus text format. Only enable this if
+# /metrics is not reachable from outside.
+ZAAKMAGAZIJN_METRICS = False
+
+# The directory where every process writes its metrics, so /metrics serves
+# the metrics of all processes, for example all uWSGI workers. Required if
+# there is more than one process. `None` serves the metrics of the process
+# handling the request only.
+ZAAKMAGAZIJN_METRICS_DIR = None
+
+# The minimum number of seconds between two writes of the metrics of a
+# process to ZAAKMAGAZIJN_METRICS_DIR.
+ZAAKMAGAZIJN_METRICS_FLUSH_INTERVAL = 5
+
 # Use the workaround for the StUF testplatform.
 ZAAKMAGAZIJN_STUF_TESTPLATFORM = False
 
@@ -413,6 +481,73 @@ CMIS_CLIENT_CLASS = 'zaakmagazijn.cmis.client.CMISDMSClient'
 CMIS_CLIENT_URL = 'http://localhost:8080/alfresco/cmisatom'
 CMIS_CLIENT_USER = 'Admin'
 CMIS_CLIENT_USER_PASSWORD = 'admin'
+# The number of idle connections to the DMS that are kept open, shared by
+# all threads. Set to 0 to open a new connection for every request.
+CMIS_CONNECTION_POOL_SIZE = 10
+# The socket timeout in seconds for connections to the DMS.
+CMIS_CONNECTION_TIMEOUT = None
+# The number of document identifications for which the CMIS object id is
+# cached, and for how many seconds. Set the size to 0 to disable the cache.
+CMIS_OBJECT_ID_CACHE_SIZE = 1000
+CMIS_OBJECT_ID_CACHE_TIMEOUT = 300
+# The number of folder paths for which the CMIS object id is cached, and for
+# how many seconds. Set the size to 0 to disable the cache.
+CMIS_FOLDER_CACHE_SIZE = 10000
+CMIS_FOLDER_CACHE_TIMEOUT = 60 * 60
+# The directory in which the content of documents is cached, shared by all
+# processes, and its maximum size in bytes. Set the size to 0 to disable the
+# cache.
+CMIS_CONTENT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'content')
+CMIS_CONTENT_CACHE_SIZE = 0
+# The number of change log entries processed per transaction by the sync,
+# and the number of threads retrieving the changed objects from the DMS. A
+# sync that stored no progress for CMIS_SYNC_TIMEOUT seconds loses its lease,
+# and is resumed by the next sync.
+CMIS_SYNC_BATCH_SIZE = 100
+CMIS_SYNC_WORKERS = 4
+CMIS_SYNC_TIMEOUT = 10 * 60
+# The number of seconds the continuous sync waits before polling the DMS
+# again. Every poll without changes doubles the interval, up to the maximum.
+CMIS_SYNC_POLL_INTERVAL = 1
+CMIS_SYNC_MAX_POLL_INTERVAL = 60
 
 # Use a property to store the sender information
 CMIS_SENDER_PROPERTY = None
+
+# Whether operations in the DMS that create zaakfolders and documents are
+# stored in the database, and executed by the process_dms_outbox command,
+# instead of during the request.
+ZAAKMAGAZIJN_DMS_OUTBOX = False
+# The number of attempts for an operation, and the number of seconds before
+# the first retry (doubled for every next retry).
+ZAAKMAGAZIJN_DMS_OUTBOX_MAX_ATTEMPTS = 5
+ZAAKMAGAZIJN_DMS_OUTBOX_RETRY_DELAY = 30
+# The number of seconds after which an operation that is still in progress is
+# considered abandoned (by a killed worker), and executed again.
+ZAAKMAGAZIJN_DMS_OUTBOX_CLAIM_TIMEOUT = 10 * 60
+# The number of seconds services wait for the pending operations on a
+# document, before reading the document from the DMS.
+ZAAKMAGAZIJN_DMS_OUTBOX_WAIT_TIMEOUT = 30
+# The directory where the content of the documents is stored until the
+# operations are executed. The process_dms_outbox command should be able to
+# read it. The content of operations that were rolled back is left behind.
+ZAAKMAGAZIJN_DMS_OUTBOX_CONTENT_DIR = os.path.join(BASE_DIR, 'dms_outbox')
+
+# Whether the messages received by the OntvangAsynchroon service are stored and
+# confirmed with a Bv03 right away, and processed by the process_async_messages
+# command. If processing fails, a Fo03 is sent to the sender.
+ZAAKMAGAZIJN_ASYNC_PROCESSING = False
+# The number of seconds after which a message that is still in progress is
+# considered abandoned (by a killed worker), and processed again. Messages
+# that are being processed are locked, and never processed twice.
+ZAAKMAGAZIJN_ASYNC_CLAIM_TIMEOUT = 10 * 60
+
+# The number of seconds the WSDL of an endpoint of another application is
+# cached, in memory and in the file ZAAKMAGAZIJN_CONSUMER_WSDL_CACHE (set to
+# None to only cache in memory), before it is loaded again.
+ZAAKMAGAZIJN_CONSUMER_CLIENT_TIMEOUT = 60 * 60
+ZAAKMAGAZIJN_CONSUMER_WSDL_CACHE = os.path.join(BASE_DIR, 'cache', 'zeep.sqlite')
+# The maximum number of connections kept alive per host of another
+# application, and the number of seconds to wait for its answer.
+ZAAKMAGAZIJN_CONSUMER_POOL_SIZE = 10
+ZAAKMAGAZIJN_CONSUMER_TIMEOUT = 30
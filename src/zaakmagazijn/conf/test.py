@@ -1,3 +1,5 @@
+import tempfile
+
 from .base import *
 
 #
@@ -45,6 +47,15 @@ LOGGING['loggers'].update({
 
 SKIP_CMIS_TESTS = True
 
+# Database changes are rolled back after each test without sending signals,
+# so cached authorizations would leak between tests.
+ZAAKMAGAZIJN_AUTHORIZATION_CACHE = None
+
+# The live server of the tests serves a different WSDL per test case.
+ZAAKMAGAZIJN_CONSUMER_WSDL_CACHE = None
+
+ZAAKMAGAZIJN_DMS_OUTBOX_CONTENT_DIR = os.path.join(tempfile.gettempdir(), 'zaakmagazijn_dms_outbox')
+
 #
 # Custom settings
 #
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def create_counters(apps, schema_editor):
+    IncrementalYearId = apps.get_model('idgenerator', 'IncrementalYearId')
+    IncrementalYearIdCounter = apps.get_model('idgenerator', 'IncrementalYearIdCounter')
+
+    IncrementalYearIdCounter.objects.bulk_create([
+        IncrementalYearIdCounter(year=row['year'], organisation=row['organisation'], last_number=row['max_number'])
+        for row in IncrementalYearId.objects.values('year', 'organisation').annotate(max_number=Max('number'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idgenerator', '0002_auto_20180604_1548'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncrementalYearIdCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('organisation', models.CharField(blank=True, default='', max_length=4)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='incrementalyearidcounter',
+            unique_together=set([('year', 'organisation')]),
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,100 @@
-from django.db import models, transaction
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.db.models import Max
 from django.utils import timezone
 
+# Numbers reserved by this process that are not used yet, per year and
+# organisation. See `IncrementalYearIdManager.next_number`.
+_reserved = {}
+_reserved_lock = threading.Lock()
+
 
 class IncrementalYearIdManager(models.Manager):
     @transaction.atomic
-    def create_unique(self, organisation=None):
-        year = timezone.now().strftime('%Y')
+    def create_unique(self, organisation=None, block_size=None):
+        """
+        Create an `IncrementalYearId` with the next number of the current year.
+
+        :param organisation: The organisation the number is unique for.
+        :param block_size: See the `ZAAKMAGAZIJN_ID_GENERATOR_BLOCK_SIZE` setting.
+        :return: The `IncrementalYearId`.
+        """
+        year = timezone.now().year
 
         if organisation is None:
             organisation = ''
 
+        if block_size is None:
+            block_size = settings.ZAAKMAGAZIJN_ID_GENERATOR_BLOCK_SIZE
+
+        number = self.next_number(year, organisation, block_size)
+        return self.create(year=year, organisation=organisation, number=number)
+
+    def next_number(self, year, organisation, block_size=1):
+        """
+        Return the next number, from the numbers reserved by this process, or
+        by reserving a block of :param:`block_size` numbers.
+
+        The numbers of a block are used by this process only, so they are not
+        handed out in order by multiple processes, and the unused numbers are
+        skipped when the process stops.
+        """
+        key = (year, organisation)
+        with _reserved_lock:
+            numbers = _reserved.get(key)
+            if numbers:
+                return numbers.popleft()
+
+        first = self.reserve(year, organisation, block_size)
+        if block_size > 1:
+            remaining = range(first + 1, first + block_size)
+
+            # The reservation is undone if the transaction is rolled back.
+            def release():
+                with _reserved_lock:
+                    _reserved.setdefault(key, deque()).extend(remaining)
+            transaction.on_commit(release)
+        return first
+
+    def reserve(self, year, organisation, count=1):
+        """
+        Reserve :param:`count` consecutive numbers. Concurrent reservations
+        wait for each other on the `IncrementalYearIdCounter` row.
+
+        :return: The first reserved number.
+        """
+        with transaction.atomic():
+            counter = self._get_counter(year, organisation)
+            first = counter.last_number + 1
+            counter.last_number += count
+            counter.save(update_fields=['last_number'])
+        return first
+
+    def _get_counter(self, year, organisation):
+        queryset = IncrementalYearIdCounter.objects.select_for_update()
+        try:
+            return queryset.get(year=year, organisation=organisation)
+        except IncrementalYearIdCounter.DoesNotExist:
+            pass
+
+        # Continue after the numbers created before there was a counter.
         max_number = self.model.objects.filter(
             year=year, organisation=organisation
         ).aggregate(
             max_number=Max('number')
         )['max_number']
 
-        if max_number is None:
-            max_number = 0
-
-        return self.create(year=year, organisation=organisation, number=max_number + 1)
+        try:
+            with transaction.atomic():
+                IncrementalYearIdCounter.objects.create(
+                    year=year, organisation=organisation, last_number=max_number or 0)
+        except IntegrityError:
+            # Created by a concurrent reservation.
+            pass
+        return queryset.get(year=year, organisation=organisation)
 
 
 class IncrementalYearId(models.Model):
@@ -41,3 +115,18 @@ class IncrementalYearId(models.Model):
         unique_together = (
             ('year', 'number', 'organisation'),
         )
+
+
+class IncrementalYearIdCounter(models.Model):
+    """
+    The last number reserved per year and organisation, see
+    `IncrementalYearIdManager.reserve`.
+    """
+    year = models.IntegerField()
+    organisation = models.CharField(max_length=4, blank=True, default='')
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            ('year', 'organisation'),
+        )
@@ -1,14 +1,20 @@
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
 
-from django.test import override_settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from freezegun import freeze_time
 from lxml import etree
 
 from zaakmagazijn.api.tests.base import BaseSoapTests
 from zaakmagazijn.utils import stuf_datetime
+from zaakmagazijn.utils.tests import should_run_benchmarks
 
-from ..models import IncrementalYearId
+from .. import models
+from ..models import IncrementalYearId, IncrementalYearIdCounter
 from ..utils import create_incremental_year_id
 
 
@@ -158,3 +164,99 @@ class IncrementalYearIdTestCase(BaseSoapTests):
         response_identificatie = response_root.xpath('//zds:besluit/zkn:identificatie', namespaces=self.nsmap)[0].text
 
         self.assertEqual(response_identificatie, '2017-0000001')
+
+
+class IncrementalYearIdCounterTests(TestCase):
+    @freeze_time(datetime.date(2015, 1, 1))
+    def test_counter(self):
+        IncrementalYearId.objects.create_unique()
+        IncrementalYearId.objects.create_unique(organisation='0392')
+        obj = IncrementalYearId.objects.create_unique()
+
+        self.assertEqual(obj.value, '2015-0000002')
+        self.assertEqual(IncrementalYearIdCounter.objects.get(year=2015, organisation='').last_number, 2)
+        self.assertEqual(IncrementalYearIdCounter.objects.get(year=2015, organisation='0392').last_number, 1)
+
+    @freeze_time(datetime.date(2015, 1, 1))
+    def test_counter_existing_ids(self):
+        IncrementalYearId.objects.create(year=2015, number=41)
+        IncrementalYearId.objects.create(year=2014, number=100)
+
+        obj = IncrementalYearId.objects.create_unique()
+        self.assertEqual(obj.value, '2015-0000042')
+
+    def test_new_year(self):
+        with freeze_time(datetime.date(2015, 12, 31)):
+            IncrementalYearId.objects.create_unique()
+        with freeze_time(datetime.date(2016, 1, 1)):
+            obj = IncrementalYearId.objects.create_unique()
+
+        self.assertEqual(obj.value, '2016-0000001')
+
+
+class IncrementalYearIdBlockTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.addCleanup(models._reserved.clear)
+
+    @freeze_time(datetime.date(2015, 1, 1))
+    def test_block(self):
+        values = [IncrementalYearId.objects.create_unique(block_size=10).value for i in range(12)]
+
+        self.assertEqual(values, ['2015-{:07d}'.format(number) for number in range(1, 13)])
+        self.assertEqual(IncrementalYearIdCounter.objects.get().last_number, 20)
+
+    @freeze_time(datetime.date(2015, 1, 1))
+    def test_block_rollback(self):
+        try:
+            with transaction.atomic():
+                IncrementalYearId.objects.create_unique(block_size=10)
+                raise ValueError
+        except ValueError:
+            pass
+
+        # The numbers reserved in the transaction that was rolled back are not used.
+        obj = IncrementalYearId.objects.create_unique(block_size=10)
+        self.assertEqual(obj.value, '2015-0000001')
+        self.assertEqual(IncrementalYearIdCounter.objects.get().last_number, 10)
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class IncrementalYearIdBenchmarkTests(TransactionTestCase):
+    """
+    Measure the throughput of generating identifiers with 16 threads.
+    """
+    number_of_threads = 16
+    number_of_ids = 50
+
+    def setUp(self):
+        super().setUp()
+
+        self.addCleanup(models._reserved.clear)
+
+    def _create(self, block_size):
+        try:
+            return [
+                IncrementalYearId.objects.create_unique(block_size=block_size).value
+                for i in range(self.number_of_ids)
+            ]
+        finally:
+            connection.close()
+
+    def test_benchmark(self):
+        for block_size in [1, 100]:
+            IncrementalYearId.objects.all().delete()
+            IncrementalYearIdCounter.objects.all().delete()
+            models._reserved.clear()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.number_of_threads) as executor:
+                results = list(executor.map(self._create, [block_size] * self.number_of_threads))
+            duration = time.perf_counter() - start
+
+            values = [value for result in results for value in result]
+            count = self.number_of_threads * self.number_of_ids
+            self.assertEqual(len(set(values)), count)
+            print('\nBlock size {}: {:.3f}s for {} identifiers ({:.0f} identifiers/s)'.format(
+                block_size, duration, count, count / duration))
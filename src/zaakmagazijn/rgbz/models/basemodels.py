@@ -100,13 +100,23 @@ class Object(TypeMixin, models.Model):
         # Automatically fill in the 'identificatie' field for any model that inherits from
         # Object. If a method called 'create_identificatie' exists it is called and used
         # to create a 'identificatie' string which is then stored.
+        #
+        # Rows loaded from the database (see `Model.from_db`) are instantiated
+        # with positional arguments and already have their 'identificatie'.
+        # Creating it could cost a query per row (see `Medewerker`).
+        if not args:
+            self.update_identificatie()
+
+    def update_identificatie(self):
         if hasattr(self, 'create_identificatie'):
             self.identificatie = self.create_identificatie()
 
     def save(self, *args, **kwargs):
+        # The fields the 'identificatie' is created from might have changed.
+        self.update_identificatie()
+        self._set_child_model('Object', '_objecttype_model')
+        self._set_type('Object', 'objecttype')
         super().save(*args, **kwargs)
-        self._save_child_model('Object', '_objecttype_model')
-        self._save_type('Object', 'objecttype')
 
     def is_type(self):
         return self._determine_type('Object', '_objecttype_model')
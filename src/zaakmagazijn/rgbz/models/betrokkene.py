@@ -40,9 +40,9 @@ class Betrokkene(Object):
         mnemonic = 'BTR'
 
     def save(self, *args, **kwargs):
+        self._set_child_model('Betrokkene', '_betrokkenetype_model')
+        self._set_type('Betrokkene', 'betrokkenetype')
         super().save(*args, **kwargs)
-        self._save_child_model('Betrokkene', '_betrokkenetype_model')
-        self._save_type('Betrokkene', 'betrokkenetype')
 
     def is_type(self):
         return self._determine_type('Betrokkene', '_betrokkenetype_model')
@@ -360,8 +360,8 @@ class Vestiging(CMISMixin, BereikenMixin, RekeningnummerMixin, Betrokkene):
         return self._determine_type('Vestiging', '_vestigingtype_model')
 
     def save(self, *args, **kwargs):
+        self._set_child_model('Vestiging', '_vestigingtype_model')
         super().save(*args, **kwargs)
-        self._save_child_model('Vestiging', '_vestigingtype_model')
 
     @property
     def vestigingsnummer(self):
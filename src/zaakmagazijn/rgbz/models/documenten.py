@@ -119,8 +119,8 @@ class InformatieObject(Object):
         return '{}-{}'.format(self.bronorganisatie, self.informatieobjectidentificatie)
 
     def save(self, *args, **kwargs):
+        self._set_child_model('InformatieObject', '_informatieobjecttype_model')
         super().save(*args, **kwargs)
-        self._save_child_model('InformatieObject', '_informatieobjecttype_model')
 
     def full_clean(self, exclude=None, validate_unique=True):
         """
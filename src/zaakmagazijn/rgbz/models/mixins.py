@@ -1,4 +1,6 @@
-from django.core.exceptions import ValidationError
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.db import models
 
 from ...utils import stuf_datetime
@@ -66,49 +68,128 @@ class TypeMixin(models.Model):
         else:
             return obj
 
-    def _save_child_model(self, class_name, field_name):
+    def _get_parent_ptr(self, class_name):
+        """
+        Return the field that links this object to the parent model
+        `class_name`, or `None` if this is not a subclass of that model.
         """
-        Save the name of the child model in this model, so that it is possible, without
+        try:
+            return self._meta.get_field(self._get_parent_ptr_name(class_name))
+        except FieldDoesNotExist:
+            return None
+
+    def _set_child_model(self, class_name, field_name):
+        """
+        Set the name of the child model in the fields of the parent model, so that it is possible, without
         iterating over all child relations to determine what kind of type this is, and look it up.
 
+        This should be called before saving, so the parent model is written only once.
+
         :param class_name Name of the parent model class
         :param field_name The field name where the model name will be stored.
         """
-        ptr_name = self._get_parent_ptr_name(class_name)
-        if hasattr(self, ptr_name):
-            obj = getattr(self, ptr_name)
-            cls = type(obj)
-
-            type_child_model = self.__class__
-            # If type_child_model is a _direct_ subclass of this class, save the model name
-            # If, there is model inheritance which is three (or more) levels deep
-            # the model name of the third level should be saved in the second level.
-            if type_child_model in cls.__subclasses__():
-                setattr(obj, field_name, type_child_model.__name__)
-                obj.save()
-
-    def _save_type(self, class_name, field_name):
+        ptr = self._get_parent_ptr(class_name)
+        if ptr is None:
+            return
+
+        # If there is model inheritance which is three (or more) levels deep,
+        # the model name of the second level is stored in the first level, and
+        # the model name of the third level in the second level.
+        parent_model = ptr.remote_field.model
+        child_model = next(klass for klass in type(self).__mro__ if parent_model in klass.__bases__)
+        setattr(self, field_name, child_model.__name__)
+
+    def _set_type(self, class_name, field_name):
         """
-        Save the mnemonic of the furthest child to in the model. This is used
+        Set the mnemonic of the furthest child in the fields of the parent model. This is used
         to be able to set a unique constraint on this field, plus some identifier,
         uniquely identifying this type of object.
 
+        This should be called before saving, so the parent model is written only once.
+
         :param class_name Name of the parent model class
         :param field_name The field name where the mnemonic will be stored.
         """
-        ptr_name = self._get_parent_ptr_name(class_name)
+        if self._get_parent_ptr(class_name) is None:
+            return
 
-        if hasattr(self, ptr_name):
-            obj = getattr(self, ptr_name)
-            child_obj = self.is_type()
-            if child_obj and hasattr(child_obj._meta, 'mnemonic'):
-                setattr(obj, field_name, child_obj._meta.mnemonic)
-                obj.save()
+        # A new object can't have any children yet.
+        child_obj = self if self._state.adding else self.is_type()
+        if child_obj and hasattr(child_obj._meta, 'mnemonic'):
+            setattr(self, field_name, child_obj._meta.mnemonic)
 
     class Meta:
         abstract = True
 
 
+def _get_child_relation(obj):
+    """
+    Return the reverse one-to-one relation that `obj.is_type()` would
+    follow to the child object, or `None` if `obj` is the furthest child or
+    the child is already retrieved.
+
+    This assumes the conventions of `TypeMixin`: the model that defines
+    `is_type` stores the name of the child model in `_<model name>type_model`.
+    """
+    type_model = next((klass for klass in type(obj).__mro__ if 'is_type' in klass.__dict__), None)
+    if type_model is None or not issubclass(type_model, TypeMixin):
+        return None
+
+    class_name = type_model.__name__
+    try:
+        obj._meta.get_field(obj._get_parent_ptr_name(class_name))
+    except FieldDoesNotExist:
+        pass
+    else:
+        return None
+
+    child_model_name = getattr(obj, '_{}type_model'.format(class_name.lower()), None)
+    if not child_model_name:
+        return None
+
+    related = getattr(getattr(type(obj), child_model_name.lower(), None), 'related', None)
+    if related is None or hasattr(obj, related.get_cache_name()):
+        return None
+    return related
+
+
+def resolve_types(objs):
+    """
+    Return `obj.is_type()` for all `objs`.
+
+    Instead of retrieving the child object of every object, on every level
+    of model inheritance, the objects are grouped by their child model and
+    the child objects are retrieved with one query per child model.
+
+    :param objs: An iterable of model instances that have an `is_type`
+        method, or `None`.
+    :return: A list of the furthest child objects, in the same order.
+    """
+    objs = list(objs)
+
+    pending = [obj for obj in objs if obj is not None]
+    while pending:
+        groups = OrderedDict()
+        for obj in pending:
+            related = _get_child_relation(obj)
+            if related is not None:
+                groups.setdefault(related, []).append(obj)
+
+        pending = []
+        for related, parents in groups.items():
+            # With model inheritance, the child has the same primary key.
+            children = related.related_model._base_manager.in_bulk([parent.pk for parent in parents])
+            for parent in parents:
+                child = children.get(parent.pk)
+                if child is None:
+                    continue
+                setattr(parent, related.get_cache_name(), child)
+                setattr(child, related.field.get_cache_name(), parent)
+                pending.append(child)
+
+    return [obj.is_type() if obj is not None else None for obj in objs]
+
+
 class ExtraValidatorsMixin(models.Model):
     """
     A list of validators, which shouldn't be picked up by migrations, but
@@ -1,13 +1,23 @@
-from unittest import skip
+import re
+import time
+from collections import Counter
+from unittest import skip, skipUnless
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from ...rsgb.tests.factory_models import (
     AdresMetPostcodeFactory, BezoekadresFactory, CorrespondentieadresFactory,
     LocatieadresFactory, PostAdresFactory, VerblijfAdresFactory,
     VerblijfBuitenlandFactory
 )
-from ..models import VestigingVanZaakBehandelendeOrganisatie
+from ...utils.tests import should_run_benchmarks
+from ..models import (
+    Betrokkene, Medewerker, NatuurlijkPersoon, Object,
+    VestigingVanZaakBehandelendeOrganisatie
+)
+from ..models.mixins import resolve_types
 from .factory_models import (
     BetrokkeneFactory, BetrokkeneMetRolFactory, BetrokkeneMetVerzendingFactory,
     KlantcontactFactory, KlantcontactMetVestigingFactory, MedewerkerFactory,
@@ -278,6 +288,204 @@ class MedewerkerTestCase(TestCase):
         betrokkene = medewerker.betrokkene_ptr
         self.assertEquals(betrokkene.is_type(), medewerker)
 
+    def test_identificatie(self):
+        org_eenheid = OrganisatorischeEenheidFactory.create(organisatieeenheididentificatie='0001')
+        medewerker = MedewerkerFactory.create(organisatorische_eenheid=org_eenheid, medewerkeridentificatie='123')
+        self.assertEqual(medewerker.identificatie, '0001123')
+
+        medewerker.medewerkeridentificatie = '456'
+        medewerker.save()
+
+        medewerker.refresh_from_db()
+        self.assertEqual(medewerker.identificatie, '0001456')
+
+    def test_load_from_db(self):
+        """
+        Loading medewerkers should not retrieve their organisatorische eenheid
+        to create the identificatie.
+        """
+        medewerkers = MedewerkerFactory.create_batch(5)
+
+        with self.assertNumQueries(1):
+            loaded = list(Medewerker.objects.order_by('pk'))
+
+        self.assertEqual(
+            [medewerker.identificatie for medewerker in loaded],
+            [medewerker.identificatie for medewerker in medewerkers]
+        )
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class MedewerkerBenchmarkTests(TestCase):
+    """
+    Compare loading medewerkers with and without creating the identificatie
+    for every row, like `Object.__init__` used to do.
+    """
+    number_of_medewerkers = 500
+    repeat = 5
+
+    def setUp(self):
+        super().setUp()
+
+        MedewerkerFactory.create_batch(self.number_of_medewerkers)
+
+    def test_benchmark(self):
+        load_time = 0.0
+        create_identificatie_time = 0.0
+        for i in range(self.repeat):
+            start = time.perf_counter()
+            medewerkers = list(Medewerker.objects.all())
+            load_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for medewerker in medewerkers:
+                medewerker.create_identificatie()
+            create_identificatie_time += time.perf_counter() - start
+
+        print('\nNew (load only): {:.3f}s for {} medewerkers'.format(
+            load_time / self.repeat, self.number_of_medewerkers))
+        print('Old (load and create identificatie): {:.3f}s for {} medewerkers'.format(
+            (load_time + create_identificatie_time) / self.repeat, self.number_of_medewerkers))
+
+
+class ResolveTypesTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        medewerkers = MedewerkerFactory.create_batch(3)
+        natuurlijk_personen = NatuurlijkPersoonFactory.create_batch(3)
+        self.pks = [obj.pk for obj in medewerkers + natuurlijk_personen]
+
+    def test_resolve_types(self):
+        betrokkenen = list(Betrokkene.objects.filter(pk__in=self.pks).order_by('pk'))
+        expected = [Betrokkene.objects.get(pk=betrokkene.pk).is_type() for betrokkene in betrokkenen]
+
+        # One query per child model.
+        with self.assertNumQueries(2):
+            resolved = resolve_types(betrokkenen)
+
+        self.assertEqual(resolved, expected)
+        self.assertEqual([type(obj) for obj in resolved], [type(obj) for obj in expected])
+
+        with self.assertNumQueries(0):
+            for betrokkene in betrokkenen:
+                betrokkene.is_type()
+
+    def test_resolve_types_multiple_levels(self):
+        objects = list(Object.objects.filter(pk__in=self.pks).order_by('pk'))
+
+        # Betrokkene, and then Medewerker and NatuurlijkPersoon.
+        with self.assertNumQueries(3):
+            resolved = resolve_types(objects)
+
+        self.assertEqual({type(obj) for obj in resolved}, {Medewerker, NatuurlijkPersoon})
+
+    def test_none(self):
+        self.assertEqual(resolve_types([None]), [None])
+
+
+class SaveTests(TestCase):
+    """
+    Every table of the inheritance chain should be written once when saving
+    an object, including the type fields of the parent models.
+    """
+    def _get_writes(self, queries, models):
+        tables = {model._meta.db_table for model in models}
+        writes = Counter()
+        for query in queries:
+            match = re.match(r'^(?:INSERT INTO|UPDATE) "(\w+)"', query['sql'])
+            if match and match.group(1) in tables:
+                writes[match.group(1)] += 1
+        return writes
+
+    def test_create_natuurlijk_persoon(self):
+        with CaptureQueriesContext(connection) as context:
+            natuurlijk_persoon = NatuurlijkPersoonFactory.create()
+
+        models = [Object, Betrokkene, NatuurlijkPersoon]
+        self.assertEqual(
+            self._get_writes(context.captured_queries, models),
+            {model._meta.db_table: 1 for model in models}
+        )
+
+        natuurlijk_persoon.refresh_from_db()
+        self.assertEqual(natuurlijk_persoon._objecttype_model, 'Betrokkene')
+        self.assertEqual(natuurlijk_persoon.objecttype, 'NPS')
+        self.assertEqual(natuurlijk_persoon._betrokkenetype_model, 'NatuurlijkPersoon')
+        self.assertEqual(natuurlijk_persoon.betrokkenetype, 'NPS')
+
+    def test_create_medewerker(self):
+        org_eenheid = OrganisatorischeEenheidFactory.create()
+
+        with CaptureQueriesContext(connection) as context:
+            MedewerkerFactory.create(organisatorische_eenheid=org_eenheid)
+
+        models = [Object, Betrokkene, Medewerker]
+        self.assertEqual(
+            self._get_writes(context.captured_queries, models),
+            {model._meta.db_table: 1 for model in models}
+        )
+
+    def test_update(self):
+        natuurlijk_persoon = NatuurlijkPersoonFactory.create()
+
+        with CaptureQueriesContext(connection) as context:
+            natuurlijk_persoon.save()
+
+        models = [Object, Betrokkene, NatuurlijkPersoon]
+        self.assertEqual(
+            self._get_writes(context.captured_queries, models),
+            {model._meta.db_table: 1 for model in models}
+        )
+
+        natuurlijk_persoon.refresh_from_db()
+        self.assertEqual(natuurlijk_persoon.objecttype, 'NPS')
+        self.assertEqual(natuurlijk_persoon.betrokkenetype, 'NPS')
+
+    def test_update_parent(self):
+        niet_natuurlijk_persoon = NietNatuurlijkPersoonFactory.create()
+        betrokkene = Betrokkene.objects.get(pk=niet_natuurlijk_persoon.pk)
+        betrokkene.save()
+
+        betrokkene.refresh_from_db()
+        self.assertEqual(betrokkene.objecttype, 'NNP')
+        self.assertEqual(betrokkene.betrokkenetype, 'NNP')
+        self.assertEqual(betrokkene._betrokkenetype_model, 'NietNatuurlijkPersoon')
+
+
+@skipUnless(should_run_benchmarks(), 'Benchmarks are disabled.')
+class BetrokkeneBenchmarkTests(TestCase):
+    """
+    Compare saving natuurlijk personen with saving every parent model again
+    to store the type fields, like `TypeMixin` used to do.
+    """
+    number_of_objects = 200
+    repeat = 5
+
+    def setUp(self):
+        super().setUp()
+
+        self.natuurlijk_personen = NatuurlijkPersoonFactory.create_batch(self.number_of_objects)
+
+    def test_benchmark(self):
+        new_time = 0.0
+        old_time = 0.0
+        for i in range(self.repeat):
+            start = time.perf_counter()
+            for natuurlijk_persoon in self.natuurlijk_personen:
+                natuurlijk_persoon.save()
+            new_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for natuurlijk_persoon in self.natuurlijk_personen:
+                natuurlijk_persoon.object_ptr.save()
+                natuurlijk_persoon.betrokkene_ptr.save()
+            old_time += time.perf_counter() - start
+
+        print('\nNew: {:.3f}s for {} natuurlijk personen'.format(new_time / self.repeat, self.number_of_objects))
+        print('Old: {:.3f}s for {} natuurlijk personen'.format(
+            (new_time + old_time) / self.repeat, self.number_of_objects))
+
 
 class RolTestCase(TestCase):
     def test_hulpfunctie_zet_als_betrokkene(self):
@@ -1,6 +1,9 @@
 import inspect
 
-from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.exceptions import (
+    FieldDoesNotExist, ImproperlyConfigured, ValidationError
+)
+from django.db.models import Q
 from django.db.models.constants import LOOKUP_SEP
 from django.utils.module_loading import import_string
 
@@ -10,6 +13,33 @@ from .manager import ProxyRelatedManager
 from .registry import proxy_registry
 
 
+def follows(path):
+    """
+    Mark a method on a `ModelProxy` that returns the object that is found by
+    following the foreign keys in `path`. This allows these objects to be
+    retrieved upfront, see `zaakmagazijn.api.zds.prefetch`.
+
+    :param path: The RGBZ 1.0 foreign key names, separated by `__`.
+    """
+    def decorator(func):
+        func.follows = path
+        return func
+    return decorator
+
+
+def uses(*field_names):
+    """
+    Mark a `to_rgbz1_*` method with the RGBZ 2.0 fields it reads, so only
+    these fields need to be retrieved to compute the RGBZ 1.0 value.
+
+    :param field_names: The Django field names.
+    """
+    def decorator(func):
+        func.uses = field_names
+        return func
+    return decorator
+
+
 class ProxyOneToManyDescriptor:
     def __init__(self, relation):
         self.relation = relation
@@ -22,7 +52,30 @@ class ProxyOneToManyDescriptor:
         related_manager = getattr(django_obj, self.relation.rgbz2_name)
         proxy_model = self.relation.relation_proxy_model
 
-        return ProxyRelatedManager(proxy_model, related_manager)
+        return ProxyRelatedManager(proxy_model, related_manager, relation=self.relation)
+
+
+class ProxyFieldDescriptor:
+    """
+    Compute the RGBZ 1.0 value of a field on first access, and store it on
+    the instance for subsequent access.
+    """
+    def __init__(self, field_name):
+        self.field_name = field_name
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+
+        field = instance._get_field(self.field_name)
+        try:
+            value = instance._to_rgbz1_field(field, instance._obj)
+        except NoValueError:
+            raise AttributeError(
+                '\'{}\' object has no value for \'{}\''.format(type(instance).__name__, self.field_name))
+
+        instance.__dict__[self.field_name] = value
+        return value
 
 
 class ModelProxyBase(type):
@@ -49,6 +102,13 @@ class ModelProxyBase(type):
             for relation in new_class.get_fields(in_rgbz1=True, is_relation=True):
                 setattr(new_class, relation.rgbz1_name, ProxyOneToManyDescriptor(relation))
 
+            # Don't hide attributes that are explicitly defined, like the
+            # `_inhoud` property.
+            for field in new_class.get_fields(in_rgbz1=True, is_field=True, is_foreign_key=True):
+                attr = getattr(new_class, field.rgbz1_name, None)
+                if attr is None or isinstance(attr, ProxyFieldDescriptor):
+                    setattr(new_class, field.rgbz1_name, ProxyFieldDescriptor(field.rgbz1_name))
+
             proxy_registry.register_proxy_model(new_class)
 
         return new_class
@@ -64,7 +124,7 @@ class ModelProxy(metaclass=ModelProxyBase):
 
         default_field_names = {'pk', }
 
-        rgbz1_field_names = {field.rgbz1_name for field in self.get_fields(in_rgbz1=True, is_field=True, is_foreign_key=True)}
+        rgbz1_field_names = self._get_rgbz1_field_names()
         kwargs_fields_names = set(rgbz1_kwargs.keys())
         undefined_field_names = kwargs_fields_names.difference(rgbz1_field_names.union(default_field_names))
         if undefined_field_names:
@@ -72,7 +132,8 @@ class ModelProxy(metaclass=ModelProxyBase):
 
         # There are two ways which a ModelProxy can be initiated, either
         # it's based on an existing Django ORM object, or a new Django ORM is created
-        # on given kwargs.
+        # on given kwargs. In the first case, the fields that are not given
+        # are computed on first access (see `ProxyFieldDescriptor`).
         if _obj:
             self._obj = _obj
             for field_name, value in rgbz1_kwargs.items():
@@ -110,7 +171,11 @@ class ModelProxy(metaclass=ModelProxyBase):
 
     @classmethod
     def _get_field(cls, rgbz1_name):
-        mapping = {field.rgbz1_name: field for field in cls.fields}
+        # The mapping is built once per class, subclasses get their own.
+        mapping = cls.__dict__.get('_field_mapping')
+        if mapping is None:
+            mapping = {field.rgbz1_name: field for field in cls.fields}
+            cls._field_mapping = mapping
 
         try:
             return mapping[rgbz1_name]
@@ -119,6 +184,15 @@ class ModelProxy(metaclass=ModelProxyBase):
                 'Can\'t find a field name \'{rgbz1_name}\' on the proxy model {proxy_model}'.format(
                     rgbz1_name=rgbz1_name, proxy_model=cls.__name__))
 
+    @classmethod
+    def _get_rgbz1_field_names(cls):
+        field_names = cls.__dict__.get('_rgbz1_field_names')
+        if field_names is None:
+            field_names = frozenset(
+                field.rgbz1_name for field in cls.get_fields(in_rgbz1=True, is_field=True, is_foreign_key=True))
+            cls._rgbz1_field_names = field_names
+        return field_names
+
     @classmethod
     def get_field(cls, rgbz1_name):
         """
@@ -149,11 +223,62 @@ class ModelProxy(metaclass=ModelProxyBase):
                                  'method or set a rgbz1 field name'.format(field_name=field.rgbz1_name)
         if isinstance(field, ProxyForeignKey):
             fk_obj = getattr(obj, field.rgbz2_name)
-            # TODO [TECH]: It's probably a good idea to lazy-load ForeignKeys.
             return field.relation_proxy_model.from_django_obj(fk_obj) if fk_obj else None
         else:
             return getattr(obj, field.rgbz2_name)
 
+    @classmethod
+    def _to_rgbz2_filter(cls, field, value):
+        """
+        Translate a filter on the RGBZ 1.0 `value` of a computed `field` to a
+        `Q` object, so it can be done by the database.
+
+        A `to_rgbz2_filter_<rgbz1_name>` method can be defined to do the
+        translation. Fields without a `to_rgbz1_*` method have the same value
+        in RGBZ 1.0 and 2.0, and are translated as is.
+
+        :param field: The `ProxyField` or `ProxyForeignKey`.
+        :param value: The RGBZ 1.0 value to filter on.
+        :return: A `Q` object, or `None` if the value can only be compared in
+            Python.
+        """
+        filter_method = getattr(cls, 'to_rgbz2_filter_{}'.format(field.rgbz1_name), None)
+        if filter_method:
+            return filter_method(value)
+
+        if not isinstance(field, ProxyField) or not field.rgbz2_name or cls._to_rgbzx_method(field, 1):
+            return None
+        try:
+            django_field = cls.get_model()._meta.get_field(field.rgbz2_name)
+        except FieldDoesNotExist:
+            return None
+        if not getattr(django_field, 'concrete', False):
+            return None
+        return Q(**{field.rgbz2_name: value})
+
+    @classmethod
+    def get_rgbz2_field_names(cls, fields):
+        """
+        Return the names of the Django fields needed to compute the RGBZ 1.0
+        values of `fields`.
+
+        :param fields: The `ProxyField` or `ProxyForeignKey` instances.
+        :return: A set of field names, or `None` if this is unknown for any
+            of the fields (see `uses`).
+        """
+        field_names = set()
+        for field in fields:
+            to_rgbz1_method = cls._to_rgbzx_method(field, 1)
+            if to_rgbz1_method:
+                used_field_names = getattr(to_rgbz1_method, 'uses', None)
+            else:
+                used_field_names = [field.rgbz2_name] if field.rgbz2_name else None
+
+            if used_field_names is None:
+                return None
+            field_names.update(used_field_names)
+        return field_names
+
     @classmethod
     def to_rgbz1_kwargs(cls, obj):
         rgbz1_kwargs = {}
@@ -242,16 +367,22 @@ class ModelProxy(metaclass=ModelProxyBase):
     def from_django_obj(cls, obj):
         """
         Convert a Django obj, which is RGBZ2.0 to a ProxyModel obj, which is
-        RGBZ 1.0.
+        RGBZ 1.0. The RGBZ 1.0 values, including foreign keys, are computed
+        when they are accessed.
 
         :param obj Django model instance.
         """
+        return cls(_obj=obj, pk=obj.pk)
 
-        kwargs = cls.to_rgbz1_kwargs(obj)
-        kwargs.update({
-            'pk': obj.pk
-        })
-        return cls(_obj=obj, **kwargs)
+    @classmethod
+    def from_django_objs(cls, objs):
+        """
+        Convert multiple Django objs, see `from_django_obj`.
+
+        :param objs An iterable of Django model instances.
+        :return: A list of ProxyModel objs.
+        """
+        return [cls.from_django_obj(obj) for obj in objs]
 
     def save(self):
         django_obj = self.to_django_obj()
@@ -1,5 +1,6 @@
 import logging
 
+from django.db.models import Q
 from django.db.models.constants import LOOKUP_SEP
 
 logger = logging.getLogger(__name__)
@@ -17,8 +18,7 @@ class ProxyQuerySet:
         return self.proxy_model.model
 
     def __iter__(self):
-        for obj in self.queryset:
-            yield self.proxy_model.from_django_obj(obj)
+        return iter(self.proxy_model.from_django_objs(self.queryset))
 
     def all(self):
         return self
@@ -89,16 +89,21 @@ class ProxyQuerySet:
 
         return new_lookup
 
-    def filter(self, **kwargs):
-        """
-        *args is not supported.
+    def select_related(self, *fields):
+        return self.__class__(proxy_model=self.proxy_model, queryset=self.queryset.select_related(*fields))
 
-        Filtering is a bit trippy, since we want to filter on RGBZ1 values, and not
-        on RGBZ2 values.
+    def prefetch_related(self, *lookups):
+        return self.__class__(proxy_model=self.proxy_model, queryset=self.queryset.prefetch_related(*lookups))
 
-        :param **kwargs: The RGBZ 1 filter arguments.
+    def translate_filter_kwargs(self, kwargs):
         """
+        Translate RGBZ 1 filter arguments to RGBZ 2 filter arguments that can
+        be passed to the database, and the fields that can only be compared
+        after their database value is mapped to RGBZ 1.
 
+        :param kwargs: The RGBZ 1 filter arguments.
+        :return: A 2-tuple of the RGBZ 2 filter arguments and a set of computed fields.
+        """
         # All RGBZ 2 fields of which the value can be directly mapped to RGBZ 1
         direct_translatable_fields = list(self.proxy_model.get_fields(
             in_rgbz1=True, in_rgbz2=True, is_foreign_key=True,
@@ -120,33 +125,98 @@ class ProxyQuerySet:
         full_filter_kwargs = {}
         full_filter_kwargs.update(filter_kwargs)
         full_filter_kwargs.update(extra_filter_kwargs)
-        filtered_queryset = self.queryset.filter(**full_filter_kwargs)
 
         # What remains are the fields of which the database value needs to be
         # parsed to match it's RGBZ 2 value to the RGBZ 1 filter value.
-        computed_filter_fields = {field for field in applicable_fields if field.rgbz2_name not in  filter_kwargs.keys()}
+        computed_filter_fields = {field for field in applicable_fields if field.rgbz2_name not in filter_kwargs.keys()}
+
+        return full_filter_kwargs, computed_filter_fields
+
+    def translate_computed_filters(self, computed_filter_fields, kwargs):
+        """
+        Translate the RGBZ 1 filter arguments of computed fields to `Q`
+        objects, as far as the proxy model knows how (see
+        `ModelProxy._to_rgbz2_filter`).
+
+        :param computed_filter_fields: The computed fields, as returned by `translate_filter_kwargs`.
+        :param kwargs: The RGBZ 1 filter arguments.
+        :return: A 2-tuple of a list of `Q` objects and the set of computed
+            fields that can only be compared in Python.
+        """
+        filter_args = []
+        python_filter_fields = set()
+        for field in computed_filter_fields:
+            filter_value = field.get_django_field().to_python(kwargs[field.rgbz1_name])
+            q = self.proxy_model._to_rgbz2_filter(field, filter_value)
+            if q is None:
+                python_filter_fields.add(field)
+            else:
+                filter_args.append(q)
+        return filter_args, python_filter_fields
+
+    def translate_filter(self, kwargs):
+        """
+        Translate RGBZ 1 filter arguments to a `Q` object that can be passed
+        to the database, and the fields that can only be compared after their
+        database value is mapped to RGBZ 1.
+
+        :param kwargs: The RGBZ 1 filter arguments.
+        :return: A 2-tuple of a `Q` object and a set of computed fields.
+        """
+        full_filter_kwargs, computed_filter_fields = self.translate_filter_kwargs(kwargs)
+        filter_args, python_filter_fields = self.translate_computed_filters(computed_filter_fields, kwargs)
+        return Q(*filter_args, **full_filter_kwargs), python_filter_fields
+
+    def matches_computed_fields(self, obj, computed_filter_fields, kwargs, _mapped_kwargs=None):
+        """
+        Return whether the Django object `obj` matches the RGBZ 1 filter
+        arguments for all computed fields.
+
+        :param obj: Django model instance.
+        :param computed_filter_fields: The computed fields, as returned by `translate_filter_kwargs`.
+        :param kwargs: The RGBZ 1 filter arguments.
+        """
+        for field in computed_filter_fields:
+            filter_value = field.get_django_field().to_python(kwargs[field.rgbz1_name])
+            db_value = self.proxy_model._to_rgbz1_field(field, obj)
+
+            # Line below only for logging purposes
+            if _mapped_kwargs is not None:
+                _mapped_kwargs[field.rgbz2_name] = filter_value
+
+            if filter_value != db_value:
+                return False
+        return True
+
+    def filter(self, **kwargs):
+        """
+        *args is not supported.
+
+        Filtering is a bit trippy, since we want to filter on RGBZ1 values, and not
+        on RGBZ2 values.
+
+        :param **kwargs: The RGBZ 1 filter arguments.
+        """
+        full_filter_kwargs, computed_filter_fields = self.translate_filter_kwargs(kwargs)
+        filter_args, python_filter_fields = self.translate_computed_filters(computed_filter_fields, kwargs)
+        filtered_queryset = self.queryset.filter(*filter_args, **full_filter_kwargs)
 
         # Line below only for logging purposes
         _mapped_kwargs = {}
 
-        if computed_filter_fields:
+        if python_filter_fields:
+            # Only retrieve what's needed to compute the values, one row at a
+            # time.
+            queryset = filtered_queryset.select_related(None)
+            field_names = self.proxy_model.get_rgbz2_field_names(python_filter_fields)
+            if field_names is not None:
+                queryset = queryset.only(*field_names)
+
             filter_pks = []
-            for obj in filtered_queryset:
+            for obj in queryset.iterator():
                 # Iterate over all fields and if they all match, add the PK to the
                 # filter.
-                match = False
-                for field in computed_filter_fields:
-                    filter_value = field.get_django_field().to_python(kwargs[field.rgbz1_name])
-                    db_value = self.proxy_model._to_rgbz1_field(field, obj)
-
-                    # Line below only for logging purposes
-                    _mapped_kwargs[field.rgbz2_name] = filter_value
-
-                    match = filter_value == db_value
-                    if not match:
-                        break
-
-                if match:
+                if self.matches_computed_fields(obj, python_filter_fields, kwargs, _mapped_kwargs):
                     filter_pks.append(obj.pk)
 
             filtered_queryset = filtered_queryset.filter(pk__in=filter_pks)
@@ -156,22 +226,20 @@ class ProxyQuerySet:
             _proxy_filter_str = '{}.objects.filter({})'.format(
                 self.proxy_model.__name__, ', '.join(
                     ['{}={}'.format(k, v) for k, v in kwargs.items()]))
-            if computed_filter_fields:
+            _sql_filter_str = ', '.join(
+                [str(q) for q in filter_args] + ['{}={}'.format(k, v) for k, v in full_filter_kwargs.items()])
+            if python_filter_fields:
                 _map_method = 'via {}value comparison (slow)'.format('(unneeded) ' if not _mapped_kwargs else '')
                 _real_filter_str = '{}.filter({}).filter({})'.format(
                     self.proxy_model.model.__name__,
-                    ', '.join(
-                        ['{}={}'.format(k, v) for k, v in full_filter_kwargs.items()]
-                    ),
+                    _sql_filter_str,
                     ', '.join(
                         ['{}={}'.format(k, v) for k, v in _mapped_kwargs.items()]
                     ),
                 )
             else:
                 _map_method = 'directly (fast)'
-                _real_filter_str = '{}.objects.filter({})'.format(
-                    self.proxy_model.model.__name__, ', '.join(
-                        ['{}={}'.format(k, v) for k, v in full_filter_kwargs.items()]))
+                _real_filter_str = '{}.objects.filter({})'.format(self.proxy_model.model.__name__, _sql_filter_str)
             logger.debug('{} mapped {} to: {}'.format(_proxy_filter_str, _map_method, _real_filter_str))
 
         return self.__class__(proxy_model=self.proxy_model, queryset=filtered_queryset)
@@ -238,9 +306,11 @@ class ProxyManager(BaseManager):
 
 
 class ProxyRelatedManager(BaseManager):
-    def __init__(self, proxy_model, related_manager):
+    def __init__(self, proxy_model, related_manager, relation=None):
         self.proxy_model = proxy_model
         self.related_manager = related_manager
+        # The `ProxyOneToMany` this manager was created for, if any.
+        self.relation = relation
 
     @property
     def model(self):
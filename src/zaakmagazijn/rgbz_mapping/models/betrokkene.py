@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 from zaakmagazijn.rgbz.choices import (
     IndicatieMachtiging as RGBZ2IndicatieMachtiging,
@@ -10,7 +11,7 @@ from zaakmagazijn.rgbz.models import (
     VestigingVanZaakBehandelendeOrganisatie
 )
 
-from ..base import ModelProxy, ProxyField, ProxyForeignKey
+from ..base import ModelProxy, ProxyField, ProxyForeignKey, uses
 from ..choices import Rolomschrijving as RGBZ1Rolomschrijving, Subjecttypering
 from ..manager import ProxyManager
 from ..registry import proxy_registry
@@ -117,12 +118,19 @@ class NietNatuurlijkPersoonProxy(ModelProxy):
     objects = ProxyManager()
 
     @classmethod
+    @uses()
     def to_rgbz1_subjecttypering(cls, obj):
         """"
         Waarde ="21" of "23" indien het een Ingeschreven niet-natuurlijk persoon resp. Ander buitenlands niet-natuurlijk persoon betreft
         """
         return Subjecttypering.innp
 
+    @classmethod
+    def to_rgbz2_filter_subjecttypering(cls, value):
+        if value == Subjecttypering.innp:
+            return Q()
+        return Q(pk__in=[])
+
 
 class VestigingProxy(ModelProxy):
     model = Vestiging
@@ -203,6 +211,19 @@ class RolProxy(ModelProxy):
     )
     objects = ProxyManager()
 
+    # RGBZ 2.0 "rolomschrijving" to RGBZ 1.0, unless "indicatie machtiging"
+    # is "gemachtigde".
+    rgbz1_rolomschrijving_mapping = {
+        RGBZ2RolomschrijvingGeneriek.adviseur: RGBZ1Rolomschrijving.overig,
+        RGBZ2RolomschrijvingGeneriek.behandelaar: RGBZ1Rolomschrijving.uitvoerder,
+        RGBZ2RolomschrijvingGeneriek.beslisser: RGBZ1Rolomschrijving.verantwoordelijke,
+        RGBZ2RolomschrijvingGeneriek.klantcontacter: RGBZ1Rolomschrijving.overig,
+        RGBZ2RolomschrijvingGeneriek.medeinitiator: RGBZ1Rolomschrijving.overig,
+        RGBZ2RolomschrijvingGeneriek.zaakcoordinator: RGBZ1Rolomschrijving.overig,
+        RGBZ2RolomschrijvingGeneriek.belanghebbende: RGBZ1Rolomschrijving.belanghebbende,
+        RGBZ2RolomschrijvingGeneriek.initiator: RGBZ1Rolomschrijving.initiator,
+    }
+
     @classmethod
     def _to_rgbz2_rolomschrijving_generiek(cls, rol):
         """
@@ -233,6 +254,7 @@ class RolProxy(ModelProxy):
         return cls._to_rgbz2_rolomschrijving_generiek(rgbz1_kwargs['rolomschrijving'])
 
     @classmethod
+    @uses('rolomschrijving', 'indicatie_machtiging')
     def to_rgbz1_rolomschrijving_generiek(cls, rgbz2_obj):
         """
         Indien 'Indicatie machtiging' de waarde "gemachtigde" heeft, dan "Gemachtigde", anders:
@@ -248,23 +270,32 @@ class RolProxy(ModelProxy):
         if rgbz2_obj.indicatie_machtiging == RGBZ2IndicatieMachtiging.gemachtigde:
             return RGBZ1Rolomschrijving.gemachtigde
 
-        mapping = {
-            RGBZ2RolomschrijvingGeneriek.adviseur: RGBZ1Rolomschrijving.overig,
-            RGBZ2RolomschrijvingGeneriek.behandelaar: RGBZ1Rolomschrijving.uitvoerder,
-            RGBZ2RolomschrijvingGeneriek.beslisser: RGBZ1Rolomschrijving.verantwoordelijke,
-            RGBZ2RolomschrijvingGeneriek.klantcontacter: RGBZ1Rolomschrijving.overig,
-            RGBZ2RolomschrijvingGeneriek.medeinitiator: RGBZ1Rolomschrijving.overig,
-            RGBZ2RolomschrijvingGeneriek.zaakcoordinator: RGBZ1Rolomschrijving.overig,
-            RGBZ2RolomschrijvingGeneriek.belanghebbende: RGBZ1Rolomschrijving.belanghebbende,
-            RGBZ2RolomschrijvingGeneriek.initiator: RGBZ1Rolomschrijving.initiator,
-        }
-
-        return mapping[rgbz2_obj.rolomschrijving]
+        return cls.rgbz1_rolomschrijving_mapping[rgbz2_obj.rolomschrijving]
 
     @classmethod
+    @uses('rolomschrijving', 'indicatie_machtiging')
     def to_rgbz1_rolomschrijving(cls, rgbz2_obj):
         return cls.to_rgbz1_rolomschrijving_generiek(rgbz2_obj)
 
+    @classmethod
+    def to_rgbz2_filter_rolomschrijving_generiek(cls, value):
+        """
+        The reverse of `to_rgbz1_rolomschrijving_generiek`.
+        """
+        gemachtigde = Q(indicatie_machtiging=RGBZ2IndicatieMachtiging.gemachtigde)
+        if value == RGBZ1Rolomschrijving.gemachtigde:
+            return gemachtigde
+
+        rolomschrijvingen = [
+            rgbz2_value for rgbz2_value, rgbz1_value in cls.rgbz1_rolomschrijving_mapping.items()
+            if rgbz1_value == value
+        ]
+        return ~gemachtigde & Q(rolomschrijving__in=rolomschrijvingen)
+
+    @classmethod
+    def to_rgbz2_filter_rolomschrijving(cls, value):
+        return cls.to_rgbz2_filter_rolomschrijving_generiek(value)
+
     @classmethod
     def get_rol_defaults(cls, rol):
         assert rol in dict(RGBZ1Rolomschrijving.choices).keys()
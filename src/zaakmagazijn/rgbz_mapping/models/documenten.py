@@ -1,11 +1,15 @@
 from django.db import models
+from django.db.models import Q
 
 from ...rgbz.models import (
     EnkelvoudigInformatieObject, InformatieObject, InformatieObjectType,
     SamengesteldInformatieObject
 )
+from ...rgbz.models.mixins import resolve_types
 from ...rgbz.validators import validate_starts_with_gemeentecode
-from ..base import ModelProxy, ProxyField, ProxyForeignKey, ProxyOneToMany
+from ..base import (
+    ModelProxy, ProxyField, ProxyForeignKey, ProxyOneToMany, uses
+)
 from ..manager import ProxyManager
 
 
@@ -22,6 +26,7 @@ class DocumentTypeProxy(ModelProxy):
     objects = ProxyManager()
 
     @classmethod
+    @uses('informatieobjecttypeomschrijving_generiek')
     def to_rgbz1_documenttypeomschrijving_generiek(cls, obj):
         generiek = obj.informatieobjecttypeomschrijving_generiek
         if generiek:
@@ -29,6 +34,12 @@ class DocumentTypeProxy(ModelProxy):
 
         return None
 
+    @classmethod
+    def to_rgbz2_filter_documenttypeomschrijving_generiek(cls, value):
+        if value is None:
+            return Q(informatieobjecttypeomschrijving_generiek__isnull=True)
+        return Q(informatieobjecttypeomschrijving_generiek__informatieobjecttypeomschrijving_generiek=value)
+
 
 class DocumentProxy(ModelProxy):
     model = InformatieObject
@@ -72,6 +83,10 @@ class EnkelvoudigDocumentProxy(ModelProxy):
         _obj = obj.is_type()
         return super().from_django_obj(_obj)
 
+    @classmethod
+    def from_django_objs(cls, objs):
+        return [super(EnkelvoudigDocumentProxy, cls).from_django_obj(obj) for obj in resolve_types(objs)]
+
     #
     # WARNING: The method below is accurate but causes all queries, that want to
     # get a document by "identificatie", to be filtered in Python instead of in
@@ -91,6 +106,7 @@ class EnkelvoudigDocumentProxy(ModelProxy):
         return str(rgbz1_kwargs['identificatie'])[:4]
 
     @classmethod
+    @uses('formaat')
     def to_rgbz1_documentformaat(cls, obj):
         # The specification in RGBZ 1.0 for "documentformaat" indicates type
         # AN10. This effectively means that only 10 characters can be
@@ -99,9 +115,28 @@ class EnkelvoudigDocumentProxy(ModelProxy):
         return obj.formaat
 
     @classmethod
+    def to_rgbz2_filter_documentformaat(cls, value):
+        return Q(formaat=value)
+
+    @classmethod
+    @uses('link')
     def to_rgbz1_documentlink(cls, obj):
         return obj.link[:200] if obj.link else None
 
+    @classmethod
+    def to_rgbz2_filter_documentlink(cls, value):
+        if value is None:
+            return Q(link__isnull=True) | Q(link='')
+        if not value:
+            return Q(pk__in=[])
+        # The link is stored with at most 200 characters, so a longer value
+        # matches nothing.
+        if len(value) > 200:
+            return Q(pk__in=[])
+        if len(value) == 200:
+            return Q(link__startswith=value)
+        return Q(link=value)
+
     @classmethod
     def to_rgbz1__inhoud(cls, obj):
         from django.utils.functional import lazystr
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 from zaakmagazijn.rgbz.choices import ArchiefNominatie, ArchiefStatus, JaNee
 from zaakmagazijn.rgbz.models import (
@@ -6,7 +7,9 @@ from zaakmagazijn.rgbz.models import (
 )
 from zaakmagazijn.utils.stuf_datetime import today
 
-from ..base import ModelProxy, ProxyField, ProxyForeignKey, ProxyOneToMany
+from ..base import (
+    ModelProxy, ProxyField, ProxyForeignKey, ProxyOneToMany, follows, uses
+)
 from ..choices import Rolomschrijving, Zaakniveau
 from ..exceptions import NoValueError
 from ..manager import ProxyManager
@@ -134,11 +137,21 @@ class ZaakProxy(ModelProxy):
     objects = ProxyManager()
 
     @classmethod
+    @uses('hoofdzaak')
     def to_rgbz1_zaakniveau(cls, obj):
-        if obj.hoofdzaak is None:
+        # Use the column value to prevent retrieving the hoofdzaak itself.
+        if obj.hoofdzaak_id is None:
             return '1'
         return '2'
 
+    @classmethod
+    def to_rgbz2_filter_zaakniveau(cls, value):
+        if value == Zaakniveau.hoofdzaak:
+            return Q(hoofdzaak__isnull=True)
+        if value == Zaakniveau.deelzaken:
+            return Q(hoofdzaak__isnull=False)
+        return Q(pk__in=[])
+
     # TODO [KING]: Not part of ZDS 1.2 but needed by RGBZ mapping: https://discussie.kinggemeenten.nl/discussie/gemma/stuf-testplatform/deelzaakindicatie-creeerzaak-volgnr-1-staat-onterecht-op-j
     # @classmethod
     # def to_rgbz1_deelzakenindicatie(cls, obj):
@@ -147,11 +160,20 @@ class ZaakProxy(ModelProxy):
     #     # return JaNee.nee
 
     @classmethod
+    @uses('archiefnominatie')
     def to_rgbz1_archiefnominatie(cls, obj):
         if obj.archiefnominatie == ArchiefNominatie.vernietigen:
             return JaNee.ja
         return JaNee.nee
 
+    @classmethod
+    def to_rgbz2_filter_archiefnominatie(cls, value):
+        if value == JaNee.ja:
+            return Q(archiefnominatie=ArchiefNominatie.vernietigen)
+        if value == JaNee.nee:
+            return ~Q(archiefnominatie=ArchiefNominatie.vernietigen)
+        return Q(pk__in=[])
+
     @classmethod
     def to_rgbz2_bronorganisatie(cls, rgbz1_kwargs):
         return str(rgbz1_kwargs['zaakidentificatie'])[:4]
@@ -249,6 +271,7 @@ class StatusProxy(ModelProxy):
     model = Status
     objects = ProxyManager()
 
+    @follows('rol__betrokkene')
     def is_gezet_door(self):
         assert self.rol.zaak == self.zaak
         return self.rol.betrokkene
@@ -1,20 +1,26 @@
 from django.test import TestCase
 
-from zaakmagazijn.rgbz.choices import ArchiefNominatie, ArchiefStatus
+from zaakmagazijn.rgbz.choices import (
+    ArchiefNominatie, ArchiefStatus, IndicatieMachtiging,
+    RolomschrijvingGeneriek
+)
 from zaakmagazijn.rgbz.models import (
-    VestigingVanZaakBehandelendeOrganisatie, Zaak
+    Rol, VestigingVanZaakBehandelendeOrganisatie, Zaak
 )
 from zaakmagazijn.rgbz.tests.factory_models import (
-    MedewerkerFactory, NatuurlijkPersoonFactory, NietNatuurlijkPersoonFactory,
+    EnkelvoudigInformatieObjectFactory, MedewerkerFactory,
+    NatuurlijkPersoonFactory, NietNatuurlijkPersoonFactory,
     OrganisatorischeEenheidFactory, RolFactory, StatusFactory,
     VestigingFactory, VestigingVanZaakBehandelendeOrganisatieFactory,
     ZaakFactory, ZaakTypeFactory
 )
 
+from ..choices import Rolomschrijving
 from ..manager import ProxyQuerySet
 from ..models import (
-    BuurtObjectProxy, MedewerkerProxy, OrganisatorischeEenheidProxy,
-    StatusTypeProxy, ZaakProxy, ZaakTypeProxy
+    BuurtObjectProxy, EnkelvoudigDocumentProxy, MedewerkerProxy,
+    OrganisatorischeEenheidProxy, RolProxy, StatusTypeProxy, ZaakProxy,
+    ZaakTypeProxy
 )
 from ..utils import to_proxy_obj
 
@@ -218,6 +224,117 @@ class RolProxyTests(TestCase):
         self.assertEquals(proxy_oeh, to_proxy_obj(oeh))
 
 
+class LazyFieldTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.get(pk=RolFactory.create().pk)
+
+    def test_from_django_obj(self):
+        """
+        No values are computed, and no related objects are retrieved, before
+        they are accessed.
+        """
+        with self.assertNumQueries(0):
+            rol = RolProxy.from_django_obj(self.rol)
+
+        self.assertEqual(rol.pk, self.rol.pk)
+        self.assertNotIn('rolomschrijving', rol.__dict__)
+        self.assertNotIn('zaak', rol.__dict__)
+
+    def test_field_is_memoized(self):
+        rol = RolProxy.from_django_obj(self.rol)
+
+        self.assertEqual(rol.rolomschrijving, Rolomschrijving.overig)
+        self.assertEqual(rol.__dict__['rolomschrijving'], Rolomschrijving.overig)
+
+    def test_foreign_key_is_memoized(self):
+        rol = RolProxy.from_django_obj(self.rol)
+
+        with self.assertNumQueries(1):
+            zaak = rol.zaak
+        with self.assertNumQueries(0):
+            self.assertIs(rol.zaak, zaak)
+
+        self.assertEqual(zaak, ZaakProxy.from_django_obj(self.rol.zaak))
+
+    def test_set_field(self):
+        rol = RolProxy.from_django_obj(self.rol)
+        rol.roltoelichting = 'toelichting'
+
+        self.assertEqual(rol.to_django_obj().roltoelichting, 'toelichting')
+
+
+class ComputedFieldFilterTests(TestCase):
+    def test_filter_zaakniveau(self):
+        hoofdzaak = ZaakFactory.create()
+        deelzaak = ZaakFactory.create(hoofdzaak=hoofdzaak)
+
+        # The filter is done by the database, not by iterating over all zaken.
+        with self.assertNumQueries(0):
+            queryset = ZaakProxy.objects.filter(zaakniveau='1')
+
+        self.assertEqual(list(queryset), [ZaakProxy.from_django_obj(hoofdzaak)])
+        self.assertEqual(list(ZaakProxy.objects.filter(zaakniveau='2')), [ZaakProxy.from_django_obj(deelzaak)])
+        self.assertEqual(list(ZaakProxy.objects.filter(zaakniveau='3')), [])
+
+    def test_filter_archiefnominatie(self):
+        vernietigen = ZaakFactory.create(archiefnominatie=ArchiefNominatie.vernietigen)
+        bewaren = ZaakFactory.create(archiefnominatie=ArchiefNominatie.blijvend_bewaren)
+        leeg = ZaakFactory.create(archiefnominatie=None)
+
+        self.assertEqual(
+            list(ZaakProxy.objects.filter(archiefnominatie='J')), [ZaakProxy.from_django_obj(vernietigen)])
+        self.assertEqual(
+            set(ZaakProxy.objects.filter(archiefnominatie='N')),
+            {ZaakProxy.from_django_obj(bewaren), ZaakProxy.from_django_obj(leeg)})
+
+    def test_filter_rolomschrijving(self):
+        """
+        The database filter should give the same result as comparing the
+        RGBZ 1.0 values in Python.
+        """
+        rollen = [
+            RolFactory.create(rolomschrijving=rolomschrijving)
+            for rolomschrijving, _ in RolomschrijvingGeneriek.choices
+        ]
+        rollen.append(RolFactory.create(
+            rolomschrijving=RolomschrijvingGeneriek.belanghebbende,
+            indicatie_machtiging=IndicatieMachtiging.gemachtigde))
+
+        for rolomschrijving, _ in Rolomschrijving.choices:
+            with self.subTest(rolomschrijving=rolomschrijving):
+                expected = {
+                    rol.pk for rol in rollen if RolProxy.to_rgbz1_rolomschrijving(rol) == rolomschrijving
+                }
+                self.assertTrue(expected)
+
+                with self.assertNumQueries(0):
+                    queryset = RolProxy.objects.filter(
+                        rolomschrijving=rolomschrijving, rolomschrijving_generiek=rolomschrijving)
+                self.assertEqual({rol.pk for rol in queryset.queryset}, expected)
+
+    def test_filter_documentlink(self):
+        link = 'https://example.com/{}'.format('a' * 180)
+        document = EnkelvoudigInformatieObjectFactory.create(link=link)
+
+        self.assertEqual(
+            list(EnkelvoudigDocumentProxy.objects.filter(documentlink=link)),
+            [EnkelvoudigDocumentProxy.from_django_obj(document)])
+        self.assertEqual(list(EnkelvoudigDocumentProxy.objects.filter(documentlink=link + 'b')), [])
+
+        link = link + 'b' * (200 - len(link))
+        document.link = link
+        document.save()
+        self.assertEqual(
+            list(EnkelvoudigDocumentProxy.objects.filter(documentlink=link)),
+            [EnkelvoudigDocumentProxy.from_django_obj(document)])
+        self.assertEqual(list(EnkelvoudigDocumentProxy.objects.filter(documentlink=link + 'c')), [])
+
+    def test_get_rgbz2_field_names(self):
+        fields = [ZaakProxy.get_field('zaakniveau'), ZaakProxy.get_field('zaakidentificatie')]
+
+        self.assertEqual(ZaakProxy.get_rgbz2_field_names(fields), {'hoofdzaak', 'zaakidentificatie'})
+
+
 class OrganisatorischeEenheidEntiteitFactory(TestCase):
     def test_queryset_filter_nested(self):
         oeh = OrganisatorischeEenheidFactory.create(
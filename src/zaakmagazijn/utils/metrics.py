@@ -0,0 +1,436 @@
+"""
+Metrics in the Prometheus text exposition format, served by
+`zaakmagazijn.utils.views.metrics`.
+
+Every process keeps its own values. With `ZAAKMAGAZIJN_METRICS_DIR`, every
+process writes its values to its own file in that directory, at most every
+`ZAAKMAGAZIJN_METRICS_FLUSH_INTERVAL` seconds, and the values of all
+processes (all uWSGI workers, and the management commands) are combined
+when the metrics are served:
+
+* Counters and histograms are added up, including the values of processes
+  that stopped, so they only go up. The values of processes that stopped are
+  added to `archive.json`, and their files are removed.
+* Gauges are the maximum of the processes that are still running.
+
+The file of a process is named by its pid and a random suffix, so a new
+process that gets the pid of a stopped process doesn't overwrite its values.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILENAME = 'archive.json'
+LOCK_FILENAME = '.lock'
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # Label values to the value.
+        self._values = {}
+
+        if registry is None:
+            registry = REGISTRY
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def describe(self):
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+        }
+
+    def get(self, **labels):
+        """
+        Return the value of this process for :param:`labels`, or `None`.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def values(self):
+        """
+        Return a list of label values and values, to be stored as JSON.
+        """
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """
+    The value per label values is a list of the number of observations per
+    bucket (not cumulative), including the `+Inf` bucket, and their sum.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(float(bucket) for bucket in buckets)
+        super().__init__(name, documentation, labelnames=labelnames, registry=registry)
+
+    def describe(self):
+        description = super().describe()
+        description['buckets'] = list(self.buckets)
+        return description
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = next((i for i, bucket in enumerate(self.buckets) if value <= bucket), len(self.buckets))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def values(self):
+        with self._lock:
+            return [[list(key), list(counts)] for key, counts in self._values.items()]
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the block, in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def timed_methods(histogram, names, label='method'):
+    """
+    Return a class decorator that observes the duration of the methods
+    :param:`names` in :param:`histogram`, with the method name as the label.
+    """
+    def decorate(cls):
+        for name in names:
+            setattr(cls, name, _timed_method(histogram, getattr(cls, name), name, label))
+        return cls
+    return decorate
+
+
+def _timed_method(histogram, method, name, label):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with histogram.time(**{label: name}):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=None):
+        """
+        :param directory: See the `ZAAKMAGAZIJN_METRICS_DIR` setting.
+        :param flush_interval: See the `ZAAKMAGAZIJN_METRICS_FLUSH_INTERVAL` setting.
+        """
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_flush = 0
+        self._pid = None
+        self._filename = None
+        self._new_process = True
+
+    @property
+    def directory(self):
+        return self._directory if self._directory is not None else settings.ZAAKMAGAZIJN_METRICS_DIR
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.ZAAKMAGAZIJN_METRICS_FLUSH_INTERVAL
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def snapshot(self) -> OrderedDict:
+        """
+        Return the values of this process, by metric name.
+        """
+        snapshot = OrderedDict()
+        for name, metric in self._metrics.items():
+            snapshot[name] = metric.describe()
+            snapshot[name]['values'] = metric.values()
+        return snapshot
+
+    def flush(self, force=False) -> None:
+        """
+        Write the values of this process to its file, unless they were written
+        less than `flush_interval` seconds ago.
+        """
+        directory = self.directory
+        if not directory:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+
+            try:
+                os.makedirs(directory, exist_ok=True)
+                filename = self._get_filename()
+                if self._new_process:
+                    # Other files with the pid of this process are of a
+                    # process that stopped, of which the pid was reused.
+                    with self._lock_directory(directory):
+                        self._archive(directory, lambda pid: pid == os.getpid())
+                    self._new_process = False
+                self._write(os.path.join(directory, filename), {'pid': os.getpid(), 'metrics': self.snapshot()})
+            except OSError:
+                logger.warning('Could not write the metrics to %s.', directory, exc_info=True)
+
+    def _get_filename(self) -> str:
+        """
+        Return the name of the file of this process. The name is unique, also
+        if the pid of a process that stopped is reused.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._filename = '{}-{}.json'.format(self._pid, uuid.uuid4().hex[:8])
+            self._new_process = True
+        return self._filename
+
+    @contextmanager
+    def _lock_directory(self, directory):
+        """
+        Lock the directory, so only one process archives the files.
+        """
+        with open(os.path.join(directory, LOCK_FILENAME), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write(self, path, data) -> None:
+        # Written to a temporary file first, so readers never see a partial file.
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, path)
+
+    def _read(self, directory):
+        """
+        Yield the file name, the pid and the metrics of the other processes.
+        """
+        try:
+            filenames = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return
+
+        # A forked process has the file name of its parent, until it flushes.
+        own_filename = self._filename if self._pid == os.getpid() else None
+        for filename in filenames:
+            if not filename.endswith('.json') or filename in (ARCHIVE_FILENAME, own_filename):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                logger.warning('Could not read the metrics in %s.', filename, exc_info=True)
+                continue
+            yield filename, data['pid'], data['metrics']
+
+    def _read_archive(self, directory) -> dict:
+        try:
+            with open(os.path.join(directory, ARCHIVE_FILENAME)) as f:
+                return json.load(f)['metrics']
+        except FileNotFoundError:
+            return {}
+
+    def _archive(self, directory, is_stopped) -> None:
+        """
+        Add the counters and histograms of the processes that stopped to the
+        archive, and remove their files. Gauges of processes that stopped are
+        dropped. The directory should be locked.
+
+        :param is_stopped: A callable, returns `True` if the process with the
+          given pid stopped.
+        """
+        stopped = [(filename, metrics) for filename, pid, metrics in self._read(directory) if is_stopped(pid)]
+        if not stopped:
+            return
+
+        archive = self._combine_all(
+            [self._read_archive(directory)] + [metrics for filename, metrics in stopped], gauges=False)
+        self._write(os.path.join(directory, ARCHIVE_FILENAME), {'pid': None, 'metrics': OrderedDict(
+            (name, dict(metric, values=[[list(key), value] for key, value in metric['values'].items()]))
+            for name, metric in archive.items()
+        )})
+        for filename, metrics in stopped:
+            os.remove(os.path.join(directory, filename))
+
+    def collect(self) -> OrderedDict:
+        """
+        Return the combined values of all processes, by metric name.
+        """
+        processes = [self.snapshot()]
+        directory = self.directory
+        if directory and os.path.isdir(directory):
+            with self._lock_directory(directory):
+                self._archive(directory, lambda pid: not is_running(pid))
+                processes.append(self._read_archive(directory))
+                processes += [metrics for filename, pid, metrics in self._read(directory)]
+        return self._combine_all(processes)
+
+    def _combine_all(self, processes, gauges=True) -> OrderedDict:
+        combined = OrderedDict()
+        for metrics in processes:
+            for name, metric in metrics.items():
+                if metric['type'] == 'gauge' and not gauges:
+                    continue
+                if name not in combined:
+                    combined[name] = dict(metric, values=OrderedDict())
+                self._combine(combined[name], metric)
+        return combined
+
+    def _combine(self, combined, metric):
+        values = combined['values']
+        for labelvalues, value in metric['values']:
+            key = tuple(labelvalues)
+            current = values.get(key)
+            if current is None:
+                values[key] = value
+            elif metric['type'] == 'histogram':
+                values[key] = [a + b for a, b in zip(current, value)]
+            elif metric['type'] == 'gauge':
+                values[key] = max(current, value)
+            else:
+                values[key] = current + value
+
+    def generate_text(self) -> str:
+        """
+        Return the combined values of all processes in the text exposition
+        format.
+        """
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append('# HELP {} {}'.format(name, _escape(metric['help'], quote=False)))
+            lines.append('# TYPE {} {}'.format(name, metric['type']))
+            for key, value in sorted(metric['values'].items()):
+                labels = list(zip(metric['labelnames'], key))
+                if metric['type'] != 'histogram':
+                    lines.append(_format_sample(name, labels, value))
+                    continue
+
+                cumulative = 0
+                for bucket, count in zip(metric['buckets'] + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    lines.append(_format_sample(
+                        '{}_bucket'.format(name), labels + [('le', _format_value(bucket))], cumulative))
+                lines.append(_format_sample('{}_sum'.format(name), labels, value[-1]))
+                lines.append(_format_sample('{}_count'.format(name), labels, cumulative))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+def _escape(value, quote=True):
+    value = value.replace('\\', '\\\\').replace('\n', '\\n')
+    if quote:
+        value = value.replace('"', '\\"')
+    return value
+
+
+def _format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return '{:.1f}'.format(value)
+    return repr(value)
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        name = '{}{{{}}}'.format(name, ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels))
+    return '{} {}'.format(name, _format_value(value))
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush, force=True)
+
+soap_request_duration = Histogram(
+    'zaakmagazijn_soap_request_duration_seconds', 'The duration of SOAP requests, per operation and berichtcode.',
+    labelnames=('operation', 'berichtcode'))
+soap_request_queries = Histogram(
+    'zaakmagazijn_soap_request_queries', 'The number of database queries per SOAP request, of the sampled requests.',
+    labelnames=('operation', ), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+stuf_faults = Counter(
+    'zaakmagazijn_stuf_faults_total', 'The number of StUF faults returned, per operation and StUF code.',
+    labelnames=('operation', 'code'))
+dms_request_duration = Histogram(
+    'zaakmagazijn_dms_request_duration_seconds', 'The duration of operations in the DMS, per method of the client.',
+    labelnames=('method', ))
+audit_log_entries = Counter(
+    'zaakmagazijn_audit_log_entries_total', 'The number of audit log entries written, per mode.',
+    labelnames=('mode', ))
+audit_log_entries_dropped = Counter(
+    'zaakmagazijn_audit_log_entries_dropped_total',
+    'The number of audit log entries that could not be written to the database nor to the spool.')
+cmis_sync_token_lag = Gauge(
+    'zaakmagazijn_cmis_sync_token_lag', 'The number of DMS change log entries the ZS is behind.')
+cmis_sync_seconds_since_last_batch = Gauge(
+    'zaakmagazijn_cmis_sync_seconds_since_last_batch', 'The number of seconds since the last synchronized batch.')
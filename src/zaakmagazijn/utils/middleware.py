@@ -0,0 +1,28 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import REGISTRY, soap_request_queries
+from .performance import performance_recorder
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Write the metrics of this process for the other processes, see `Registry`.
+    """
+    def process_response(self, request, response):
+        REGISTRY.flush()
+        return response
+
+
+class PerformanceMiddleware(MiddlewareMixin):
+    """
+    Record the performance of a sample of the SOAP requests, see
+    `PerformanceRecorder`.
+    """
+    def process_request(self, request):
+        performance_recorder.start()
+
+    def process_response(self, request, response):
+        record = performance_recorder.stop()
+        if record is not None and record.operation:
+            soap_request_queries.observe(record.calls['sql'][0], operation=record.operation)
+        return response
@@ -0,0 +1,169 @@
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('performance')
+
+# The phases of a SOAP request, in the order they are logged.
+PHASES = ('parse', 'validation', 'authorization', 'service', 'serialization', 'rewrite', 'other')
+
+
+class PerformanceRecord:
+    """
+    The time spent per phase of a single request, and the number and
+    duration of the queries and DMS requests.
+
+    The time of a phase excludes the time of the phases that run within it,
+    so the phases don't overlap. The total time also includes the time spent
+    outside of the phases, for example in other middleware.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = None
+        self.operation = None
+        self.sender = None
+        self.phases = OrderedDict((phase, 0.0) for phase in PHASES)
+        # Name to a list of the number of calls and the total duration.
+        self.calls = OrderedDict()
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            nested = self._stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + duration - nested
+            if self._stack:
+                self._stack[-1] += duration
+
+    def add_call(self, name, duration):
+        calls = self.calls.setdefault(name, [0, 0.0])
+        calls[0] += 1
+        calls[1] += duration
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def format(self):
+        """
+        Return the record as a single line of `key=value` pairs, with the
+        durations in milliseconds.
+        """
+        values = [
+            ('operation', self.operation or '-'),
+            ('sender', self.sender or '-'),
+            ('total', '{:.1f}'.format(self.total * 1000)),
+        ]
+        values += [(name, '{:.1f}'.format(duration * 1000)) for name, duration in self.phases.items()]
+        for name, (count, duration) in self.calls.items():
+            values += [
+                ('{}_count'.format(name), count),
+                (name, '{:.1f}'.format(duration * 1000)),
+            ]
+        return ' '.join('{}={}'.format(key, value) for key, value in values)
+
+
+class PerformanceRecorder:
+    """
+    Records the performance of a sample of the SOAP requests, and logs a line
+    per request to the `performance` logger, see `PerformanceMiddleware`.
+
+    Outside a sampled request, recording does nothing.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def record(self):
+        return getattr(self._local, 'record', None)
+
+    def start(self, sample_rate=None):
+        """
+        Start recording the current request, if it is sampled.
+
+        :param sample_rate: See the `ZAAKMAGAZIJN_PERFORMANCE_SAMPLE_RATE` setting.
+        :return: The `PerformanceRecord`, or `None` if the request is not sampled.
+        """
+        if sample_rate is None:
+            sample_rate = settings.ZAAKMAGAZIJN_PERFORMANCE_SAMPLE_RATE
+        if not sample_rate or random.random() >= sample_rate:
+            self._local.record = None
+            return None
+
+        record = self._local.record = PerformanceRecord()
+        # Queries are only timed by the debug cursor, for sampled requests only.
+        self._local.force_debug_cursor = connection.force_debug_cursor
+        self._local.queries = len(connection.queries_log)
+        connection.force_debug_cursor = True
+        return record
+
+    def stop(self, log=True):
+        """
+        Stop recording, and log the record of the current request if a SOAP
+        operation was called.
+
+        :return: The `PerformanceRecord`, or `None` if the request is not sampled.
+        """
+        record = self.record
+        if record is None:
+            return None
+        self._local.record = None
+
+        record.finish()
+        # The log keeps the last `queries_limit` queries only.
+        queries = list(connection.queries_log)[min(self._local.queries, connection.queries_limit):]
+        connection.force_debug_cursor = self._local.force_debug_cursor
+        record.calls['sql'] = [len(queries), sum(float(query['time']) for query in queries)]
+        record.calls.move_to_end('sql', last=False)
+
+        if log and record.operation:
+            logger.info(record.format())
+        return record
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Add the time spent in the block to the phase :param:`name`.
+        """
+        record = self.record
+        if record is None:
+            yield
+        else:
+            with record.phase(name):
+                yield
+
+    @contextmanager
+    def call(self, name):
+        """
+        Count the call in the block, and its duration, as :param:`name`, for
+        example a request to the DMS.
+        """
+        record = self.record
+        if record is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.add_call(name, time.perf_counter() - start)
+
+    def set_operation(self, operation, sender=None):
+        record = self.record
+        if record is not None:
+            record.operation = operation
+            record.sender = sender
+
+
+performance_recorder = PerformanceRecorder()
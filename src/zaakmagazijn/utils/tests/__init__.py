@@ -9,3 +9,7 @@ def on_jenkins():
 
 def should_skip_cmis_tests():
     return getattr(settings, 'SKIP_CMIS_TESTS', False)
+
+
+def should_run_benchmarks():
+    return getattr(settings, 'RUN_BENCHMARKS', 'RUN_BENCHMARKS' in os.environ)
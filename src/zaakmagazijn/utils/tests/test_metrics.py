@@ -0,0 +1,233 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from zaakmagazijn.api.tests.base import BaseTestPlatformTests
+from zaakmagazijn.rgbz.tests.factory_models import (
+    OrganisatorischeEenheidFactory, StatusTypeFactory, ZaakFactory
+)
+
+from ..metrics import (
+    Counter, Gauge, Histogram, Registry, soap_request_duration, stuf_faults,
+    timed_methods
+)
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.registry = Registry(directory=self.directory, flush_interval=60)
+        self.counter = Counter('test_total', 'A counter.', labelnames=('code', ), registry=self.registry)
+        self.gauge = Gauge('test_lag', 'A gauge.', registry=self.registry)
+        self.histogram = Histogram(
+            'test_seconds', 'A histogram.', labelnames=('method', ), buckets=(0.1, 1), registry=self.registry)
+
+    def write_process(self, pid, counter=0, gauge=0):
+        """
+        Write the metrics file of another process.
+        """
+        with open(os.path.join(self.directory, '{}-test.json'.format(pid)), 'w') as f:
+            json.dump({'pid': pid, 'metrics': {
+                'test_total': dict(self.counter.describe(), values=[[['stuf064'], counter]]),
+                'test_lag': dict(self.gauge.describe(), values=[[[], gauge]]),
+            }}, f)
+
+    def test_text(self):
+        self.counter.inc(code='stuf064')
+        self.counter.inc(2, code='stuf064')
+        self.counter.inc(code='stuf055')
+        self.gauge.set(7)
+        self.histogram.observe(0.05, method='checkout')
+        self.histogram.observe(0.5, method='checkout')
+        self.histogram.observe(5, method='checkout')
+
+        self.assertEqual(self.registry.generate_text().splitlines(), [
+            '# HELP test_lag A gauge.',
+            '# TYPE test_lag gauge',
+            'test_lag 7',
+            '# HELP test_seconds A histogram.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{method="checkout",le="0.1"} 1',
+            'test_seconds_bucket{method="checkout",le="1.0"} 2',
+            'test_seconds_bucket{method="checkout",le="+Inf"} 3',
+            'test_seconds_sum{method="checkout"} 5.55',
+            'test_seconds_count{method="checkout"} 3',
+            '# HELP test_total A counter.',
+            '# TYPE test_total counter',
+            'test_total{code="stuf055"} 1',
+            'test_total{code="stuf064"} 3',
+        ])
+
+    def test_escape_labels(self):
+        self.counter.inc(code='a "b"\\\n')
+
+        self.assertIn('test_total{code="a \\"b\\"\\\\\\n"} 1', self.registry.generate_text())
+
+    def test_timed_methods(self):
+        @timed_methods(self.histogram, ['checkout'])
+        class Client:
+            def checkout(self, document):
+                return document
+
+        self.assertEqual(Client().checkout('doc'), 'doc')
+        self.assertEqual(Client.checkout.__name__, 'checkout')
+        self.assertEqual(self.histogram.get(method='checkout')[0], 1)
+
+    def read_process(self, filename):
+        with open(os.path.join(self.directory, filename)) as f:
+            return json.load(f)
+
+    def get_filenames(self):
+        return sorted(filename for filename in os.listdir(self.directory) if filename.endswith('.json'))
+
+    def test_flush(self):
+        self.counter.inc(code='stuf064')
+        self.registry.flush()
+        self.counter.inc(code='stuf064')
+        # Within the flush interval.
+        self.registry.flush()
+
+        filenames = self.get_filenames()
+        self.assertEqual(len(filenames), 1)
+        self.assertTrue(filenames[0].startswith('{}-'.format(os.getpid())))
+        data = self.read_process(filenames[0])
+        self.assertEqual(data['metrics']['test_total']['values'], [[['stuf064'], 1]])
+
+        self.registry.flush(force=True)
+        self.assertEqual(self.get_filenames(), filenames)
+        data = self.read_process(filenames[0])
+        self.assertEqual(data['metrics']['test_total']['values'], [[['stuf064'], 2]])
+
+    def test_flush_reused_pid(self):
+        # The file of a process that stopped, of which the pid is reused by this process.
+        self.write_process(os.getpid(), counter=5, gauge=10)
+        self.counter.inc(code='stuf064')
+        self.gauge.set(3)
+
+        self.registry.flush(force=True)
+
+        self.assertNotIn('{}-test.json'.format(os.getpid()), self.get_filenames())
+        self.assertIn('archive.json', self.get_filenames())
+        collected = self.registry.collect()
+        self.assertEqual(collected['test_total']['values'][('stuf064', )], 6)
+        self.assertEqual(collected['test_lag']['values'][()], 3)
+
+    def test_combine_processes(self):
+        self.counter.inc(code='stuf064')
+        self.gauge.set(3)
+        # The file of this process is replaced by its current values.
+        self.registry.flush(force=True)
+        self.counter.inc(code='stuf064')
+        self.write_process(1000001, counter=5, gauge=10)
+        self.write_process(1000002, counter=1, gauge=20)
+
+        with patch('zaakmagazijn.utils.metrics.is_running', lambda pid: pid != 1000002):
+            collected = self.registry.collect()
+
+        self.assertEqual(collected['test_total']['values'][('stuf064', )], 8)
+        # The gauges of processes that stopped are ignored.
+        self.assertEqual(collected['test_lag']['values'][()], 10)
+
+        # The values of the process that stopped are archived, and its file is removed.
+        self.assertNotIn('1000002-test.json', self.get_filenames())
+        self.assertEqual(
+            self.read_process('archive.json')['metrics']['test_total']['values'], [[['stuf064'], 1]])
+        self.assertNotIn('test_lag', self.read_process('archive.json')['metrics'])
+
+    def test_archive_processes(self):
+        self.write_process(1000001, counter=5)
+        self.write_process(1000002, counter=1)
+
+        with patch('zaakmagazijn.utils.metrics.is_running', lambda pid: False):
+            self.assertEqual(self.registry.collect()['test_total']['values'][('stuf064', )], 6)
+        self.write_process(1000002, counter=2)
+        with patch('zaakmagazijn.utils.metrics.is_running', lambda pid: False):
+            # The archived values are added to the values of the new process.
+            self.assertEqual(self.registry.collect()['test_total']['values'][('stuf064', )], 8)
+
+        self.assertEqual(self.get_filenames(), ['archive.json'])
+
+    def test_no_directory(self):
+        registry = Registry(directory='', flush_interval=0)
+        counter = Counter('test_total', 'A counter.', registry=registry)
+        counter.inc()
+
+        registry.flush()
+        self.assertEqual(registry.collect()['test_total']['values'][()], 1)
+
+
+class MetricsViewTests(SimpleTestCase):
+    @override_settings(ZAAKMAGAZIJN_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ZAAKMAGAZIJN_METRICS=True)
+    def test_enabled(self):
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'# TYPE zaakmagazijn_soap_request_duration_seconds histogram', response.content)
+
+
+class SOAPRequestMetricsTests(BaseTestPlatformTests):
+    test_files_subfolder = 'stp_actualiseerZaakstatus'
+    operation = 'actualiseerZaakstatus_ZakLk01'
+
+    def get_context(self, zaak, zaakidentificatie=None):
+        status_type = StatusTypeFactory.create(
+            statustypeomschrijving='Intake afgerond', statustypevolgnummer=1, zaaktype=zaak.zaaktype)
+        oeh = OrganisatorischeEenheidFactory.create(
+            organisatieidentificatie=11111, organisatieeenheididentificatie=33333)
+        return {
+            'gemeentecode': '',
+            'referentienummer': self.genereerID(10),
+            'zds_zaaktype_code': '12345678',
+            'zds_zaaktype_omschrijving': 'Aanvraag burgerservicenummer behandelen',
+            'datumVandaag': self.genereerdatum(),
+            'datumEergisteren': self.genereerdatum(),
+            'tijdstipRegistratie': self.genereerdatumtijd(),
+            'organisatorischeEenheidIdentificatie': oeh.identificatie,
+            'genereerzaakident_identificatie_2': zaakidentificatie or zaak.zaakidentificatie,
+            'zds_zaakstatus_code': '87654321',
+            'zds_zaakstatus_omschrijving': status_type.statustypeomschrijving,
+        }
+
+    def get_count(self):
+        counts = soap_request_duration.get(operation=self.operation, berichtcode='Lk01')
+        return sum(counts[:-1]) if counts else 0
+
+    def get_faults(self):
+        return sum(value for labelvalues, value in stuf_faults.values() if labelvalues[0] == self.operation)
+
+    def test_request(self):
+        zaak = ZaakFactory.create()
+        count, faults = self.get_count(), self.get_faults()
+
+        response = self._do_request(
+            'OntvangAsynchroon', 'actualiseerZaakstatus_ZakLk01_01.xml', self.get_context(zaak))
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.get_count(), count + 1)
+        self.assertEqual(self.get_faults(), faults)
+
+    def test_fault(self):
+        zaak = ZaakFactory.create()
+        count, faults = self.get_count(), self.get_faults()
+
+        response = self._do_request(
+            'OntvangAsynchroon', 'actualiseerZaakstatus_ZakLk01_01.xml', self.get_context(zaak, '0000unknown'))
+
+        self.assertEqual(response.status_code, 500, response.content)
+        self.assertEqual(self.get_count(), count + 1)
+        self.assertEqual(self.get_faults(), faults + 1)
@@ -0,0 +1,112 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from zaakmagazijn.api.tests.base import BaseTestPlatformTests
+from zaakmagazijn.rgbz.tests.factory_models import (
+    OrganisatorischeEenheidFactory, StatusTypeFactory, ZaakFactory
+)
+
+from ..performance import PerformanceRecord, PerformanceRecorder
+
+
+class PerformanceRecordTests(SimpleTestCase):
+    def test_nested_phases(self):
+        record = PerformanceRecord()
+
+        with record.phase('service'):
+            time.sleep(0.02)
+            with record.phase('authorization'):
+                time.sleep(0.02)
+        record.finish()
+
+        self.assertAlmostEqual(record.phases['service'], 0.02, delta=0.01)
+        self.assertAlmostEqual(record.phases['authorization'], 0.02, delta=0.01)
+        self.assertGreaterEqual(record.total, record.phases['service'] + record.phases['authorization'])
+
+    def test_format(self):
+        record = PerformanceRecord()
+        record.operation = 'geefZaakdetails_ZakLv01'
+        record.sender = 'STP'
+        record.add_call('cmis', 0.01)
+        record.add_call('cmis', 0.02)
+        record.finish()
+
+        line = record.format()
+        self.assertTrue(line.startswith('operation=geefZaakdetails_ZakLv01 sender=STP total='))
+        self.assertIn(' parse=0.0 ', line)
+        self.assertTrue(line.endswith(' cmis_count=2 cmis=30.0'))
+
+
+class PerformanceRecorderTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.recorder = PerformanceRecorder()
+
+    def test_not_sampled(self):
+        self.assertIsNone(self.recorder.start(sample_rate=0))
+
+        with self.recorder.phase('service'), self.recorder.call('cmis'):
+            pass
+        self.assertIsNone(self.recorder.stop())
+
+    def test_sampled(self):
+        self.recorder.start(sample_rate=1)
+        self.recorder.set_operation('creeerZaak_ZakLk01', 'STP')
+
+        with self.recorder.phase('service'), self.recorder.call('cmis'):
+            get_user_model().objects.count()
+            get_user_model().objects.count()
+
+        with self.assertLogs('performance') as logs:
+            record = self.recorder.stop()
+
+        self.assertEqual(record.calls['sql'][0], 2)
+        self.assertEqual(record.calls['cmis'][0], 1)
+        self.assertEqual(logs.records[0].getMessage(), record.format())
+        self.assertIn('sql_count=2', record.format())
+
+    def test_no_operation(self):
+        self.recorder.start(sample_rate=1)
+
+        with self.assertRaises(AssertionError), self.assertLogs('performance'):
+            self.recorder.stop()
+
+
+@override_settings(ZAAKMAGAZIJN_PERFORMANCE_SAMPLE_RATE=1)
+class PerformanceMiddlewareTests(BaseTestPlatformTests):
+    test_files_subfolder = 'stp_actualiseerZaakstatus'
+
+    def test_request(self):
+        zaak = ZaakFactory.create()
+        status_type = StatusTypeFactory.create(
+            statustypeomschrijving='Intake afgerond', statustypevolgnummer=1, zaaktype=zaak.zaaktype)
+        oeh = OrganisatorischeEenheidFactory.create(
+            organisatieidentificatie=11111, organisatieeenheididentificatie=33333)
+        context = {
+            'gemeentecode': '',
+            'referentienummer': self.genereerID(10),
+            'zds_zaaktype_code': '12345678',
+            'zds_zaaktype_omschrijving': 'Aanvraag burgerservicenummer behandelen',
+            'datumVandaag': self.genereerdatum(),
+            'datumEergisteren': self.genereerdatum(),
+            'tijdstipRegistratie': self.genereerdatumtijd(),
+            'organisatorischeEenheidIdentificatie': oeh.identificatie,
+            'genereerzaakident_identificatie_2': zaak.zaakidentificatie,
+            'zds_zaakstatus_code': '87654321',
+            'zds_zaakstatus_omschrijving': status_type.statustypeomschrijving,
+        }
+
+        with self.assertLogs('performance') as logs:
+            response = self._do_request('OntvangAsynchroon', 'actualiseerZaakstatus_ZakLk01_01.xml', context)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(len(logs.records), 1)
+        values = dict(value.split('=') for value in logs.records[0].getMessage().split())
+        self.assertEqual(values['operation'], 'actualiseerZaakstatus_ZakLk01')
+        self.assertEqual(values['sender'], 'STP')
+        for key in ['total', 'parse', 'validation', 'authorization', 'service', 'serialization', 'rewrite', 'other',
+                    'sql_count', 'sql']:
+            self.assertGreaterEqual(float(values[key]), 0, key)
+        self.assertGreater(int(values['sql_count']), 0)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import REGISTRY
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics(request):
+    """
+    Return the metrics of all processes, see `zaakmagazijn.utils.metrics`.
+    """
+    if not settings.ZAAKMAGAZIJN_METRICS:
+        raise Http404
+    return HttpResponse(REGISTRY.generate_text(), content_type=CONTENT_TYPE)
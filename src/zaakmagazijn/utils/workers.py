@@ -0,0 +1,291 @@
+"""
+Workers that process the rows of a queue table in order per ordering key,
+see `zaakmagazijn.cmis.outbox.OutboxWorker` and
+`zaakmagazijn.async.processing.AsyncMessageWorker`.
+"""
+import logging
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """
+    Processes the items stored in `model`, using a pool of threads.
+
+    Items with the same ordering key are processed one at a time, in the
+    order they were stored. Multiple workers can run at the same time: the
+    items are claimed by a worker before they are processed.
+    """
+    # The model of the items, with an `ordering_key`, `status` and `claimed_on` field.
+    model = None
+    # The status of the claimed items.
+    in_progress_status = None
+    # The statuses of the items that later items with the same ordering key wait for.
+    unfinished_statuses = []
+
+    def __init__(self, max_workers: int=4, batch_size: int=100):
+        """
+        :param max_workers: The number of threads processing items.
+        :param batch_size: The maximum number of items claimed at once.
+        """
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._executor = None
+
+    def get_claimable(self, now):
+        """
+        Return a `QuerySet` of the items that can be claimed now, including the
+        items of which the claim expired.
+        """
+        raise NotImplementedError
+
+    def get_dependencies(self, item) -> list:
+        """
+        Return the other ordering keys :param:`item` depends on: it is only
+        claimed when there are no earlier unfinished items with these keys.
+        These should match the items returned by `get_blocked_by`.
+        """
+        return []
+
+    def get_blocked_by(self, unclaimable):
+        """
+        Return a list of `QuerySet`s of the :param:`unclaimable` items an item
+        waits for, using `OuterRef` to refer to the item: the item has the same
+        ordering key, or depends on their ordering key.
+        """
+        return [unclaimable.filter(ordering_key=OuterRef('ordering_key'))]
+
+    def get_claimable_ready(self, now):
+        """
+        Return a `QuerySet` of the claimable items that don't wait for an earlier
+        unfinished item that can't be claimed now.
+
+        Filtering these in the database prevents the batch from filling up
+        with waiting items, which would stop the other items from being
+        processed.
+        """
+        claimable = self.get_claimable(now)
+        unclaimable = self.model.objects.filter(status__in=self.unfinished_statuses).exclude(
+            pk__in=self.get_claimable(now).values('pk'))
+
+        # `Exists` can only be filtered on as an annotation in Django 1.11.
+        for i, blocked_by in enumerate(self.get_blocked_by(unclaimable)):
+            name = '_blocked_{}'.format(i)
+            claimable = claimable.annotate(**{
+                name: Exists(blocked_by.filter(pk__lt=OuterRef('pk')).values('pk'))
+            }).filter(**{name: False})
+        return claimable
+
+    def get_claim_updates(self) -> dict:
+        """
+        Return the fields to update when items are claimed, besides the status
+        and `claimed_on`.
+        """
+        return {}
+
+    def claim(self) -> list:
+        """
+        Claim the items that can be processed now.
+
+        :return: A list of lists of items. The items in a list have the same
+          ordering key, and should be processed in order.
+        """
+        now = timezone.now()
+
+        with transaction.atomic():
+            # Items claimed by other workers are locked, and skipped.
+            queryset = self.get_claimable_ready(now).select_for_update(skip_locked=True).order_by('pk')
+            candidates = OrderedDict((item.pk, item) for item in queryset[:self.batch_size])
+            if not candidates:
+                return []
+
+            dependencies = {pk: self.get_dependencies(item) for pk, item in candidates.items()}
+            ordering_keys = {item.ordering_key for item in candidates.values()}
+            ordering_keys.update(key for keys in dependencies.values() for key in keys)
+
+            # An item can only be processed if all earlier items with the same
+            # ordering key, or with an ordering key it depends on, are finished.
+            unfinished = OrderedDict()
+            for ordering_key, pk in self.model.objects.filter(
+                    ordering_key__in=ordering_keys, status__in=self.unfinished_statuses
+            ).order_by('pk').values_list('ordering_key', 'pk'):
+                unfinished.setdefault(ordering_key, []).append(pk)
+
+            def is_ready(pk):
+                return pk in candidates and all(
+                    unfinished.get(key, [pk])[0] >= pk for key in dependencies[pk])
+
+            groups = []
+            for pks in unfinished.values():
+                group = [candidates[pk] for pk in takewhile(is_ready, pks)]
+                if group:
+                    groups.append(group)
+
+            claimed = [item for group in groups for item in group]
+            self.model.objects.filter(pk__in=[item.pk for item in claimed]).update(
+                status=self.in_progress_status, claimed_on=now, **self.get_claim_updates())
+
+        for item in claimed:
+            item.status = self.in_progress_status
+            item.claimed_on = now
+        return groups
+
+    def run_once(self) -> tuple:
+        """
+        Claim and process the items that can be processed now.
+
+        :return: A tuple of the number of processed and failed items.
+        """
+        groups = self.claim()
+        if self.max_workers > 1 and len(groups) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            results = list(self._executor.map(self._process_group_in_thread, groups))
+        else:
+            results = [self.process_group(group) for group in groups]
+
+        processed = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        return processed, failed
+
+    def run(self, poll_interval: float=1.0, stop=None) -> None:
+        """
+        Keep processing items, until `stop` returns `True`.
+
+        :param poll_interval: The number of seconds to wait when there are no
+          items to process.
+        :param stop: A callable, called after every batch.
+        """
+        try:
+            while not (stop and stop()):
+                processed, failed = self.run_once()
+                REGISTRY.flush()
+                if not processed and not failed:
+                    time.sleep(poll_interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def process_group(self, items: list) -> tuple:
+        """
+        Process `items` in order.
+
+        :return: A tuple of the number of processed and failed items.
+        """
+        raise NotImplementedError
+
+    def _process_group_in_thread(self, items: list) -> tuple:
+        # Every thread has its own database connection.
+        connection.close_if_unusable_or_obsolete()
+        return self.process_group(items)
+
+
+class QueueWorkerCommand(BaseCommand):
+    """
+    Runs a `QueueWorker` until the process is stopped, or until there is
+    nothing left to process with `--once`.
+    """
+    # The name of the items, in the help texts and the output.
+    items = 'items'
+    # The verb in the output of `--once`.
+    processed = 'Processed'
+    retry_failed_help = 'Retry the items that failed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=4,
+            help='The number of threads processing {}.'.format(self.items),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=100,
+            help='The maximum number of {} claimed at once.'.format(self.items),
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            dest='poll_interval',
+            default=1.0,
+            help='The number of seconds to wait when there are no {} to process.'.format(self.items),
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Process the {} that can be processed now, and stop.'.format(self.items),
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            dest='retry_failed',
+            default=False,
+            help=self.retry_failed_help,
+        )
+
+    def get_worker(self, options) -> QueueWorker:
+        raise NotImplementedError
+
+    def retry_failed(self) -> int:
+        """
+        Mark the failed items to be processed again.
+
+        :return: The number of items.
+        """
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            count = self.retry_failed()
+            self.stdout.write('Retrying {} failed {}.'.format(count, self.items))
+
+        worker = self.get_worker(options)
+
+        if options['once']:
+            processed = failed = 0
+            try:
+                while True:
+                    batch_processed, batch_failed = worker.run_once()
+                    if not batch_processed and not batch_failed:
+                        break
+                    processed += batch_processed
+                    failed += batch_failed
+            finally:
+                worker.close()
+
+            out = self.stderr if failed else self.stdout
+            out.write('{} {} {}, {} failed.'.format(self.processed, processed, self.items, failed))
+            return
+
+        # Finish the current batch when stopped.
+        stopped = []
+
+        def stop(signum, frame):
+            logger.info('Stopping after the current batch.')
+            stopped.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        worker.run(poll_interval=options['poll_interval'], stop=lambda: bool(stopped))
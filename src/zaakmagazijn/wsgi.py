@@ -8,8 +8,13 @@ https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
 """
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "zaakmagazijn.conf.dev")
 
 application = get_wsgi_application()
+
+if settings.ZAAKMAGAZIJN_WARM_UP:
+    from zaakmagazijn.api.views import warm_up
+    warm_up()